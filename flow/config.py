@@ -4,12 +4,19 @@ import os
 
 PYTHON_COMMAND = "python"
 
-SUMO_SLEEP = 1.0  # Delay between initializing SUMO and connecting with TraCI
+# Maximum time (in seconds) to wait for SUMO to accept a TraCI connection
+SUMO_TIMEOUT = 100.0
 
 PROJECT_PATH = osp.abspath(osp.join(osp.dirname(__file__), '..'))
 
 LOG_DIR = PROJECT_PATH + "/data"
 
+# directory in which the networks generated by sumo's netconvert are cached,
+# shared by all processes on the machine. Set to None to disable the cache
+NET_CACHE_DIR = os.environ.get(
+    "FLOW_NET_CACHE_DIR",
+    osp.join(osp.expanduser("~"), ".cache", "flow", "networks"))
+
 # users set both of these in their bash_rc or bash_profile
 # and also should run aws configure after installing awscli
 AWS_ACCESS_KEY = os.environ.get("AWS_ACCESS_KEY", None)
@@ -27,8 +27,24 @@ class BaseController:
         Should be either "instantaneous" or "safe_velocity"
     noise : double
         variance of the gaussian from which to sample a noisy acceleration
+
+    Attributes
+    ----------
+    required_vehicle_variables : tuple of str
+        optional vehicle variables read by the controller, see
+        flow.envs.Env.required_vehicle_variables. The failsafes read the
+        leader and headway of the vehicle.
+    stateless : bool
+        whether the controller holds no state specific to the vehicle it
+        controls. A single instance of such a controller is shared by all
+        vehicles of a type, and its veh_id attribute is set to the vehicle
+        whose action is requested (see
+        flow.core.kernel.vehicle.KernelVehicle.get_acc_controller)
     """
 
+    required_vehicle_variables = ('leader',)
+    stateless = False
+
     def __init__(self,
                  veh_id,
                  car_following_params,
@@ -57,6 +73,33 @@ class BaseController:
         """Return the acceleration of the controller."""
         raise NotImplementedError
 
+    def get_accels(self, env, veh_ids):
+        """Return the accelerations of several vehicles using the controller.
+
+        This is the batched form of get_accel, and is only used with stateless
+        controllers, which are shared by all vehicles of a type. By default,
+        get_accel is called for every vehicle. Controllers may instead compute
+        the accelerations of all vehicles at once from arrays of states.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            state of the environment at the current time step
+        veh_ids : list of str
+            names of the vehicles
+
+        Returns
+        -------
+        np.ndarray
+            the acceleration of every vehicle, NaN if none is specified
+        """
+        accel = np.empty(len(veh_ids))
+        for i, veh_id in enumerate(veh_ids):
+            self.veh_id = veh_id
+            veh_accel = self.get_accel(env)
+            accel[i] = np.nan if veh_accel is None else veh_accel
+        return accel
+
     def get_action(self, env):
         """Convert the get_accel() acceleration into an action.
 
@@ -107,6 +150,95 @@ class BaseController:
 
         return accel
 
+    def get_actions(self, env, veh_ids):
+        """Convert the get_accels() accelerations into actions.
+
+        This is the batched form of get_action, and is only used with
+        stateless controllers. The noise and failsafes are applied to all
+        vehicles at once.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            state of the environment at the current time step
+        veh_ids : list of str
+            names of the vehicles
+
+        Returns
+        -------
+        np.ndarray
+            the modified form of the acceleration of every vehicle. Vehicles
+            whose accelerations are specified by sumo for the current time
+            step have an action of NaN.
+        """
+        actions = np.full(len(veh_ids), np.nan)
+
+        # vehicles whose data is not subscribed yet and vehicles in junctions
+        # are controlled by sumo (see get_action)
+        edges = env.k.vehicle.get_edge(veh_ids)
+        active = np.array([len(edge) > 0 and edge[0] != ":"
+                           for edge in edges], dtype=bool)
+        if not np.any(active):
+            return actions
+        if not np.all(active):
+            veh_ids = [veh_id for veh_id, is_active
+                       in zip(veh_ids, active) if is_active]
+
+        accel = self.get_accels(env, veh_ids)
+
+        # if no acceleration is specified, let sumo take over for the current
+        # time step
+        specified = ~np.isnan(accel)
+        if not np.all(specified):
+            veh_ids = [veh_id for veh_id, is_specified
+                       in zip(veh_ids, specified) if is_specified]
+        veh_accel = accel[specified]
+
+        # add noise to the accelerations, if requested
+        if self.accel_noise > 0:
+            veh_accel += np.random.normal(0, self.accel_noise, len(veh_ids))
+
+        # run the failsafes, if requested
+        if self.fail_safe == 'instantaneous':
+            veh_accel = self.get_safe_actions_instantaneous(
+                env, veh_ids, veh_accel)
+        elif self.fail_safe == 'safe_velocity':
+            veh_accel = self.get_safe_velocity_actions(
+                env, veh_ids, veh_accel)
+
+        accel[specified] = veh_accel
+        actions[active] = accel
+
+        return actions
+
+    @staticmethod
+    def _get_values(getter, veh_ids, error=-1001):
+        """Return the values of a variable for vehicles that may be missing.
+
+        This is used to read the state of the leaders or followers of
+        vehicles.
+
+        Parameters
+        ----------
+        getter : function
+            method of the vehicle kernel returning the variable
+        veh_ids : list of str
+            names of the vehicles. Missing vehicles are None or ""
+        error : float, optional
+            value that is returned for missing vehicles
+
+        Returns
+        -------
+        np.ndarray
+            the value of the variable for every vehicle
+        """
+        values = np.full(len(veh_ids), error, dtype=float)
+        present = np.array([bool(veh_id) for veh_id in veh_ids], dtype=bool)
+        if np.any(present):
+            values[present] = getter(
+                [veh_id for veh_id in veh_ids if veh_id])
+        return values
+
     def get_safe_action_instantaneous(self, env, action):
         """Perform the "instantaneous" failsafe action.
 
@@ -195,6 +327,84 @@ class BaseController:
             else:
                 return action
 
+    def get_safe_actions_instantaneous(self, env, veh_ids, actions):
+        """Perform the "instantaneous" failsafe action for several vehicles.
+
+        See get_safe_action_instantaneous.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            current environment, which contains information of the state of the
+            network at the current time step
+        veh_ids : list of str
+            names of the vehicles
+        actions : np.ndarray
+            requested acceleration actions
+
+        Returns
+        -------
+        np.ndarray
+            the requested actions of the vehicles that do not lead to a crash;
+            and a stopping action for the other vehicles
+        """
+        # if there is only one vehicle in the network, all actions are safe
+        if env.k.vehicle.num_vehicles == 1:
+            return actions
+
+        # if there is no other vehicle in the lane, all actions are safe
+        has_leader = np.array([lead_id is not None for lead_id in
+                               env.k.vehicle.get_leader(veh_ids)], dtype=bool)
+
+        this_vel = np.asarray(env.k.vehicle.get_speed(veh_ids), dtype=float)
+        sim_step = env.sim_step
+        next_vel = this_vel + actions * sim_step
+        h = np.asarray(env.k.vehicle.get_headway(veh_ids), dtype=float)
+
+        # vehicles that will crash into the vehicle ahead of them in the next
+        # time step are stopped immediately
+        crash = has_leader & (next_vel > 0) & (
+            h < sim_step * next_vel + this_vel * 1e-3 +
+            0.5 * this_vel * sim_step)
+
+        return np.where(crash, -this_vel / sim_step, actions)
+
+    def get_safe_velocity_actions(self, env, veh_ids, actions):
+        """Perform the "safe_velocity" failsafe action for several vehicles.
+
+        See get_safe_velocity_action.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            current environment, which contains information of the state of the
+            network at the current time step
+        veh_ids : list of str
+            names of the vehicles
+        actions : np.ndarray
+            requested acceleration actions
+
+        Returns
+        -------
+        np.ndarray
+            the requested actions clipped by the safe velocity
+        """
+        if env.k.vehicle.num_vehicles == 1:
+            # if there is only one vehicle in the network, all actions are safe
+            return actions
+
+        safe_velocity = self.safe_velocities(env, veh_ids)
+
+        this_vel = np.asarray(env.k.vehicle.get_speed(veh_ids), dtype=float)
+        sim_step = env.sim_step
+
+        return np.where(
+            this_vel + actions * sim_step > safe_velocity,
+            np.where(safe_velocity > 0,
+                     (safe_velocity - this_vel) / sim_step,
+                     -this_vel / sim_step),
+            actions)
+
     def safe_velocity(self, env):
         """Compute a safe velocity for the vehicles.
 
@@ -224,3 +434,32 @@ class BaseController:
         v_safe = 2 * h / env.sim_step + dv - this_vel * (2 * self.delay)
 
         return v_safe
+
+    def safe_velocities(self, env, veh_ids):
+        """Compute the safe velocities of several vehicles.
+
+        See safe_velocity.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            current environment, which contains information of the state of the
+            network at the current time step
+        veh_ids : list of str
+            names of the vehicles
+
+        Returns
+        -------
+        np.ndarray
+            maximum safe velocity of every vehicle
+        """
+        lead_vel = self._get_values(
+            env.k.vehicle.get_speed, env.k.vehicle.get_leader(veh_ids))
+        this_vel = np.asarray(env.k.vehicle.get_speed(veh_ids), dtype=float)
+
+        h = np.asarray(env.k.vehicle.get_headway(veh_ids), dtype=float)
+        dv = lead_vel - this_vel
+
+        v_safe = 2 * h / env.sim_step + dv - this_vel * (2 * self.delay)
+
+        return v_safe
@@ -15,8 +15,20 @@ class BaseLaneChangeController:
         Dictionary of lane changes params that may optional contain
         "min_gap", which denotes the minimize safe gap (in meters) a car
         is willing to lane-change into.
+
+    Attributes
+    ----------
+    required_vehicle_variables : tuple of str
+        optional vehicle variables read by the controller, see
+        flow.envs.Env.required_vehicle_variables
+    stateless : bool
+        whether the controller may be shared by all vehicles of a type (see
+        flow.controllers.BaseController)
     """
 
+    required_vehicle_variables = ()
+    stateless = False
+
     def __init__(self, veh_id, lane_change_params=None):
         """Instantiate the base class for lane-changing controllers."""
         if lane_change_params is None:
@@ -13,8 +13,27 @@ class BaseRouter:
         ID of the vehicle this controller is used for
     router_params : dict
         Dictionary of router params
+
+    Attributes
+    ----------
+    required_vehicle_variables : tuple of str
+        optional vehicle variables read by the controller, see
+        flow.envs.Env.required_vehicle_variables. Routers generally read the
+        current route of the vehicle.
+    stateless : bool
+        whether the router holds no state specific to its vehicle, in which
+        case a single router is shared by all vehicles of a type (see
+        flow.controllers.BaseController)
+    event_driven : bool
+        whether the router only acts when its vehicle enters a new edge or
+        the network. Such routers are only called in the steps following
+        these events, while other routers are called at every step.
     """
 
+    required_vehicle_variables = ('route',)
+    stateless = False
+    event_driven = False
+
     def __init__(self, veh_id, router_params):
         """Instantiate the base class for routing controllers."""
         self.veh_id = veh_id
@@ -42,6 +42,8 @@ class CFMController(BaseController):
         to no failsafe (None)
     """
 
+    stateless = True
+
     def __init__(self,
                  veh_id,
                  car_following_params,
@@ -83,6 +85,23 @@ class CFMController(BaseController):
         return self.k_d*(d_l - self.d_des) + self.k_v*(lead_vel - this_vel) + \
             self.k_c*(self.v_des - this_vel)
 
+    def get_accels(self, env, veh_ids):
+        """See parent class."""
+        leaders = env.k.vehicle.get_leader(veh_ids)
+        has_leader = np.array(
+            [bool(lead_id) for lead_id in leaders], dtype=bool)
+
+        lead_vel = self._get_values(env.k.vehicle.get_speed, leaders)
+        this_vel = np.asarray(env.k.vehicle.get_speed(veh_ids), dtype=float)
+
+        d_l = np.asarray(env.k.vehicle.get_headway(veh_ids), dtype=float)
+
+        accel = self.k_d*(d_l - self.d_des) + \
+            self.k_v*(lead_vel - this_vel) + self.k_c*(self.v_des - this_vel)
+
+        # vehicles with no car ahead
+        return np.where(has_leader, accel, self.max_accel)
+
 
 class BCMController(BaseController):
     """Bilateral car-following model controller.
@@ -114,6 +133,11 @@ class BCMController(BaseController):
         to no failsafe (None)
     """
 
+    stateless = True
+
+    # the model also reads the speed and headway of the following vehicle
+    required_vehicle_variables = ('leader', 'follower')
+
     def __init__(self,
                  veh_id,
                  car_following_params,
@@ -167,6 +191,28 @@ class BCMController(BaseController):
             self.k_v * ((lead_vel - this_vel) - (this_vel - trail_vel)) + \
             self.k_c * (self.v_des - this_vel)
 
+    def get_accels(self, env, veh_ids):
+        """See parent class."""
+        leaders = env.k.vehicle.get_leader(veh_ids)
+        has_leader = np.array(
+            [bool(lead_id) for lead_id in leaders], dtype=bool)
+
+        lead_vel = self._get_values(env.k.vehicle.get_speed, leaders)
+        this_vel = np.asarray(env.k.vehicle.get_speed(veh_ids), dtype=float)
+
+        trailers = env.k.vehicle.get_follower(veh_ids)
+        trail_vel = self._get_values(env.k.vehicle.get_speed, trailers)
+
+        headway = np.asarray(env.k.vehicle.get_headway(veh_ids), dtype=float)
+        footway = self._get_values(env.k.vehicle.get_headway, trailers)
+
+        accel = self.k_d * (headway - footway) + \
+            self.k_v * ((lead_vel - this_vel) - (this_vel - trail_vel)) + \
+            self.k_c * (self.v_des - this_vel)
+
+        # vehicles with no car ahead
+        return np.where(has_leader, accel, self.max_accel)
+
 
 class OVMController(BaseController):
     """Optimal Vehicle Model controller.
@@ -198,6 +244,8 @@ class OVMController(BaseController):
         to no failsafe (None)
     """
 
+    stateless = True
+
     def __init__(self,
                  veh_id,
                  car_following_params,
@@ -246,6 +294,30 @@ class OVMController(BaseController):
 
         return self.alpha * (v_h - this_vel) + self.beta * h_dot
 
+    def get_accels(self, env, veh_ids):
+        """See parent class."""
+        leaders = env.k.vehicle.get_leader(veh_ids)
+        has_leader = np.array(
+            [bool(lead_id) for lead_id in leaders], dtype=bool)
+
+        lead_vel = self._get_values(env.k.vehicle.get_speed, leaders)
+        this_vel = np.asarray(env.k.vehicle.get_speed(veh_ids), dtype=float)
+        h = np.asarray(env.k.vehicle.get_headway(veh_ids), dtype=float)
+        h_dot = lead_vel - this_vel
+
+        # V function here - input: h, output : Vh
+        v_h = np.where(
+            h <= self.h_st, 0,
+            np.where(h < self.h_go,
+                     self.v_max / 2 * (1 - np.cos(np.pi * (h - self.h_st) /
+                                                  (self.h_go - self.h_st))),
+                     self.v_max))
+
+        accel = self.alpha * (v_h - this_vel) + self.beta * h_dot
+
+        # vehicles with no car ahead
+        return np.where(has_leader, accel, self.max_accel)
+
 
 class LinearOVM(BaseController):
     """Linear OVM controller.
@@ -271,6 +343,8 @@ class LinearOVM(BaseController):
         to no failsafe (None)
     """
 
+    stateless = True
+
     def __init__(self,
                  veh_id,
                  car_following_params,
@@ -311,6 +385,21 @@ class LinearOVM(BaseController):
 
         return (v_h - this_vel) / self.adaptation
 
+    def get_accels(self, env, veh_ids):
+        """See parent class."""
+        this_vel = np.asarray(env.k.vehicle.get_speed(veh_ids), dtype=float)
+        h = np.asarray(env.k.vehicle.get_headway(veh_ids), dtype=float)
+
+        # V function here - input: h, output : Vh
+        alpha = 1.689  # the average value from Nakayama paper
+        v_h = np.where(
+            h < self.h_st, 0,
+            np.where(h <= self.h_st + self.v_max / alpha,
+                     alpha * (h - self.h_st),
+                     self.v_max))
+
+        return (v_h - this_vel) / self.adaptation
+
 
 class IDMController(BaseController):
     """Intelligent Driver Model (IDM) controller.
@@ -347,6 +436,8 @@ class IDMController(BaseController):
         to no failsafe (None)
     """
 
+    stateless = True
+
     def __init__(self,
                  veh_id,
                  v0=30,
@@ -396,6 +487,28 @@ class IDMController(BaseController):
 
         return self.a * (1 - (v / self.v0)**self.delta - (s_star / h)**2)
 
+    def get_accels(self, env, veh_ids):
+        """See parent class."""
+        v = np.asarray(env.k.vehicle.get_speed(veh_ids), dtype=float)
+        leaders = env.k.vehicle.get_leader(veh_ids)
+        h = np.asarray(env.k.vehicle.get_headway(veh_ids), dtype=float)
+
+        # in order to deal with ZeroDivisionError
+        h = np.where(np.abs(h) < 1e-3, 1e-3, h)
+
+        # no car ahead for vehicles whose leaders are None or ''
+        has_leader = np.array(
+            [bool(lead_id) for lead_id in leaders], dtype=bool)
+        lead_vel = self._get_values(env.k.vehicle.get_speed, leaders)
+        s_star = np.where(
+            has_leader,
+            self.s0 + np.maximum(
+                0, v * self.T + v * (v - lead_vel) /
+                (2 * np.sqrt(self.a * self.b))),
+            0)
+
+        return self.a * (1 - (v / self.v0)**self.delta - (s_star / h)**2)
+
 
 class SimCarFollowingController(BaseController):
     """Controller whose actions are purely defined by the simulator.
@@ -405,6 +518,15 @@ class SimCarFollowingController(BaseController):
     available through sumo when initializing the parameters of the vehicle.
     """
 
+    stateless = True
+
+    # the accelerations of the vehicle are specified by sumo
+    required_vehicle_variables = ()
+
     def get_accel(self, env):
         """See parent class."""
         return None
+
+    def get_accels(self, env, veh_ids):
+        """See parent class."""
+        return np.full(len(veh_ids), np.nan)
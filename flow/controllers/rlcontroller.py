@@ -29,6 +29,11 @@ class RLController(BaseController):
         >>> rl_ids = env.k.vehicle.get_rl_ids()
     """
 
+    stateless = True
+
+    # the actions of rl vehicles are specified by the environment
+    required_vehicle_variables = ()
+
     def __init__(self, veh_id, car_following_params):
         """Instantiates an RL Controller."""
         BaseController.__init__(
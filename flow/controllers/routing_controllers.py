@@ -12,6 +12,9 @@ class ContinuousRouter(BaseRouter):
     same route, and repeat said route once it reaches its end.
     """
 
+    stateless = True
+    event_driven = True
+
     def choose_route(self, env):
         """Adopt the current edge's route if about to leave the network."""
         if len(env.k.vehicle.get_route(self.veh_id)) == 0:
@@ -31,6 +34,11 @@ class MinicityRouter(BaseRouter):
     This class allows the vehicle to pick a random route at junctions.
     """
 
+    stateless = True
+    # the next edges depend on the lane of the vehicle, which may change
+    # while it stays on the same edge
+    event_driven = False
+
     def choose_route(self, env):
         """See parent class."""
         vehicles = env.k.vehicle
@@ -63,6 +71,9 @@ class MinicityRouter(BaseRouter):
 class GridRouter(BaseRouter):
     """A router used to re-route a vehicle within a grid environment."""
 
+    stateless = True
+    event_driven = True
+
     def choose_route(self, env):
         if len(env.k.vehicle.get_route(self.veh_id)) == 0:
             # this occurs to inflowing vehicles, whose information is not added
@@ -81,6 +92,9 @@ class BayBridgeRouter(ContinuousRouter):
     Extension to the Continuous Router.
     """
 
+    # the route also depends on the lane of the vehicle
+    event_driven = False
+
     def choose_route(self, env):
         """See parent class."""
         edge = env.k.vehicle.get_edge(self.veh_id)
@@ -16,6 +16,8 @@ class FollowerStopper(BaseController):
         desired speed of the vehicles (m/s)
     """
 
+    stateless = True
+
     def __init__(self,
                  veh_id,
                  car_following_params,
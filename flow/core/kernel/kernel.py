@@ -1,6 +1,7 @@
 """Script containing the Flow kernel object for interacting with simulators."""
 
-from flow.core.kernel.simulation import TraCISimulation, AimsunKernelSimulation
+from flow.core.kernel.simulation import TraCISimulation, \
+    LibsumoSimulation, AimsunKernelSimulation
 from flow.core.kernel.scenario import TraCIScenario, AimsunKernelScenario
 from flow.core.kernel.vehicle import TraCIVehicle, AimsunKernelVehicle
 from flow.core.kernel.traffic_light import TraCITrafficLight, \
@@ -50,7 +51,7 @@ class Kernel(object):
         Parameters
         ----------
         simulator : str
-            simulator type, must be one of {"traci"}
+            simulator type, must be one of {"traci", "libsumo", "aimsun"}
         sim_params : flow.core.params.SimParams
             simulation-specific parameters
 
@@ -66,6 +67,13 @@ class Kernel(object):
             self.scenario = TraCIScenario(self, sim_params)
             self.vehicle = TraCIVehicle(self, sim_params)
             self.traffic_light = TraCITrafficLight(self)
+        elif simulator == "libsumo":
+            # sumo is run within the Python process, and accessed through the
+            # same interface as traci
+            self.simulation = LibsumoSimulation(self)
+            self.scenario = TraCIScenario(self, sim_params)
+            self.vehicle = TraCIVehicle(self, sim_params)
+            self.traffic_light = TraCITrafficLight(self)
         elif simulator == 'aimsun':
             self.simulation = AimsunKernelSimulation(self)
             self.scenario = AimsunKernelScenario(self, sim_params)
@@ -104,5 +112,5 @@ class Kernel(object):
 
     def close(self):
         """Terminate all components within the simulation and scenario."""
-        self.scenario.close()
         self.simulation.close()
+        self.scenario.close()
@@ -1,9 +1,7 @@
 """Script containing the base scenario kernel class."""
 
 import logging
-import random
 import numpy as np
-from copy import deepcopy
 from flow.utils.exceptions import FatalFlowError
 
 # length of vehicles in the network, in meters
@@ -73,6 +71,11 @@ class KernelScenario(object):
         self.total_edgestarts = None
         self.total_edgestarts_dict = None
 
+        # random number generator of the starting positions, and the seed it
+        # was created from (see _start_pos_rng)
+        self._rng = None
+        self._rng_seed = None
+
     def generate_network(self, network):
         """Generate the necessary prerequisites for the simulating a network.
 
@@ -264,6 +267,51 @@ class KernelScenario(object):
         num_vehicles : int
             number of vehicles to be placed on the network
 
+        Returns
+        -------
+        list of tuple (float, float)
+            list of start positions [(edge0, pos0), (edge1, pos1), ...]
+        list of int
+            list of start lanes
+        """
+        return self._start_pos_lists(
+            self._gen_even_start_pos, initial_config, num_vehicles)
+
+    def gen_random_start_pos(self, initial_config, num_vehicles):
+        """Generate random starting positions.
+
+        Parameters
+        ----------
+        initial_config : flow.core.params.InitialConfig
+            see flow/core/params.py
+        num_vehicles : int
+            number of vehicles to be placed on the network
+
+        Returns
+        -------
+        list of tuple (float, float)
+            list of start positions [(edge0, pos0), (edge1, pos1), ...]
+        list of int
+            list of start lanes
+        """
+        return self._start_pos_lists(
+            self._gen_random_start_pos, initial_config, num_vehicles)
+
+    def _start_pos_lists(self, method, initial_config, num_vehicles):
+        """Convert the arrays of a starting position generator into lists.
+
+        If edges_distribution is a dict, the generator is called separately on
+        every edge of the dict, with the number of vehicles specified for it.
+
+        Parameters
+        ----------
+        method : callable
+            one of _gen_even_start_pos and _gen_random_start_pos
+        initial_config : flow.core.params.InitialConfig
+            see flow/core/params.py
+        num_vehicles : int
+            number of vehicles to be placed on the network
+
         Returns
         -------
         list of tuple (float, float)
@@ -280,32 +328,67 @@ class KernelScenario(object):
                 'Number of vehicles in edges_distribution and the Vehicles ' \
                 'class do not match: {}, {}'.format(num_vehicles,
                                                     num_vehicles_e)
+            groups = [([edge], num) for edge, num in
+                      initial_config.edges_distribution.items()]
+        else:
+            groups = [(None, num_vehicles)]
 
-            # add starting positions and lanes
-            edges_distribution = deepcopy(initial_config.edges_distribution)
-            startpositions, startlanes = [], []
-            for key in edges_distribution:
-                # set the edge distribution to only include the next edge
-                initial_config.edges_distribution = [key]
-                # set the number of vehicles that this edge can carry
-                num_vehicles = edges_distribution[key]
-                # recursively collect the next starting positions and lanes
-                pos, lane = self.gen_even_start_pos(
-                    initial_config, num_vehicles)
-                startpositions.extend(pos)
-                startlanes.extend(lane)
-            return startpositions, startlanes
+        startpositions, startlanes = [], []
+        for edges_distribution, num in groups:
+            edges, edge_index, pos, lanes = method(
+                initial_config, num, edges_distribution)
+            startpositions.extend(
+                (edges[i], p) for i, p in zip(edge_index.tolist(),
+                                              pos.tolist()))
+            startlanes.extend(lanes.tolist())
 
+        return startpositions, startlanes
+
+    def _gen_even_start_pos(self, initial_config, num_vehicles,
+                            edges_distribution=None):
+        """Generate the arrays of uniformly spaced starting positions.
+
+        Vehicles are placed by advancing along the network by a constant
+        increment, and filling the available lanes of the edge reached every
+        time. Consecutive increments that land on edges that do not require
+        any adjustment (internal, unavailable, or too close to the start of
+        an edge with a different number of lanes) are computed in bulk, while
+        the increments that do are processed one at a time.
+
+        Parameters
+        ----------
+        initial_config : flow.core.params.InitialConfig
+            see flow/core/params.py
+        num_vehicles : int
+            number of vehicles to be placed on the network
+        edges_distribution : list of str, optional
+            edges vehicles are placed on, overriding the ones specified in
+            initial_config
+
+        Returns
+        -------
+        list of str
+            names of the edges in total_edgestarts
+        np.ndarray of int
+            index of the starting edge of every vehicle in the above list
+        np.ndarray of float
+            starting position of every vehicle on its edge
+        np.ndarray of int
+            starting lane of every vehicle
+        """
         (x0, min_gap, bunching, lanes_distr, available_length,
-         available_edges, initial_config) = \
-            self._get_start_pos_util(initial_config, num_vehicles)
+         available_edges, initial_config) = self._get_start_pos_util(
+            initial_config, num_vehicles, edges_distribution)
 
-        # return an empty list of starting positions and lanes if there are no
-        # vehicles to be placed
+        names = [edge for edge, _ in self.total_edgestarts]
+
+        # return empty arrays if there are no vehicles to be placed
         if num_vehicles == 0:
-            return [], []
+            return names, np.zeros(0, dtype=int), np.zeros(0), \
+                np.zeros(0, dtype=int)
 
         increment = available_length / num_vehicles
+        length = self.length()
 
         # when consecutive edges do not have the same number of lanes, vehicles
         # are not allowed to be in between edges (as a lane might not exist on
@@ -315,26 +398,81 @@ class KernelScenario(object):
         if any(lanes[0] != lanes[i] for i in range(1, len(lanes))):
             flag = True
 
+        internal_edges = set(dict(self.internal_edgestarts))
+        available_edges = set(available_edges)
+        first_index = {edge: i for i, edge in reversed(list(enumerate(names)))}
+        starts = np.array([pos for _, pos in self.total_edgestarts],
+                          dtype=float)
+        # number of vehicles placed side-by-side on every edge vehicles may be
+        # placed on without any adjustment (0 for the other edges)
+        edge_lanes = np.array([
+            min(self.num_lanes(edge), lanes_distr)
+            if edge in available_edges and edge not in internal_edges else 0
+            for edge in names], dtype=int)
+
         x = x0
         car_count = 0
-        startpositions, startlanes = [], []
+        chunk = 64
+        edge_index, positions, start_lanes = [], [], []
 
-        # generate uniform starting positions
         while car_count < num_vehicles:
+            remaining = num_vehicles - car_count
+            m = min(chunk, remaining)
+
+            # positions reached by the next m increments, accumulated in the
+            # same order as they would be one at a time. The modulo by the
+            # length of the network is only a no-op within [0, length), so
+            # increments leaving this range are processed one at a time
+            steps = np.empty(3 * m - 2)
+            steps[0] = x
+            steps[1::3] = increment
+            steps[2::3] = VEHICLE_LENGTH
+            steps[3::3] = min_gap
+            xs = np.add.accumulate(steps)[::3]
+
+            index = np.searchsorted(starts, xs, side='right') - 1
+            valid = index >= 0
+            index = np.maximum(index, 0)
+            rel_pos = xs - starts[index]
+            valid &= edge_lanes[index] > 0
+            valid[1:] &= (xs[1:] >= 0) & (xs[1:] < length)
+            if flag:
+                valid &= rel_pos >= VEHICLE_LENGTH
+            num_valid = m if valid.all() else int(np.argmin(valid))
+
+            if num_valid > 0:
+                counts = edge_lanes[index[:num_valid]]
+                total = np.cumsum(counts)
+                if total[-1] >= remaining:
+                    # only fill the lanes needed to place the last vehicles
+                    num_valid = int(np.searchsorted(total, remaining)) + 1
+                    counts = counts[:num_valid].copy()
+                    counts[-1] -= total[num_valid - 1] - remaining
+                    total = np.cumsum(counts)
+                edge_index.append(np.repeat(index[:num_valid], counts))
+                positions.append(np.repeat(rel_pos[:num_valid], counts))
+                start_lanes.append(np.arange(total[-1]) - np.repeat(
+                    total - counts, counts))
+                car_count += int(total[-1])
+                x = (float(xs[num_valid - 1]) + increment + VEHICLE_LENGTH
+                     + min_gap) % length
+
+            if num_valid == m:
+                chunk *= 2
+                continue
+            if car_count == num_vehicles:
+                break
+
             # collect the position and lane number of each new vehicle
             pos = self.get_edge(x)
 
             # ensures that vehicles are not placed in an internal junction
-            while pos[0] in dict(self.internal_edgestarts).keys():
-                # find the location of the internal edge in total_edgestarts,
-                # which has the edges ordered by position
-                edges = [tup[0] for tup in self.total_edgestarts]
-                indx_edge = next(
-                    i for i, edge in enumerate(edges) if edge == pos[0])
-
-                # take the next edge in the list, and place the car at the
-                # beginning of this edge
-                if indx_edge == len(edges) - 1:
+            while pos[0] in internal_edges:
+                # take the next edge in total_edgestarts, which has the edges
+                # ordered by position, and place the car at the beginning of
+                # this edge
+                indx_edge = first_index[pos[0]]
+                if indx_edge == len(names) - 1:
                     next_edge_pos = self.total_edgestarts[0]
                 else:
                     next_edge_pos = self.total_edgestarts[indx_edge + 1]
@@ -344,7 +482,7 @@ class KernelScenario(object):
 
             # ensures that you are in an acceptable edge
             while pos[0] not in available_edges:
-                x = (x + self.edge_length(pos[0])) % self.length()
+                x = (x + self.edge_length(pos[0])) % length
                 pos = self.get_edge(x)
 
             # ensure that in variable lane settings vehicles always start a
@@ -358,29 +496,37 @@ class KernelScenario(object):
                              (num_vehicles - car_count)
 
             # place vehicles side-by-side in all available lanes on this edge
-            for lane in range(min([self.num_lanes(pos[0]), lanes_distr])):
-                car_count += 1
-                startpositions.append(pos)
-                startlanes.append(lane)
+            num_lanes = min(self.num_lanes(pos[0]), lanes_distr,
+                            num_vehicles - car_count)
+            edge_index.append(np.full(num_lanes, first_index[pos[0]]))
+            positions.append(np.full(num_lanes, pos[1], dtype=float))
+            start_lanes.append(np.arange(num_lanes))
+            car_count += num_lanes
 
-                if car_count == num_vehicles:
-                    break
+            x = (x + increment + VEHICLE_LENGTH + min_gap) % length
 
-            x = (x + increment + VEHICLE_LENGTH + min_gap) % self.length()
+        edge_index = np.concatenate(edge_index)
+        positions = np.concatenate(positions)
+        start_lanes = np.concatenate(start_lanes)
 
         # add a perturbation to each vehicle, while not letting the vehicle
         # leave its current edge
         if initial_config.perturbation > 0:
-            for i in range(num_vehicles):
-                perturb = np.random.normal(0, initial_config.perturbation)
-                edge, pos = startpositions[i]
-                pos = max(0, min(self.edge_length(edge), pos + perturb))
-                startpositions[i] = (edge, pos)
+            rng = self._start_pos_rng(initial_config)
+            perturb = rng.normal(0, initial_config.perturbation, num_vehicles)
+            edge_length = np.array([self.edge_length(edge) for edge in names])
+            positions = np.clip(
+                positions + perturb, 0, edge_length[edge_index])
 
-        return startpositions, startlanes
+        return names, edge_index, positions, start_lanes
 
-    def gen_random_start_pos(self, initial_config, num_vehicles):
-        """Generate random starting positions.
+    def _gen_random_start_pos(self, initial_config, num_vehicles,
+                              edges_distribution=None):
+        """Generate the arrays of random starting positions.
+
+        Random positions are drawn over the concatenation of the lanes of the
+        available edges, and then mapped back to the edge and lane they fall
+        on.
 
         Parameters
         ----------
@@ -388,42 +534,24 @@ class KernelScenario(object):
             see flow/core/params.py
         num_vehicles : int
             number of vehicles to be placed on the network
+        edges_distribution : list of str, optional
+            edges vehicles are placed on, overriding the ones specified in
+            initial_config
 
         Returns
         -------
-        list of tuple (float, float)
-            list of start positions [(edge0, pos0), (edge1, pos1), ...]
-        list of int
-            list of start lanes
+        list of str
+            names of the edges vehicles may be placed on
+        np.ndarray of int
+            index of the starting edge of every vehicle in the above list
+        np.ndarray of float
+            starting position of every vehicle on its edge
+        np.ndarray of int
+            starting lane of every vehicle
         """
-        if isinstance(initial_config.edges_distribution, dict):
-            # check that the number of vehicle in edges_distribution matches
-            # that of the vehicles class
-            num_vehicles_e = sum(initial_config.edges_distribution[k]
-                                 for k in initial_config.edges_distribution)
-            assert num_vehicles == num_vehicles_e, \
-                'Number of vehicles in edges_distribution and the Vehicles ' \
-                'class do not match: {}, {}'.format(num_vehicles,
-                                                    num_vehicles_e)
-
-            # add starting positions and lanes
-            edges_distribution = deepcopy(initial_config.edges_distribution)
-            startpositions, startlanes = [], []
-            for key in edges_distribution:
-                # set the edge distribution to only include the next edge
-                initial_config.edges_distribution = [key]
-                # set the number of vehicles that this edge can carry
-                num_vehicles = edges_distribution[key]
-                # recursively collect the next starting positions and lanes
-                pos, lane = self.gen_random_start_pos(
-                    initial_config, num_vehicles)
-                startpositions.extend(pos)
-                startlanes.extend(lane)
-            return startpositions, startlanes
-
         (x0, min_gap, bunching, lanes_distr, available_length,
          available_edges, initial_config) = self._get_start_pos_util(
-            initial_config, num_vehicles)
+            initial_config, num_vehicles, edges_distribution)
 
         # extra space a vehicle needs to cover from the start of an edge to be
         # fully in the edge and not risk having a gap with a vehicle behind it
@@ -434,46 +562,60 @@ class KernelScenario(object):
             available_length -= efs * min([self.num_lanes(edge), lanes_distr])
 
         # choose random positions for each vehicle
-        init_absolute_pos = [random.random() * available_length
-                             for _ in range(num_vehicles)]
-        init_absolute_pos.sort()
+        rng = self._start_pos_rng(initial_config)
+        init_absolute_pos = np.sort(
+            rng.random_sample(num_vehicles) * available_length)
 
         # these positions do not include the length of the vehicle, which need
         # to be added
-        for i in range(num_vehicles):
-            init_absolute_pos[i] += (VEHICLE_LENGTH + min_gap) * i
-
-        decrement = 0
-        edge_indx = 0
-        startpositions = []
-        startlanes = []
-        for i in range(num_vehicles):
-            edge_i = available_edges[edge_indx]
-            pos_i = (init_absolute_pos[i] - decrement) % (
-                    self.edge_length(edge_i) - efs)
-            lane_i = int(((init_absolute_pos[i] - decrement) - pos_i) /
-                         (self.edge_length(edge_i) - efs))
-
-            pos_i += efs
-
-            while lane_i > min([self.num_lanes(edge_i), lanes_distr]) - 1:
-                decrement += min([self.num_lanes(edge_i), lanes_distr]) \
-                             * (self.edge_length(edge_i) - efs)
-                edge_indx += 1
-
-                edge_i = available_edges[edge_indx]
-                pos_i = (init_absolute_pos[i] - decrement) % (
-                        self.edge_length(edge_i) - efs)
-
-                lane_i = int(((init_absolute_pos[i] - decrement) - pos_i) /
-                             (self.edge_length(edge_i) - efs))
-
-                pos_i += efs
-
-            startpositions.append((edge_i, pos_i))
-            startlanes.append(lane_i)
-
-        return startpositions, startlanes
+        init_absolute_pos += (VEHICLE_LENGTH + min_gap) * np.arange(
+            num_vehicles)
+
+        # the lanes of every edge are laid out one after the other, with
+        # decrement[k] being the total space of the edges before the k-th one
+        edge_lanes = np.array([min(self.num_lanes(edge), lanes_distr)
+                               for edge in available_edges], dtype=int)
+        edge_space = np.array(
+            [self.edge_length(edge) - efs for edge in available_edges],
+            dtype=float)
+        decrement = np.concatenate(
+            ([0.], np.add.accumulate(edge_lanes * edge_space)))
+
+        # start one edge before the one each position falls on, and move on
+        # to the next edges until the position fits within the lanes of the
+        # edge, as rounding may place positions at the boundary of two edges
+        # on either side. Vehicles are never placed on an earlier edge than
+        # the vehicle before them.
+        edge_indx = np.maximum(np.searchsorted(
+            decrement[1:-1], init_absolute_pos, side='right') - 1, 0)
+        while True:
+            edge_indx = np.maximum.accumulate(edge_indx)
+            rel_pos = init_absolute_pos - decrement[edge_indx]
+            pos = np.mod(rel_pos, edge_space[edge_indx])
+            lanes = np.trunc((rel_pos - pos) / edge_space[edge_indx]) \
+                .astype(int)
+            outside = lanes > edge_lanes[edge_indx] - 1
+            if not outside.any():
+                break
+            edge_indx[outside] += 1
+
+        return available_edges, edge_indx, pos + efs, lanes
+
+    def _start_pos_rng(self, initial_config):
+        """Return the random number generator of the starting positions.
+
+        If a seed is specified in initial_config, a generator created from
+        this seed is used (and kept across calls, so that the starting
+        positions of consecutive resets differ, but are reproducible).
+        Otherwise, the global numpy generator is used.
+        """
+        seed = getattr(initial_config, 'seed', None)
+        if seed is None:
+            return np.random
+        if self._rng_seed != seed:
+            self._rng_seed = seed
+            self._rng = np.random.RandomState(seed)
+        return self._rng
 
     def gen_custom_start_pos(self, initial_config, num_vehicles):
         """Generate a user defined set of starting positions.
@@ -501,7 +643,8 @@ class KernelScenario(object):
             num_vehicles=num_vehicles,
         )
 
-    def _get_start_pos_util(self, initial_config, num_vehicles):
+    def _get_start_pos_util(self, initial_config, num_vehicles,
+                            edges_distribution=None):
         """Prepare initial_config data for starting position methods.
 
         Performs some pre-processing to the initial_config and **kwargs terms,
@@ -514,6 +657,9 @@ class KernelScenario(object):
             see flow/core/params.py
         num_vehicles : int
             number of vehicles to be placed on the network
+        edges_distribution : list of str, optional
+            edges vehicles are placed on, overriding the ones specified in
+            initial_config
 
         Returns
         -------
@@ -537,6 +683,9 @@ class KernelScenario(object):
             If there is not enough space to place all vehicles in the allocated
             space in the network with the specified minimum gap.
         """
+        if edges_distribution is None:
+            edges_distribution = initial_config.edges_distribution
+
         min_gap = max(0, initial_config.min_gap)
 
         bunching = initial_config.bunching
@@ -546,13 +695,13 @@ class KernelScenario(object):
             initial_config.bunching = 0
 
         # compute the lanes distribution (adjust of edge cases)
-        if initial_config.edges_distribution == 'all':
+        if edges_distribution == 'all':
             max_lane = max(
                 [self.num_lanes(edge_id) for edge_id in self.get_edge_list()])
         else:
             max_lane = max([
                 self.num_lanes(edge_id)
-                for edge_id in initial_config.edges_distribution
+                for edge_id in edges_distribution
             ])
 
         if initial_config.lanes_distribution > max_lane:
@@ -563,7 +712,7 @@ class KernelScenario(object):
         else:
             lanes_distribution = initial_config.lanes_distribution
 
-        if initial_config.edges_distribution == 'all':
+        if edges_distribution == 'all':
             distribution_length = \
                 sum(self.edge_length(edge_id) *
                     min([self.num_lanes(edge_id), lanes_distribution])
@@ -573,16 +722,16 @@ class KernelScenario(object):
             distribution_length = \
                 sum(self.edge_length(edge_id) *
                     min(self.num_lanes(edge_id), lanes_distribution)
-                    for edge_id in initial_config.edges_distribution
+                    for edge_id in edges_distribution
                     if self.edge_length(edge_id) > min_gap + VEHICLE_LENGTH)
 
-        if initial_config.edges_distribution == 'all':
+        if edges_distribution == 'all':
             available_edges = [
                 edge for edge in self.get_edge_list()
                 if self.edge_length(edge) > min_gap + VEHICLE_LENGTH]
         else:
             available_edges = [
-                edge for edge in initial_config.edges_distribution
+                edge for edge in edges_distribution
                 if self.edge_length(edge) > min_gap + VEHICLE_LENGTH]
 
         available_length = \
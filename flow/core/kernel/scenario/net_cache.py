@@ -0,0 +1,166 @@
+"""Script containing the on-disk cache of the networks generated by sumo."""
+
+from flow.core.util import ensure_dir
+import hashlib
+import os
+import pickle
+import shutil
+import subprocess
+import tempfile
+
+# version of the format of the cache entries, included in every key so that
+# entries written by older versions of flow are ignored
+CACHE_VERSION = 1
+
+# version of netconvert installed, computed once per process
+_netconvert_version = None
+
+
+def netconvert_version():
+    """Return the version string printed by netconvert ('' if unavailable)."""
+    global _netconvert_version
+    if _netconvert_version is None:
+        try:
+            output = subprocess.check_output(
+                ['netconvert', '--version'], stderr=subprocess.DEVNULL)
+            _netconvert_version = output.decode(errors='ignore') \
+                .strip().split('\n')[0]
+        except (OSError, subprocess.CalledProcessError):
+            _netconvert_version = ''
+    return _netconvert_version
+
+
+class NetworkCache(object):
+    """Content-addressed cache of the .net.xml files generated by netconvert.
+
+    Every entry is identified by a hash of the inputs of netconvert (the
+    contents of the node, edge, type and connection files and the processing
+    options), and contains the generated .net.xml file along with the edge and
+    connection data parsed from it. Environments that generate the same
+    network, whether in the same process, in other processes, or after a
+    restart, may then skip netconvert and the parsing of the .net.xml file.
+
+    The cache may be used concurrently by several processes. Every file is
+    written to a temporary file in the cache directory before being renamed
+    to its final name, which is atomic, and the parsed data of an entry is
+    written after its .net.xml file, so that an entry is only ever read once
+    it is complete. Processes that miss the same entry at the same time all
+    generate the network, and the last one to finish replaces the (identical)
+    entry of the others.
+
+    Entries are never evicted. The cache directory may be deleted at any
+    time to free the disk space used by the cache.
+    """
+
+    def __init__(self, path):
+        """Instantiate the cache.
+
+        Parameters
+        ----------
+        path : str
+            directory containing the entries of the cache, created if needed
+        """
+        self.path = ensure_dir(path)
+
+    @staticmethod
+    def key(input_files, options):
+        """Compute the key of a network.
+
+        Parameters
+        ----------
+        input_files : list of str
+            paths to the files netconvert generates the network from. Only the
+            contents of the files are hashed, not their names.
+        options : list of str
+            the options netconvert is called with, excluding the paths to the
+            input and output files
+
+        Returns
+        -------
+        str
+            hexadecimal key of the network
+        """
+        h = hashlib.sha256()
+        h.update(repr((CACHE_VERSION, netconvert_version(), sorted(options)))
+                 .encode())
+        for fn in input_files:
+            with open(fn, 'rb') as f:
+                contents = f.read()
+            # the length separates the contents of consecutive files
+            h.update(str(len(contents)).encode() + b':' + contents)
+        return h.hexdigest()
+
+    def load(self, key, net_path):
+        """Load a network from the cache.
+
+        Parameters
+        ----------
+        key : str
+            key of the network (see key)
+        net_path : str
+            path the cached .net.xml file is copied to
+
+        Returns
+        -------
+        dict or None
+            edge data of the network (see
+            TraCIScenario._import_edges_from_net), or None if the network is
+            not in the cache
+        dict or None
+            connection data of the network, or None if the network is not in
+            the cache
+        """
+        try:
+            with open(self._data_path(key), 'rb') as f:
+                edges, connections = pickle.load(f)
+            shutil.copyfile(self._net_path(key), net_path)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            # the entry does not exist (or was deleted while being read)
+            return None, None
+
+        return edges, connections
+
+    def store(self, key, net_path, edges, connections):
+        """Add a network to the cache.
+
+        Parameters
+        ----------
+        key : str
+            key of the network (see key)
+        net_path : str
+            path to the .net.xml file generated by netconvert
+        edges : dict
+            edge data of the network
+        connections : dict
+            connection data of the network
+        """
+        try:
+            with open(net_path, 'rb') as f:
+                self._write(self._net_path(key), f.read())
+            self._write(self._data_path(key), pickle.dumps(
+                (edges, connections), protocol=pickle.HIGHEST_PROTOCOL))
+        except OSError as e:
+            # failing to cache a network does not prevent it from being used
+            print('Error while caching the network: {}'.format(e))
+
+    def _net_path(self, key):
+        """Return the path to the .net.xml file of an entry."""
+        return os.path.join(self.path, '%s.net.xml' % key)
+
+    def _data_path(self, key):
+        """Return the path to the parsed data of an entry."""
+        return os.path.join(self.path, '%s.pkl' % key)
+
+    def _write(self, path, contents):
+        """Atomically write the contents of a file."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(contents)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
@@ -0,0 +1,260 @@
+"""Script containing the importer of the edges and connections of networks.
+
+The edges and connections of a network are parsed into numpy-backed tables
+by streaming through the .net.xml file, so that the whole document never has
+to be held in memory. The tables may then be stored in a binary sidecar file
+next to the .net.xml file, from which later imports load them directly
+instead of parsing the .net.xml file again.
+"""
+
+from lxml import etree
+import numpy as np
+import os
+import tempfile
+import zipfile
+
+# version of the format of the sidecar files. Sidecar files of other versions
+# are ignored
+SIDECAR_VERSION = 1
+
+# suffix appended to the path of a .net.xml file to obtain its sidecar file
+SIDECAR_SUFFIX = '.tables.npz'
+
+
+def parse_net(net_path):
+    """Parse the edges and connections of a .net.xml file into tables.
+
+    The file is parsed incrementally with ``iterparse``, and every top-level
+    element is discarded once it has been processed.
+
+    Parameters
+    ----------
+    net_path : str
+        path to the .net.xml file
+
+    Returns
+    -------
+    dict of np.ndarray
+        the tables of the network:
+
+        * names: names of the edges, junctions and lanes referenced in the
+          file, which the other tables refer to by index
+        * edge: name of every edge/junction
+        * edge_lanes: number of lanes of every edge/junction
+        * edge_speed: speed limit of every edge/junction (NaN if unknown)
+        * edge_length: length of every edge/junction (NaN if it has no lanes)
+        * conn_from, conn_from_lane, conn_to, conn_to_lane: edge/lane pairs
+          every connection goes from and to
+        * conn_via, conn_via_lane: internal edge/lane pair every connection
+          passes through (-1 if none)
+    """
+    names = {}
+
+    def name_index(name):
+        if name not in names:
+            names[name] = len(names)
+        return names[name]
+
+    type_speed = {}
+    edge, edge_type, edge_lanes, edge_speed, edge_length = [], [], [], [], []
+    conn = []
+
+    # only the top-level elements of interest are reported, once they (and
+    # their children) have been parsed
+    context = etree.iterparse(
+        net_path, events=('end',), tag=('type', 'edge', 'connection'),
+        recover=True, huge_tree=True)
+    for _, elem in context:
+        if elem.tag == 'type':
+            type_speed[elem.get('id')] = float(elem.get('speed', 'nan'))
+
+        elif elem.tag == 'edge':
+            lanes = len(elem)
+            speed = length = float('nan')
+            if lanes > 0:
+                length = float(elem[0].get('length'))
+                speed = float(elem[0].get('speed', 'nan'))
+            edge.append(name_index(elem.get('id')))
+            edge_type.append(elem.get('type'))
+            edge_lanes.append(lanes)
+            edge_speed.append(speed)
+            edge_length.append(length)
+
+        elif elem.tag == 'connection':
+            via = elem.get('via')
+            via, via_lane = (-1, -1) if via is None else via.rsplit('_', 1)
+            conn.append((name_index(elem.get('from')),
+                         int(elem.get('fromLane')),
+                         name_index(elem.get('to')),
+                         int(elem.get('toLane')),
+                         -1 if via == -1 else name_index(via),
+                         int(via_lane)))
+
+        # discard the elements that were processed, as well as the elements
+        # preceding them that were not of interest
+        elem.clear()
+        parent = elem.getparent()
+        while elem.getprevious() is not None:
+            del parent[0]
+
+    # the speed of the type of an edge takes precedence over the speed of its
+    # first lane
+    edge_speed = np.array(edge_speed, dtype=float)
+    for i, typ in enumerate(edge_type):
+        if not np.isnan(type_speed.get(typ, float('nan'))):
+            edge_speed[i] = type_speed[typ]
+
+    conn = np.array(conn, dtype=np.int64).reshape(-1, 6)
+    return {
+        'names': np.array(list(names.keys()), dtype=str),
+        'edge': np.array(edge, dtype=np.int64),
+        'edge_lanes': np.array(edge_lanes, dtype=np.int64),
+        'edge_speed': edge_speed,
+        'edge_length': np.array(edge_length, dtype=float),
+        'conn_from': conn[:, 0],
+        'conn_from_lane': conn[:, 1],
+        'conn_to': conn[:, 2],
+        'conn_to_lane': conn[:, 3],
+        'conn_via': conn[:, 4],
+        'conn_via_lane': conn[:, 5],
+    }
+
+
+def tables_to_dicts(tables, no_internal_links):
+    """Convert the tables of a network to its edge and connection data.
+
+    Parameters
+    ----------
+    tables : dict of np.ndarray
+        the tables of the network (see parse_net)
+    no_internal_links : bool
+        whether the network has no internal links. If it does, connections
+        from an edge lead to the internal lane they pass through.
+
+    Returns
+    -------
+    net_data : dict <dict>
+        Key = name of the edge/junction
+        Element = lanes, speed, length
+    connection_data : dict < dict < list < (edge, pos) > > >
+        Key = "prev" or "next", indicating coming from or to this
+        edge/lane pair
+            Key = name of the edge
+                Key = lane index
+                Element = list of edge/lane pairs preceding or following
+                the edge/lane pairs
+    """
+    names = tables['names'].tolist()
+
+    net_data = dict()
+    for edge, lanes, speed, length in zip(
+            tables['edge'].tolist(), tables['edge_lanes'].tolist(),
+            tables['edge_speed'].tolist(), tables['edge_length'].tolist()):
+        net_data[names[edge]] = {
+            # if no speed value is present anywhere, set it to some default
+            'speed': 30 if speed != speed else speed,
+            'lanes': lanes,
+        }
+        if lanes > 0:
+            net_data[names[edge]]['length'] = length
+
+    # connections from edges that are not internal links lead to the internal
+    # lane they pass through, if the network has internal links
+    from_edge = tables['conn_from']
+    is_internal = np.array([name.startswith(':') for name in names],
+                           dtype=bool)
+    use_via = np.zeros(len(from_edge), dtype=bool)
+    if not no_internal_links:
+        use_via = ~is_internal[from_edge] & (tables['conn_via'] >= 0)
+    to_edge = np.where(use_via, tables['conn_via'], tables['conn_to'])
+    to_lane = np.where(use_via, tables['conn_via_lane'],
+                       tables['conn_to_lane'])
+
+    next_conn_data = dict()  # forward looking connections
+    prev_conn_data = dict()  # backward looking connections
+    for from_edge, from_lane, to_edge, to_lane in zip(
+            from_edge.tolist(), tables['conn_from_lane'].tolist(),
+            to_edge.tolist(), to_lane.tolist()):
+        from_edge, to_edge = names[from_edge], names[to_edge]
+        next_conn_data.setdefault(from_edge, dict()) \
+            .setdefault(from_lane, list()).append((to_edge, to_lane))
+        prev_conn_data.setdefault(to_edge, dict()) \
+            .setdefault(to_lane, list()).append((from_edge, from_lane))
+
+    connection_data = {'next': next_conn_data, 'prev': prev_conn_data}
+
+    return net_data, connection_data
+
+
+def load_sidecar(net_path):
+    """Load the tables of a network from the sidecar of its .net.xml file.
+
+    Parameters
+    ----------
+    net_path : str
+        path to the .net.xml file
+
+    Returns
+    -------
+    dict of np.ndarray or None
+        the tables of the network (see parse_net), or None if the sidecar
+        does not exist, or was written for another version of the .net.xml
+        file
+    """
+    try:
+        with np.load(net_path + SIDECAR_SUFFIX, allow_pickle=False) as data:
+            if data['source'].tolist() != _source(net_path):
+                return None
+            tables = {key: data[key] for key in data.files
+                      if key not in ('source', 'names_data', 'names_end')}
+            names_data = data['names_data'].tobytes()
+            names_end = data['names_end'].tolist()
+    except (OSError, EOFError, KeyError, ValueError, zipfile.BadZipFile):
+        return None
+
+    names_start = [0] + names_end[:-1]
+    tables['names'] = np.array(
+        [names_data[i:j].decode() for i, j in zip(names_start, names_end)],
+        dtype=str)
+    return tables
+
+
+def save_sidecar(net_path, tables):
+    """Store the tables of a network in the sidecar of its .net.xml file.
+
+    The sidecar is written to a temporary file before being renamed, so that
+    processes importing the same network concurrently never read a partially
+    written sidecar. Failing to write the sidecar (e.g. if the directory of
+    the .net.xml file is read-only) is not an error.
+
+    Parameters
+    ----------
+    net_path : str
+        path to the .net.xml file
+    tables : dict of np.ndarray
+        the tables of the network (see parse_net)
+    """
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(net_path)), suffix='.tmp')
+        # the names are stored as a single block of utf-8 text, which is much
+        # smaller than an array of fixed-size strings
+        names = [name.encode() for name in tables['names'].tolist()]
+        names_data = np.frombuffer(b''.join(names), dtype=np.uint8)
+        names_end = np.cumsum([len(name) for name in names], dtype=np.int64)
+        arrays = {key: value for key, value in tables.items()
+                  if key != 'names'}
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, source=np.array(_source(net_path)),
+                     names_data=names_data, names_end=names_end, **arrays)
+        os.replace(tmp_path, net_path + SIDECAR_SUFFIX)
+    except OSError:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _source(net_path):
+    """Return the identity of a .net.xml file stored in its sidecar."""
+    stat = os.stat(net_path)
+    return [SIDECAR_VERSION, stat.st_size, stat.st_mtime_ns]
@@ -1,12 +1,16 @@
 """Script containing the TraCI scenario kernel class."""
 
 from flow.core.kernel.scenario import KernelScenario
+from flow.core.kernel.scenario.net_cache import NetworkCache
+from flow.core.kernel.scenario.net_import import parse_net, tables_to_dicts, \
+    load_sidecar, save_sidecar
 from flow.core.util import makexml, printxml, ensure_dir
+import flow.config as config
 import time
 import os
 import subprocess
-import xml.etree.ElementTree as ElementTree
 from lxml import etree
+import numpy as np
 
 E = etree.Element
 
@@ -29,6 +33,183 @@ def _inputs(net=None, rou=None, add=None, gui=None):
     return inp
 
 
+class LaneGraph(object):
+    """Compiled connectivity of the lanes of a network.
+
+    Every lane of the edges and junctions of the network is assigned an index,
+    with the lanes of an edge numbered consecutively. The lanes following and
+    preceding every lane are stored in compressed sparse row (CSR) format, so
+    that the graph may be traversed with array lookups instead of dictionary
+    lookups.
+
+    Attributes
+    ----------
+    edges : list of str
+        names of the edges and junctions, in the order of their lanes
+    edge_index : dict
+        Key = name of the edge/junction, Element = its index in edges
+    lane_start : np.ndarray
+        index of the first lane of every edge. The last element is the total
+        number of lanes.
+    length : np.ndarray
+        length of the edge/junction of every lane
+    next_start : np.ndarray
+        the lanes following lane i are next_lanes[next_start[i]:
+        next_start[i+1]]
+    next_lanes : np.ndarray
+        see next_start
+    prev_start : np.ndarray
+        the lanes preceding lane i are prev_lanes[prev_start[i]:
+        prev_start[i+1]]
+    prev_lanes : np.ndarray
+        see prev_start
+    """
+
+    def __init__(self, edges, connections):
+        """Compile the lane graph of a network.
+
+        Parameters
+        ----------
+        edges : dict
+            Key = name of the edge/junction, Element = dict containing the
+            number of lanes ("lanes") and length ("length") of the edge
+        connections : dict
+            Key = "next" or "prev", Element = dict of the edge/lane pairs
+            following or preceding every edge/lane pair (see
+            TraCIScenario.next_edge). Edge/lane pairs that are not part of the
+            edges are ignored.
+        """
+        self.edges = list(edges.keys())
+        self.edge_index = {edge: i for i, edge in enumerate(self.edges)}
+
+        num_lanes = np.array([edges[edge]['lanes'] for edge in self.edges],
+                             dtype=np.int64)
+        self.lane_start = np.concatenate(([0], np.cumsum(num_lanes)))
+        self.length = np.repeat(
+            np.array([edges[edge]['length'] for edge in self.edges],
+                     dtype=float),
+            num_lanes)
+
+        self.next_start, self.next_lanes = self._compile(connections['next'])
+        self.prev_start, self.prev_lanes = self._compile(connections['prev'])
+
+        # first lane following/preceding every lane, -1 if there is none
+        self._first_next = self._first(self.next_start, self.next_lanes)
+        self._first_prev = self._first(self.prev_start, self.prev_lanes)
+
+    @property
+    def num_lanes(self):
+        """Return the total number of lanes in the network."""
+        return len(self.length)
+
+    def lane_index(self, edge, lane):
+        """Return the index of an edge/lane pair, or -1 if it does not exist.
+
+        Parameters
+        ----------
+        edge : str
+            name of the edge/junction
+        lane : int
+            index of the lane in the edge
+
+        Returns
+        -------
+        int
+            index of the lane in the graph
+        """
+        i = self.edge_index.get(edge)
+        if i is None or not 0 <= lane < \
+                self.lane_start[i + 1] - self.lane_start[i]:
+            return -1
+        return int(self.lane_start[i] + lane)
+
+    def search(self, lanes, occupied, forward, max_hops):
+        """Find the closest occupied lanes ahead of or behind several lanes.
+
+        The graph is traversed from every lane by following the first lane
+        following (or preceding) it, until an occupied lane is reached. All
+        traversals are performed together, one hop at a time, and the length of
+        the lanes that are passed is accumulated.
+
+        Parameters
+        ----------
+        lanes : np.ndarray
+            indices of the lanes the search starts from. Negative indices are
+            ignored.
+        occupied : np.ndarray
+            whether each lane of the graph is occupied
+        forward : bool
+            whether to search ahead of (True) or behind (False) the lanes
+        max_hops : int
+            maximum number of lanes passed by each search
+
+        Returns
+        -------
+        np.ndarray
+            index of the occupied lane found for every search, or -1 if none
+            was found
+        np.ndarray
+            distance from the start of the starting lane to the start of the
+            lane found if searching ahead, and from the start of the starting
+            lane to the start of the lane found, counted backwards, if
+            searching behind
+        """
+        lanes = np.asarray(lanes, dtype=np.int64)
+        found = np.full(len(lanes), -1, dtype=np.int64)
+        dist = np.zeros(len(lanes))
+
+        first = self._first_next if forward else self._first_prev
+        active = np.flatnonzero(lanes >= 0)
+        current = lanes[active]
+
+        for _ in range(max_hops):
+            if len(active) == 0:
+                break
+
+            # stop the searches that reached a dead end
+            step = first[current]
+            alive = step >= 0
+            active, current, step = active[alive], current[alive], step[alive]
+
+            # searches ahead pass the current lane, and searches behind pass
+            # the lane they move to
+            dist[active] += self.length[current if forward else step]
+            current = step
+
+            hit = occupied[current]
+            found[active[hit]] = current[hit]
+            active, current = active[~hit], current[~hit]
+
+        return found, dist
+
+    def _compile(self, connections):
+        """Return the CSR arrays of the lanes connected to every lane."""
+        num_connected = np.zeros(self.num_lanes, dtype=np.int64)
+        connected = [[] for _ in range(self.num_lanes)]
+        for edge, lanes in connections.items():
+            for lane, pairs in lanes.items():
+                i = self.lane_index(edge, lane)
+                if i < 0:
+                    continue
+                for next_edge, next_lane in pairs:
+                    j = self.lane_index(next_edge, next_lane)
+                    if j >= 0:
+                        connected[i].append(j)
+                num_connected[i] = len(connected[i])
+
+        start = np.concatenate(([0], np.cumsum(num_connected)))
+        lanes = np.array([j for c in connected for j in c], dtype=np.int64)
+        return start, lanes
+
+    @staticmethod
+    def _first(start, lanes):
+        """Return the first lane connected to every lane, -1 if none."""
+        has_connected = start[1:] > start[:-1]
+        first = np.full(len(start) - 1, -1, dtype=np.int64)
+        first[has_connected] = lanes[start[:-1][has_connected]]
+        return first
+
+
 class TraCIScenario(KernelScenario):
     """Base scenario kernel for sumo-based simulations.
 
@@ -61,6 +242,15 @@ class TraCIScenario(KernelScenario):
         ensure_dir('%s' % self.net_path)
         ensure_dir('%s' % self.cfg_path)
 
+        # cache of the networks generated by netconvert, shared by all
+        # processes (see flow.config.NET_CACHE_DIR)
+        self.net_cache = None
+        if config.NET_CACHE_DIR is not None:
+            try:
+                self.net_cache = NetworkCache(config.NET_CACHE_DIR)
+            except OSError as e:
+                print('Network cache disabled: {}'.format(e))
+
         # variables to be defined during network generation
         self.network = None
         self.nodfn = None
@@ -75,6 +265,7 @@ class TraCIScenario(KernelScenario):
         self.guifn = None
         self._edges = None
         self._connections = None
+        self.lane_graph = None
         self._edge_list = None
         self._junction_list = None
         self.__max_speed = None
@@ -151,6 +342,10 @@ class TraCIScenario(KernelScenario):
         self._junction_list = list(
             set(self._edges.keys()) - set(self._edge_list))
 
+        # compiled connectivity of the lanes, used to search for vehicles
+        # across edges
+        self.lane_graph = LaneGraph(self._edges, self._connections)
+
         # maximum achievable speed on any edge in the network
         self.__max_speed = max(
             self.speed_limit(edge) for edge in self.get_edge_list())
@@ -192,6 +387,12 @@ class TraCIScenario(KernelScenario):
 
         self.total_edgestarts_dict = dict(self.total_edgestarts)
 
+        # names and starting positions of the above edges, used to map
+        # absolute positions back to edges through a binary search
+        self._edgestart_names = [edge for edge, _ in self.total_edgestarts]
+        self._edgestart_pos = np.array(
+            [pos for _, pos in self.total_edgestarts], dtype=float)
+
         if self.network.routes is None:
             print("No routes specified, defaulting to single edge routes.")
             self.network.routes = {edge: [edge] for edge in self._edge_list}
@@ -245,13 +446,41 @@ class TraCIScenario(KernelScenario):
                 pass
 
     def get_edge(self, x):
-        """See parent class."""
-        for (edge, start_pos) in reversed(self.total_edgestarts):
-            if x >= start_pos:
-                return edge, x - start_pos
+        """See parent class.
+
+        Absolute positions may also be provided as an array, in which case a
+        list of edges and an array of relative positions are returned. The
+        edge of positions located before the start of the network is None,
+        and their relative position is NaN.
+        """
+        # index of the last edge starting at or before each position
+        index = np.searchsorted(self._edgestart_pos, x, side='right') - 1
+
+        if isinstance(x, (list, np.ndarray)):
+            x = np.asarray(x, dtype=float)
+            found = index >= 0
+            rel_pos = np.where(
+                found, x - self._edgestart_pos[np.maximum(index, 0)], np.nan)
+            edges = [self._edgestart_names[i] if i >= 0 else None
+                     for i in index.tolist()]
+            return edges, rel_pos
+
+        if index >= 0:
+            return self._edgestart_names[index], \
+                x - self._edgestart_pos[index].item()
 
     def get_x(self, edge, position):
-        """See parent class."""
+        """See parent class.
+
+        Edges and relative positions may also be provided as a list and an
+        array, in which case an array of absolute positions is returned.
+        """
+        if isinstance(edge, (list, np.ndarray)):
+            starts, on_edge = self.get_edge_starts(edge)
+            if np.any(np.isnan(starts)):
+                raise KeyError(edge[np.flatnonzero(np.isnan(starts))[0]])
+            return np.where(on_edge, starts + np.asarray(position), starts)
+
         # if there was a collision which caused the vehicle to disappear,
         # return an x value of -1001
         if len(edge) == 0:
@@ -268,6 +497,44 @@ class TraCIScenario(KernelScenario):
         else:
             return self.total_edgestarts_dict[edge] + position
 
+    def get_edge_starts(self, edges):
+        """Return the absolute positions used to compute get_x on edges.
+
+        The absolute position of a vehicle on one of the edges is either the
+        starting position of the edge plus the position of the vehicle on the
+        edge, or, for edges that have no specified starting position (e.g.
+        internal links that are generalized for by a single element, see
+        get_x), a fixed position.
+
+        Parameters
+        ----------
+        edges : list of str
+            names of the edges
+
+        Returns
+        -------
+        np.ndarray
+            starting position (or fixed position) of every edge. Edges that
+            are not internal links and have no specified starting position
+            are given a value of NaN.
+        np.ndarray
+            whether the position of a vehicle on every edge is added to the
+            starting position
+        """
+        starts = np.empty(len(edges))
+        on_edge = np.ones(len(edges), dtype=bool)
+        for i, edge in enumerate(edges):
+            if len(edge) == 0:
+                starts[i], on_edge[i] = -1001, False
+            elif edge[0] == ':' and edge not in self.internal_edgestarts_dict:
+                starts[i], on_edge[i] = self.total_edgestarts_dict.get(
+                    edge.rsplit('_', 1)[0], -1001), False
+            elif edge[0] == ':':
+                starts[i] = self.internal_edgestarts_dict[edge]
+            else:
+                starts[i] = self.total_edgestarts_dict.get(edge, np.nan)
+        return starts, on_edge
+
     def edge_length(self, edge_id):
         """See parent class."""
         try:
@@ -508,6 +775,27 @@ class TraCIScenario(KernelScenario):
         x.append(t)
         printxml(x, self.net_path + self.cfgfn)
 
+        # if the same network was already generated, by this or any other
+        # process, reuse it instead of calling netconvert
+        key = None
+        if self.net_cache is not None:
+            input_files = [self.net_path + self.nodfn,
+                           self.net_path + self.edgfn]
+            options = ['no-internal-links=%s' % no_internal_links,
+                       'no-turnarounds=true']
+            if types is not None:
+                input_files.append(self.net_path + self.typfn)
+                options.append('type-files')
+            if connections is not None:
+                input_files.append(self.net_path + self.confn)
+                options.append('connection-files')
+            key = self.net_cache.key(input_files, options)
+
+            edges_dict, conn_dict = self.net_cache.load(
+                key, self.cfg_path + self.netfn)
+            if edges_dict is not None:
+                return edges_dict, conn_dict
+
         subprocess.call(
             [
                 'netconvert -c ' + self.net_path + self.cfgfn +
@@ -521,6 +809,9 @@ class TraCIScenario(KernelScenario):
         for _ in range(RETRIES_ON_ERROR):
             try:
                 edges_dict, conn_dict = self._import_edges_from_net(net_params)
+                if key is not None:
+                    self.net_cache.store(key, self.cfg_path + self.netfn,
+                                         edges_dict, conn_dict)
                 return edges_dict, conn_dict
             except Exception as e:
                 print('Error during start: {}'.format(e))
@@ -557,29 +848,45 @@ class TraCIScenario(KernelScenario):
         # specify the location of the output file
         netfn = "%s.net.xml" % self.name
 
-        # generate the network file with sumo
-        net_cmd = "netconvert --osm-files {0} --output-file {1}".\
-            format(osm_path, self.cfg_path + netfn)
+        # options used to generate the network file with sumo
+        net_options = ""
 
         # this handles removing all roads in the network that cannot be ridden
         # by vehicles
-        net_cmd += " --keep-edges.by-vclass passenger"
+        net_options += " --keep-edges.by-vclass passenger"
 
         # this removes edges that are not connected to a network (isolated)
-        net_cmd += " --remove-edges.isolated"
+        net_options += " --remove-edges.isolated"
 
         # this removes internal links from the network (useful when the network
         # becomes very large)
         if net_params.no_internal_links:
-            net_cmd += " --no_internal_links"
+            net_options += " --no_internal_links"
 
-        subprocess.call(net_cmd, shell=True)
+        # generate the network file with sumo
+        net_cmd = "netconvert --osm-files {0} --output-file {1}".\
+            format(osm_path, self.cfg_path + netfn) + net_options
 
         # name of the .net.xml file (located in cfg_path)
         self.netfn = netfn
 
+        # converting large osm files takes a while, so the networks are
+        # cached as well
+        key = None
+        if self.net_cache is not None:
+            key = self.net_cache.key([osm_path], net_options.split())
+            edges_dict, conn_dict = self.net_cache.load(
+                key, self.cfg_path + netfn)
+            if edges_dict is not None:
+                return edges_dict, conn_dict
+
+        subprocess.call(net_cmd, shell=True)
+
         # collect data from the generated network configuration file
         edges_dict, conn_dict = self._import_edges_from_net(net_params)
+        if key is not None:
+            self.net_cache.store(
+                key, self.cfg_path + netfn, edges_dict, conn_dict)
 
         return edges_dict, conn_dict
 
@@ -756,7 +1063,7 @@ class TraCIScenario(KernelScenario):
         if self.network.net_params.inflows is not None:
             total_inflows = self.network.net_params.inflows.get()
             for inflow in total_inflows:
-                for key in inflow:
+                for key in list(inflow):
                     if not isinstance(inflow[key], str):
                         inflow[key] = repr(inflow[key])
                     if key == 'edge':
@@ -788,7 +1095,10 @@ class TraCIScenario(KernelScenario):
 
         This is a utility function for computing edge information. It imports a
         network configuration file, and returns the information on the edges
-        and junctions located in the file.
+        and junctions located in the file. The file is parsed incrementally
+        (see flow.core.kernel.scenario.net_import.parse_net), and the tables
+        parsed from template files are stored in a sidecar file next to them,
+        from which later imports load them.
 
         Parameters
         ----------
@@ -808,104 +1118,19 @@ class TraCIScenario(KernelScenario):
                     Element = list of edge/lane pairs preceding or following
                     the edge/lane pairs
         """
-        # import the .net.xml file containing all edge/type data
-        parser = etree.XMLParser(recover=True)
         net_path = os.path.join(self.cfg_path, self.netfn) \
             if net_params.template is None else self.netfn
-        tree = ElementTree.parse(net_path, parser=parser)
-        root = tree.getroot()
-
-        # Collect information on the available types (if any are available).
-        # This may be used when specifying some edge data.
-        types_data = dict()
-
-        for typ in root.findall('type'):
-            type_id = typ.attrib['id']
-            types_data[type_id] = dict()
-
-            if 'speed' in typ.attrib:
-                types_data[type_id]['speed'] = float(typ.attrib['speed'])
-            else:
-                types_data[type_id]['speed'] = None
-
-            if 'numLanes' in typ.attrib:
-                types_data[type_id]['numLanes'] = int(typ.attrib['numLanes'])
-            else:
-                types_data[type_id]['numLanes'] = None
-
-        net_data = dict()
-        next_conn_data = dict()  # forward looking connections
-        prev_conn_data = dict()  # backward looking connections
-
-        # collect all information on the edges and junctions
-        for edge in root.findall('edge'):
-            edge_id = edge.attrib['id']
-
-            # create a new key for this edge
-            net_data[edge_id] = dict()
-
-            # check for speed
-            if 'speed' in edge:
-                net_data[edge_id]['speed'] = float(edge.attrib['speed'])
-            else:
-                net_data[edge_id]['speed'] = None
-
-            # if the edge has a type parameters, check that type for a
-            # speed and parameter if one was not already found
-            if 'type' in edge.attrib and edge.attrib['type'] in types_data:
-                if net_data[edge_id]['speed'] is None:
-                    net_data[edge_id]['speed'] = \
-                        float(types_data[edge.attrib['type']]['speed'])
-
-            # collect the length from the lane sub-element in the edge, the
-            # number of lanes from the number of lane elements, and if needed,
-            # also collect the speed value (assuming it is there)
-            net_data[edge_id]['lanes'] = 0
-            for i, lane in enumerate(edge):
-                net_data[edge_id]['lanes'] += 1
-                if i == 0:
-                    net_data[edge_id]['length'] = float(lane.attrib['length'])
-                    if net_data[edge_id]['speed'] is None \
-                            and 'speed' in lane.attrib:
-                        net_data[edge_id]['speed'] = float(
-                            lane.attrib['speed'])
-
-            # if no speed value is present anywhere, set it to some default
-            if net_data[edge_id]['speed'] is None:
-                net_data[edge_id]['speed'] = 30
-
-        # collect connection data
-        for connection in root.findall('connection'):
-            from_edge = connection.attrib['from']
-            from_lane = int(connection.attrib['fromLane'])
-
-            no_internal_links = self.network.net_params.no_internal_links
-            if from_edge[0] != ":" and not no_internal_links:
-                # if the edge is not an internal links and the network is
-                # allowed to have internal links, then get the next edge/lane
-                # pair from the "via" element
-                via = connection.attrib['via'].rsplit('_', 1)
-                to_edge = via[0]
-                to_lane = int(via[1])
-            else:
-                to_edge = connection.attrib['to']
-                to_lane = int(connection.attrib['toLane'])
-
-            if from_edge not in next_conn_data:
-                next_conn_data[from_edge] = dict()
-
-            if from_lane not in next_conn_data[from_edge]:
-                next_conn_data[from_edge][from_lane] = list()
-
-            if to_edge not in prev_conn_data:
-                prev_conn_data[to_edge] = dict()
-
-            if to_lane not in prev_conn_data[to_edge]:
-                prev_conn_data[to_edge][to_lane] = list()
-
-            next_conn_data[from_edge][from_lane].append((to_edge, to_lane))
-            prev_conn_data[to_edge][to_lane].append((from_edge, from_lane))
-
-        connection_data = {'next': next_conn_data, 'prev': prev_conn_data}
 
-        return net_data, connection_data
+        # templates are imported repeatedly, so their tables are stored in a
+        # sidecar file next to them. Generated networks are cached instead
+        # (see NetworkCache)
+        tables = None
+        if net_params.template is not None:
+            tables = load_sidecar(net_path)
+        if tables is None:
+            tables = parse_net(net_path)
+            if net_params.template is not None:
+                save_sidecar(net_path, tables)
+
+        return tables_to_dicts(
+            tables, self.network.net_params.no_internal_links)
@@ -1,6 +1,8 @@
 from flow.core.kernel.simulation.base import KernelSimulation
 from flow.core.kernel.simulation.traci import TraCISimulation
+from flow.core.kernel.simulation.libsumo import LibsumoSimulation
 from flow.core.kernel.simulation.aimsun import AimsunKernelSimulation
 
 
-__all__ = ['KernelSimulation', 'TraCISimulation', 'AimsunKernelSimulation']
+__all__ = ['KernelSimulation', 'TraCISimulation', 'LibsumoSimulation',
+           'AimsunKernelSimulation']
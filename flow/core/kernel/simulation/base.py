@@ -49,6 +49,29 @@ class KernelSimulation(object):
         """
         raise NotImplementedError
 
+    def prepare_simulation(self, network, sim_params):
+        """Prepare a simulation instance in the background.
+
+        The prepared instance is used by the next call to `start_simulation`
+        with the same network and parameters, so that the time needed to start
+        the simulator overlaps with the current simulation. By default, no
+        instance is prepared.
+
+        network : any
+            an object or variable that is meant to symbolize the network that
+            is used during the simulation (see `start_simulation`)
+        sim_params : flow.core.params.SimParams
+            simulation-specific parameters
+        """
+        pass
+
+    def discard_prepared(self):
+        """Terminate the simulation instance prepared in the background.
+
+        By default, no instance is prepared, and nothing is done.
+        """
+        pass
+
     def simulation_step(self):
         """Advance the simulation by one step.
 
@@ -80,6 +103,30 @@ class KernelSimulation(object):
         """
         raise NotImplementedError
 
+    def save_state(self, filename):
+        """Save the current state of the simulation to a file.
+
+        Parameters
+        ----------
+        filename : str
+            path to the file the state is saved to
+        """
+        raise NotImplementedError
+
+    def load_state(self, filename):
+        """Restore the state of the simulation from a file.
+
+        Note that subscriptions to the simulator may not persist once the
+        state is restored, and need to be created again (see
+        flow.core.kernel.Kernel.pass_api).
+
+        Parameters
+        ----------
+        filename : str
+            path to a file created by `save_state`
+        """
+        raise NotImplementedError
+
     def close(self):
         """Closes the current simulation instance."""
         raise NotImplementedError
@@ -0,0 +1,81 @@
+"""Script containing the libsumo simulation kernel class."""
+
+from flow.core.kernel.simulation.traci import TraCISimulation
+from flow.utils.exceptions import FatalFlowError
+import logging
+
+try:
+    # libsumo is only needed when running the "libsumo" simulator
+    import libsumo
+except ImportError:
+    libsumo = None
+
+
+class LibsumoSimulation(TraCISimulation):
+    """Sumo simulation kernel, with sumo running within the Python process.
+
+    Sumo is loaded as a library through libsumo, which offers the same
+    interface as traci. Each call to the simulator is then a function call
+    instead of a message to a sumo subprocess. The remaining sumo kernels
+    (TraCIScenario, TraCIVehicle, TraCITrafficLight) are used unchanged.
+
+    Note that libsumo can only run a single simulation per process, and does
+    not support the sumo gui.
+
+    Extends flow.core.kernel.simulation.TraCISimulation
+    """
+
+    def start_simulation(self, scenario, sim_params):
+        """Start a sumo simulation within the Python process.
+
+        This method uses the configuration files created by the scenario class
+        to load a simulation through libsumo, which is then used as the kernel
+        api.
+
+        Raises
+        ------
+        ImportError
+            if libsumo is not installed
+        flow.utils.exceptions.FatalFlowError
+            if the simulation is to be rendered in the sumo gui
+        """
+        if libsumo is None:
+            raise ImportError(
+                'libsumo is required by the "libsumo" simulator. It may be '
+                'installed with "pip install libsumo".')
+
+        if sim_params.render is True:
+            raise FatalFlowError(
+                'The sumo gui is not supported by the "libsumo" simulator. '
+                'Use the "traci" simulator instead.')
+
+        sumo_call = self._get_sumo_call(scenario, sim_params)
+
+        logging.debug(" Cfg file: " + str(scenario.cfg))
+        logging.debug(" Step length: " + str(sim_params.sim_step))
+
+        libsumo.start(sumo_call)
+        libsumo.simulationStep()
+
+        return libsumo
+
+    def prepare_simulation(self, scenario, sim_params):
+        """See parent class.
+
+        Only one simulation may run in the process, so none is prepared.
+        """
+        pass
+
+    def discard_prepared(self):
+        """See parent class."""
+        pass
+
+    def teardown_sumo(self):
+        """See parent class.
+
+        Sumo does not run in a subprocess, so the simulation is only closed.
+        """
+        try:
+            libsumo.close()
+        except Exception as e:
+            print("Error during teardown: {}".format(e))
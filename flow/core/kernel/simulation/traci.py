@@ -5,7 +5,10 @@ from flow.core.util import ensure_dir
 import flow.config as config
 import traci.constants as tc
 import traci
+from traci.exceptions import FatalTraCIError
+import sumolib
 import traceback
+import atexit
 import os
 import time
 import logging
@@ -16,6 +19,174 @@ import signal
 # Number of retries on restarting SUMO before giving up
 RETRIES_ON_ERROR = 10
 
+# Time (in seconds) between attempts to connect to a starting SUMO instance
+POLL_INTERVAL = 0.01
+
+
+class SumoPool(object):
+    """Pool of sumo instances launched in the background.
+
+    Sumo instances are started as soon as their command is known, and are
+    only connected to once they are needed. This allows the time needed by
+    sumo to load a network to overlap with other work, e.g. with the rollout
+    preceding a restart of the simulation. A single pool is shared by all
+    kernels of a process (see SUMO_POOL).
+
+    Instances are identified by their command, excluding the port they are
+    run on.
+    """
+
+    def __init__(self):
+        """Instantiate an empty pool."""
+        # command -> list of [process, port, connection] entries that were
+        # launched but not yet acquired. The connection is None until it is
+        # established by `wait`
+        self._pending = {}
+
+    def prepare(self, sumo_call):
+        """Launch a sumo instance in the background.
+
+        Parameters
+        ----------
+        sumo_call : list of str
+            command used to start sumo, without the remote port
+        """
+        port = sumolib.miscutils.getFreeSocketPort()
+        proc = self._launch(sumo_call, port)
+        self._pending.setdefault(tuple(sumo_call), []).append(
+            [proc, port, None])
+
+    def wait(self, sumo_call):
+        """Wait for prepared instances to be ready.
+
+        Sumo only accepts connections once its configuration files are loaded,
+        after which they may safely be removed or overwritten.
+
+        Parameters
+        ----------
+        sumo_call : list of str
+            command of the instances, without the remote port
+        """
+        for entry in self._pending.get(tuple(sumo_call), []):
+            proc, port, connection = entry
+            if connection is None:
+                try:
+                    entry[2] = self._connect(proc, port)
+                except Exception:
+                    # the instance failed to start, and will be replaced by
+                    # a new one when acquired
+                    pass
+
+    def acquire(self, sumo_call, port):
+        """Return a connected sumo instance.
+
+        A prepared instance is used if one was launched with the same command.
+        Otherwise, a new instance is started on the specified port.
+
+        Parameters
+        ----------
+        sumo_call : list of str
+            command used to start sumo, without the remote port
+        port : int
+            port a new instance is run on, if none was prepared
+
+        Returns
+        -------
+        subprocess.Popen
+            the sumo process
+        traci.connection.Connection
+            the connection to the sumo process
+        """
+        # prepared instances may have failed to start, e.g. if their
+        # configuration files were removed before they were loaded, in which
+        # case a new instance is started instead
+        pending = self._pending.get(tuple(sumo_call), [])
+        while len(pending) > 0:
+            proc, prepared_port, connection = pending.pop(0)
+            try:
+                if connection is None:
+                    connection = self._connect(proc, prepared_port)
+                return proc, connection
+            except Exception:
+                self._kill(proc)
+
+        proc = self._launch(sumo_call, port)
+        try:
+            return proc, self._connect(proc, port)
+        except Exception:
+            self._kill(proc)
+            raise
+
+    def discard(self, sumo_call=None):
+        """Terminate prepared instances.
+
+        Parameters
+        ----------
+        sumo_call : list of str, optional
+            command of the instances to terminate. If not specified, all
+            prepared instances are terminated.
+        """
+        if sumo_call is None:
+            keys = list(self._pending.keys())
+        else:
+            keys = [tuple(sumo_call)]
+
+        for key in keys:
+            for proc, _, connection in self._pending.pop(key, []):
+                if connection is not None:
+                    connection.close()
+                self._kill(proc)
+
+    @staticmethod
+    def _launch(sumo_call, port):
+        """Start a sumo process on the specified port."""
+        logging.info(" Starting SUMO on port " + str(port))
+        return subprocess.Popen(
+            list(sumo_call) + ["--remote-port", str(port)],
+            preexec_fn=os.setsid)
+
+    @staticmethod
+    def _connect(proc, port):
+        """Connect to a sumo process as soon as it accepts connections.
+
+        The connection is attempted repeatedly instead of waiting for a fixed
+        period of time. Once connected, a first command is sent, which sumo
+        only answers after all its input files are loaded.
+        """
+        start = time.time()
+        while True:
+            try:
+                # a single attempt; failures are retried (without logging)
+                # here
+                connection = traci.connect(port, numRetries=0, proc=proc)
+                break
+            except FatalTraCIError:
+                if time.time() - start > config.SUMO_TIMEOUT:
+                    raise
+                time.sleep(POLL_INTERVAL)
+
+        connection.getVersion()
+        return connection
+
+    @staticmethod
+    def _kill(proc):
+        """Kill a sumo process and the processes in its group.
+
+        Sumo does not terminate upon SIGTERM while it is waiting for a client
+        to connect, so the processes are killed instead.
+        """
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+            proc.wait()
+        except OSError:
+            # the process already terminated
+            pass
+
+
+# pool of sumo instances shared by the kernels of this process
+SUMO_POOL = SumoPool()
+atexit.register(SUMO_POOL.discard)
+
 
 class TraCISimulation(KernelSimulation):
     """Sumo simulation kernel.
@@ -35,6 +206,8 @@ class TraCISimulation(KernelSimulation):
         KernelSimulation.__init__(self, master_kernel)
         # contains the subprocess.Popen instance used to start traci
         self.sumo_proc = None
+        # command of the sumo instance prepared in the background, if any
+        self._prepared_call = None
 
     def pass_api(self, kernel_api):
         """See parent class.
@@ -52,20 +225,48 @@ class TraCISimulation(KernelSimulation):
         ])
 
     def simulation_step(self):
-        """See parent class."""
+        """See parent class.
+
+        The actuation commands and traffic light states buffered by the
+        vehicle and traffic light kernels during the step are sent before the
+        simulation is advanced.
+        """
+        self.master_kernel.vehicle.flush_commands()
+        self.master_kernel.traffic_light.flush_commands()
         self.kernel_api.simulationStep()
 
     def update(self, reset):
         """See parent class."""
         pass
 
-    def close(self):
+    def save_state(self, filename):
         """See parent class."""
+        self.kernel_api.simulation.saveState(filename)
+
+    def load_state(self, filename):
+        """See parent class.
+
+        Sumo drops all subscriptions when loading a state.
+        """
+        self.kernel_api.simulation.loadState(filename)
+
+    def close(self):
+        """See parent class.
+
+        The instance prepared in the background is given the time to load the
+        configuration files of the scenario, as these are removed once the
+        scenario is closed.
+        """
+        if self._prepared_call is not None:
+            SUMO_POOL.wait(self._prepared_call)
         self.kernel_api.close()
 
     def check_collision(self):
         """See parent class."""
-        return self.kernel_api.simulation.getStartingTeleportNumber() != 0
+        # the vehicles that started teleporting are subscribed to, so no
+        # additional call to sumo is needed
+        sim_obs = self.kernel_api.simulation.getSubscriptionResults()
+        return len(sim_obs[tc.VAR_TELEPORT_STARTING_VEHICLES_IDS]) != 0
 
     def start_simulation(self, scenario, sim_params):
         """Start a sumo simulation instance.
@@ -73,84 +274,29 @@ class TraCISimulation(KernelSimulation):
         This method uses the configuration files created by the scenario class
         to initialize a sumo instance. Also initializes a traci connection to
         interface with sumo from Python.
+
+        If an instance with the same configuration was prepared in the
+        background (see `prepare_simulation`), it is used instead of starting
+        a new one.
         """
         error = None
         for _ in range(RETRIES_ON_ERROR):
             try:
-                # port number the sumo instance will be run on
-                port = sim_params.port
-
-                sumo_binary = "sumo-gui" if sim_params.render is True \
-                    else "sumo"
-
-                # command used to start sumo
-                sumo_call = [
-                    sumo_binary, "-c", scenario.cfg,
-                    "--remote-port", str(sim_params.port),
-                    "--num-clients", str(sim_params.num_clients),
-                    "--step-length", str(sim_params.sim_step)
-                ]
-
-                # add step logs (if requested)
-                if sim_params.no_step_log:
-                    sumo_call.append("--no-step-log")
-
-                # add the lateral resolution of the sublanes (if requested)
-                if sim_params.lateral_resolution is not None:
-                    sumo_call.append("--lateral-resolution")
-                    sumo_call.append(str(sim_params.lateral_resolution))
-
-                # add the emission path to the sumo command (if requested)
-                if sim_params.emission_path is not None:
-                    ensure_dir(sim_params.emission_path)
-                    emission_out = sim_params.emission_path + \
-                        "{0}-emission.xml".format(scenario.name)
-                    sumo_call.append("--emission-output")
-                    sumo_call.append(emission_out)
-                else:
-                    emission_out = None
-
-                if sim_params.overtake_right:
-                    sumo_call.append("--lanechange.overtake-right")
-                    sumo_call.append("true")
-
-                # specify a simulation seed (if requested)
-                if sim_params.seed is not None:
-                    sumo_call.append("--seed")
-                    sumo_call.append(str(sim_params.seed))
-
-                if not sim_params.print_warnings:
-                    sumo_call.append("--no-warnings")
-                    sumo_call.append("true")
-
-                # set the time it takes for a gridlock teleport to occur
-                sumo_call.append("--time-to-teleport")
-                sumo_call.append(str(int(sim_params.teleport_time)))
-
-                # check collisions at intersections
-                sumo_call.append("--collision.check-junctions")
-                sumo_call.append("true")
-
-                logging.info(" Starting SUMO on port " + str(port))
+                sumo_call = self._get_sumo_call(scenario, sim_params)
+
                 logging.debug(" Cfg file: " + str(scenario.cfg))
                 if sim_params.num_clients > 1:
                     logging.info(" Num clients are" +
                                  str(sim_params.num_clients))
-                logging.debug(" Emission file: " + str(emission_out))
                 logging.debug(" Step length: " + str(sim_params.sim_step))
 
-                # Opening the I/O thread to SUMO
-                self.sumo_proc = subprocess.Popen(
-                    sumo_call, preexec_fn=os.setsid)
-
-                # wait a small period of time for the subprocess to activate
-                # before trying to connect with traci
-                if os.environ.get("TEST_FLAG", 0):
-                    time.sleep(0.1)
-                else:
-                    time.sleep(config.SUMO_SLEEP)
-
-                traci_connection = traci.connect(port, numRetries=100)
+                # start sumo (or retrieve a prepared instance) and connect to
+                # it with traci
+                self.sumo_proc, traci_connection = SUMO_POOL.acquire(
+                    sumo_call, sim_params.port)
+                # the prepared instance is not needed anymore if it was
+                # launched for a different configuration
+                self.discard_prepared()
                 traci_connection.setOrder(0)
                 traci_connection.simulationStep()
 
@@ -161,6 +307,103 @@ class TraCISimulation(KernelSimulation):
                 self.teardown_sumo()
         raise error
 
+    def prepare_simulation(self, scenario, sim_params):
+        """See parent class.
+
+        The sumo instance is launched in the background and left to load the
+        network. Instances that write output files are not prepared, as they
+        would overwrite the files of the running instance, and neither are
+        instances with a gui.
+        """
+        self.discard_prepared()
+        if sim_params.render is not False \
+                or sim_params.emission_path is not None:
+            return
+
+        self._prepared_call = self._get_sumo_call(scenario, sim_params)
+        SUMO_POOL.prepare(self._prepared_call)
+
+    def discard_prepared(self):
+        """See parent class."""
+        if self._prepared_call is not None:
+            SUMO_POOL.discard(self._prepared_call)
+            self._prepared_call = None
+
+    @staticmethod
+    def _get_sumo_call(scenario, sim_params):
+        """Return the command used to start sumo, without the remote port.
+
+        Parameters
+        ----------
+        scenario : flow.core.kernel.scenario.TraCIScenario
+            the scenario kernel, containing the configuration files
+        sim_params : flow.core.params.SumoParams
+            simulation-specific parameters
+
+        Returns
+        -------
+        list of str
+            the sumo command
+        """
+        sumo_binary = "sumo-gui" if sim_params.render is True else "sumo"
+
+        # command used to start sumo
+        sumo_call = [
+            sumo_binary, "-c", scenario.cfg,
+            "--num-clients", str(sim_params.num_clients),
+            "--step-length", str(sim_params.sim_step)
+        ]
+
+        # add step logs (if requested)
+        if sim_params.no_step_log:
+            sumo_call.append("--no-step-log")
+
+        # add the lateral resolution of the sublanes (if requested)
+        if sim_params.lateral_resolution is not None:
+            sumo_call.append("--lateral-resolution")
+            sumo_call.append(str(sim_params.lateral_resolution))
+
+        # add the emission path to the sumo command (if requested)
+        if sim_params.emission_path is not None:
+            ensure_dir(sim_params.emission_path)
+            emission_out = sim_params.emission_path + \
+                "{0}-emission.xml".format(scenario.name)
+            sumo_call.append("--emission-output")
+            sumo_call.append(emission_out)
+            logging.debug(" Emission file: " + str(emission_out))
+
+        if sim_params.overtake_right:
+            sumo_call.append("--lanechange.overtake-right")
+            sumo_call.append("true")
+
+        # specify a simulation seed (if requested)
+        if sim_params.seed is not None:
+            sumo_call.append("--seed")
+            sumo_call.append(str(sim_params.seed))
+
+        if not sim_params.print_warnings:
+            sumo_call.append("--no-warnings")
+            sumo_call.append("true")
+
+        # set the time it takes for a gridlock teleport to occur
+        sumo_call.append("--time-to-teleport")
+        sumo_call.append(str(int(sim_params.teleport_time)))
+
+        # check collisions at intersections
+        sumo_call.append("--collision.check-junctions")
+        sumo_call.append("true")
+
+        # save snapshots of the simulation with full precision and with the
+        # state of the random number generators, so that restored simulations
+        # continue as the original ones
+        if sim_params.num_snapshots > 0:
+            sumo_call.append("--save-state.precision")
+            sumo_call.append("17")
+            sumo_call.append("--save-state.rng")
+            sumo_call.append("true")
+
+        return sumo_call
+
     def teardown_sumo(self):
         """Kill the sumo subprocess instance."""
         try:
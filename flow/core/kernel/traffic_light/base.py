@@ -40,6 +40,10 @@ class KernelTrafficLight(object):
         self.master_kernel = master_kernel
         self.kernel_api = None
 
+        # traffic light variables that are read from the kernel, None if all
+        # variables may be read
+        self.required_variables = None
+
     def pass_api(self, kernel_api):
         """Acquire the kernel api that was generated by the simulation kernel.
 
@@ -50,6 +54,23 @@ class KernelTrafficLight(object):
         """
         self.kernel_api = kernel_api
 
+    def set_required_variables(self, variables):
+        """Specify the traffic light variables that are read from the kernel.
+
+        Variables that are not read by the environment (e.g. "state") do not
+        need to be retrieved from the simulator. This method must be called
+        before the kernel api is passed to the kernel.
+
+        Parameters
+        ----------
+        variables : list of str or None
+            names of the variables read by the environment, see
+            flow.envs.Env.required_traffic_light_variables. If set to None,
+            all variables may be read.
+        """
+        self.required_variables = \
+            None if variables is None else set(variables)
+
     def update(self, reset):
         """Update the states and phases of the traffic lights.
 
@@ -83,6 +104,19 @@ class KernelTrafficLight(object):
         """
         raise NotImplementedError
 
+    def set_states(self, node_ids, states):
+        """Set the state of the traffic lights on several nodes.
+
+        Parameters
+        ----------
+        node_ids : list of str
+            names of the nodes with the controlled traffic lights
+        states : list of str
+            desired state of the traffic lights of every node
+        """
+        for node_id, state in zip(node_ids, states):
+            self.set_state(node_id, state)
+
     def get_state(self, node_id):
         """Return the state of the traffic light(s) at the specified node.
 
@@ -0,0 +1,105 @@
+"""Script containing the switching phases of groups of traffic lights."""
+
+import numpy as np
+
+
+class TrafficLightPhases(object):
+    """Phases of traffic lights switching between two directions.
+
+    Each node lets traffic flow in one of two directions at a time. Switching
+    the direction of a node first shows the yellow state of its current
+    direction, and then, once the node has been yellow for the minimum switch
+    time, the green state of its new direction. The timers, directions and
+    yellow flags of all nodes are stored as arrays, and updated at once.
+
+    Attributes
+    ----------
+    node_ids : list of str
+        names of the nodes
+    last_change : np.ndarray of float
+        time since the last switch of every node, only updated while the node
+        is yellow
+    direction : np.ndarray of float
+        direction every node lets traffic flow in, or switches to if it is
+        yellow (0 or 1)
+    currently_yellow : np.ndarray of float
+        whether every node is yellow (1) or not (0)
+    """
+
+    def __init__(self, node_ids, green_states, yellow_states, min_switch_time):
+        """Instantiate the phases, with all nodes green in direction 0.
+
+        Parameters
+        ----------
+        node_ids : list of str
+            names of the nodes
+        green_states : (str, str)
+            state of the nodes when traffic flows in direction 0 and 1
+        yellow_states : (str, str)
+            state of the nodes when they switch from direction 0 and 1
+        min_switch_time : float
+            time the nodes stay yellow when switching direction, in seconds
+        """
+        self.node_ids = list(node_ids)
+        self.green_states = tuple(green_states)
+        self.yellow_states = tuple(yellow_states)
+        self.min_switch_time = min_switch_time
+
+        num_nodes = len(self.node_ids)
+        self.last_change = np.zeros(num_nodes)
+        self.direction = np.zeros(num_nodes)
+        self.currently_yellow = np.zeros(num_nodes)
+
+    def get_states(self):
+        """Return the current state of every node.
+
+        Returns
+        -------
+        list of str
+            state of every node
+        """
+        return self._states(np.arange(len(self.node_ids)))
+
+    def step(self, switch, time_step):
+        """Advance the phases of the nodes by a time step.
+
+        Yellow nodes turn green in their new direction once they have been
+        yellow for the minimum switch time. Other nodes turn yellow if they
+        are requested to switch.
+
+        Parameters
+        ----------
+        switch : array_like of bool
+            whether every node is requested to switch direction. Requests of
+            yellow nodes are ignored.
+        time_step : float
+            duration of the time step, in seconds
+
+        Returns
+        -------
+        list of str
+            names of the nodes whose state changed
+        list of str
+            new state of these nodes
+        """
+        switch = np.asarray(switch, dtype=bool)
+        yellow = self.currently_yellow == 1
+
+        self.last_change[yellow] += time_step
+        to_green = yellow & (self.last_change >= self.min_switch_time)
+        to_yellow = ~yellow & switch
+
+        self.last_change[to_yellow] = 0.0
+        self.direction[to_yellow] = 1 - self.direction[to_yellow]
+        self.currently_yellow[to_green] = 0
+        self.currently_yellow[to_yellow] = 1
+
+        changed = np.flatnonzero(to_green | to_yellow)
+        return [self.node_ids[i] for i in changed], self._states(changed)
+
+    def _states(self, nodes):
+        """Return the current state of the nodes at the given indices."""
+        direction = self.direction[nodes].astype(int)
+        yellow = self.currently_yellow[nodes] == 1
+        return [self.yellow_states[1 - d] if y else self.green_states[d]
+                for d, y in zip(direction.tolist(), yellow.tolist())]
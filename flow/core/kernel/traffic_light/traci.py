@@ -1,7 +1,15 @@
 """Script containing the TraCI traffic light kernel class."""
 
 from flow.core.kernel.traffic_light import KernelTrafficLight
+from flow.utils.exceptions import FatalFlowError
 import traci.constants as tc
+import collections
+
+# traffic light variables that may be read from the kernel, and the sumo
+# variables they are retrieved from
+VARIABLES = {
+    'state': tc.TL_RED_YELLOW_GREEN_STATE,
+}
 
 
 class TraCITrafficLight(KernelTrafficLight):
@@ -30,6 +38,32 @@ class TraCITrafficLight(KernelTrafficLight):
         # number of traffic light nodes
         self.num_traffic_lights = 0
 
+        # sumo variables that are subscribed to for every traffic light
+        self._subscription_vars = list(VARIABLES.values())
+
+        # states of the traffic lights that are buffered until the next
+        # simulation step (see flush_commands), and last states that were sent
+        # to sumo. Key = node id
+        self.__commands = collections.OrderedDict()
+        self.__sent_states = {}
+        self.__num_commands_sent = 0
+        self.__num_commands_coalesced = 0
+
+    def set_required_variables(self, variables):
+        """See parent class."""
+        KernelTrafficLight.set_required_variables(self, variables)
+
+        if self.required_variables is None:
+            self._subscription_vars = list(VARIABLES.values())
+        else:
+            unknown = self.required_variables - set(VARIABLES)
+            if len(unknown) > 0:
+                raise ValueError('Unknown traffic light variables: {}'.format(
+                    ', '.join(sorted(unknown))))
+            self._subscription_vars = [
+                var for name, var in VARIABLES.items()
+                if name in self.required_variables]
+
     def pass_api(self, kernel_api):
         """See parent class.
 
@@ -43,13 +77,21 @@ class TraCITrafficLight(KernelTrafficLight):
         # number of traffic light nodes
         self.num_traffic_lights = len(self.__ids)
 
-        # subscribe the traffic light signal data
-        for node_id in self.__ids:
-            self.kernel_api.trafficlight.subscribe(
-                node_id, [tc.TL_RED_YELLOW_GREEN_STATE])
+        # the states of the traffic lights of a new or reloaded simulation are
+        # not known until they are set again
+        self.__sent_states.clear()
+
+        # subscribe the traffic light signal data, if it is needed
+        if len(self._subscription_vars) > 0:
+            for node_id in self.__ids:
+                self.kernel_api.trafficlight.subscribe(
+                    node_id, self._subscription_vars)
 
     def update(self, reset):
         """See parent class."""
+        if len(self._subscription_vars) == 0:
+            return
+
         tls_obs = {}
         for tl_id in self.__ids:
             tls_obs[tl_id] = \
@@ -61,16 +103,88 @@ class TraCITrafficLight(KernelTrafficLight):
         return self.__ids
 
     def set_state(self, node_id, state, link_index="all"):
-        """See parent class."""
+        """See parent class.
+
+        The states of all lights of a node are buffered and sent to sumo
+        right before the next simulation step (see flush_commands). States
+        that match the current state of the node are dropped.
+        """
         if link_index == "all":
             # if lights on all lanes are changed
-            self.kernel_api.trafficlight.setRedYellowGreenState(
-                tlsID=node_id, state=state)
+            if state == self._get_known_state(node_id):
+                if self.__commands.pop(node_id, None) is not None:
+                    self.__num_commands_coalesced += 1
+                self.__num_commands_coalesced += 1
+                return
+            if node_id in self.__commands:
+                self.__num_commands_coalesced += 1
+            self.__commands[node_id] = state
         else:
-            # if lights on a single lane is changed
+            # if lights on a single lane is changed, after the states that
+            # were buffered for the node
+            if node_id in self.__commands:
+                self._send_state(node_id, self.__commands.pop(node_id))
             self.kernel_api.trafficlight.setLinkState(
                 tlsID=node_id, tlsLinkIndex=link_index, state=state)
+            self.__sent_states.pop(node_id, None)
+
+    def flush_commands(self):
+        """Send all buffered traffic light states to sumo.
+
+        This is called by the simulation kernel right before advancing the
+        simulation.
+        """
+        for node_id, state in self.__commands.items():
+            self._send_state(node_id, state)
+        self.__commands.clear()
+
+    def get_command_stats(self):
+        """Return statistics on the traffic light states sent to sumo.
+
+        Returns
+        -------
+        dict
+            * "sent": number of states that were sent to sumo
+            * "coalesced": number of states that were not sent because they
+              were replaced by a later state for the same node within the same
+              step, or because they matched the current state of the node
+        """
+        return {"sent": self.__num_commands_sent,
+                "coalesced": self.__num_commands_coalesced}
+
+    def _send_state(self, node_id, state):
+        """Send the state of all lights of a node to sumo."""
+        self.kernel_api.trafficlight.setRedYellowGreenState(
+            tlsID=node_id, state=state)
+        self.__sent_states[node_id] = state
+        self.__num_commands_sent += 1
+
+    def _get_known_state(self, node_id):
+        """Return the current state of a node, None if it is not known.
+
+        Only the states that were sent to sumo are known, since nodes hold
+        these states until they are set again, whereas the programs of nodes
+        that were never set may change their state at any step.
+        """
+        return self.__sent_states.get(node_id)
 
     def get_state(self, node_id):
         """See parent class."""
+        self._check_required('state')
         return self.__tls[node_id][tc.TL_RED_YELLOW_GREEN_STATE]
+
+    def _check_required(self, variable):
+        """Ensure that a traffic light variable was declared before reading it.
+
+        Raises
+        ------
+        flow.utils.exceptions.FatalFlowError
+            if the variable is not retrieved from sumo because it was not
+            declared in the required traffic light variables
+        """
+        if self.required_variables is not None and \
+                variable not in self.required_variables:
+            raise FatalFlowError(
+                'The traffic light variable "{}" is not retrieved from the '
+                'simulator, since it is missing from the required traffic '
+                'light variables of the environment.'.format(variable))
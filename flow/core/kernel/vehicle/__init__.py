@@ -1,6 +1,8 @@
 from flow.core.kernel.vehicle.base import KernelVehicle
 from flow.core.kernel.vehicle.traci import TraCIVehicle
 from flow.core.kernel.vehicle.aimsun import AimsunKernelVehicle
+from flow.core.kernel.vehicle.segments import EdgeSegments
 
 
-__all__ = ['KernelVehicle', 'TraCIVehicle', 'AimsunKernelVehicle']
+__all__ = ['KernelVehicle', 'TraCIVehicle', 'AimsunKernelVehicle',
+           'EdgeSegments']
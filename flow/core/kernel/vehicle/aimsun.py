@@ -427,7 +427,7 @@ class AimsunKernelVehicle(KernelVehicle):
             acc = [acc]
 
         for i, veh_id in enumerate(veh_id):
-            if acc[i] is not None:
+            if acc[i] is not None and not np.isnan(acc[i]):
                 this_vel = self.get_speed(veh_id)
                 next_vel = max(this_vel + acc[i] * self.sim_step, 0)
                 aimsun_id = self._id_flow2aimsun[veh_id]
@@ -574,6 +574,42 @@ class AimsunKernelVehicle(KernelVehicle):
             return sum([self.get_ids_by_edge(edge) for edge in edges], [])
         return [veh for veh in self.__ids if self.get_edge(veh) == edges]
 
+    def get_ids_by_lane(self, edge, lane):
+        """See parent class."""
+        ids = [veh for veh in self.__ids if self.get_edge(veh) == edge
+               and self.get_lane(veh) == lane]
+        return sorted(ids, key=self.get_position)
+
+    def get_lane_occupancy(self, edge, lane):
+        """See parent class."""
+        veh_ids = self.get_ids_by_lane(edge, lane)
+        ids = np.empty(len(veh_ids), dtype=object)
+        ids[:] = veh_ids
+        pos = np.array([self.get_position(veh) for veh in ids], dtype=float)
+        ids.flags.writeable = False
+        pos.flags.writeable = False
+        return ids, pos
+
+    def get_edge_aggregates(self, edges):
+        """See parent class."""
+        num_veh, tot_speed = [], []
+        for edge in edges:
+            veh_ids = self.get_ids_by_edge(edge)
+            num_veh.append(len(veh_ids))
+            tot_speed.append(sum(self.get_speed(veh_ids)))
+        return np.array(num_veh, dtype=int), np.array(tot_speed, dtype=float)
+
+    def get_segment_aggregates(self, segments):
+        """See parent class."""
+        ids = self.get_ids()
+        rl_ids = set(self.get_rl_ids())
+        edge = [segments.edge_index.get(self.get_edge(veh_id), -1)
+                for veh_id in ids]
+        cell = segments.cell(edge, self.get_position(ids), self.get_lane(ids))
+        is_rl = [veh_id in rl_ids for veh_id in ids]
+        return segments.aggregate(
+            cell, is_rl, np.asarray(self.get_speed(ids), dtype=float))
+
     def get_inflow_rate(self, time_span):
         """See parent class."""
         if len(self._num_departed) == 0:
@@ -744,6 +780,8 @@ class AimsunKernelVehicle(KernelVehicle):
 
     def get_x_by_id(self, veh_id):
         """See parent class."""
+        if isinstance(veh_id, (list, np.ndarray)):
+            return np.array([self.get_x_by_id(veh) for veh in veh_id])
         return self.master_kernel.scenario.get_x(self.get_edge(veh_id),
                                                  self.get_position(veh_id))
 
@@ -52,6 +52,10 @@ class KernelVehicle(object):
         self.kernel_api = None
         self.sim_step = sim_params.sim_step
 
+        # optional vehicle variables that are read from the kernel, None if
+        # all variables may be read
+        self.required_variables = None
+
     def pass_api(self, kernel_api):
         """Acquire the kernel api that was generated by the simulation kernel.
 
@@ -62,6 +66,25 @@ class KernelVehicle(object):
         """
         self.kernel_api = kernel_api
 
+    def set_required_variables(self, variables):
+        """Specify the optional vehicle variables read from the kernel.
+
+        The speed, position, lane, and edge of vehicles are always available.
+        All other variables (e.g. "leader", "route") only need to be retrieved
+        from the simulator if they are read by the environment or by the
+        controllers of the vehicles. This method must be called before the
+        kernel api is passed to the kernel.
+
+        Parameters
+        ----------
+        variables : list of str or None
+            names of the optional variables read by the environment, see
+            flow.envs.Env.required_vehicle_variables. If set to None, all
+            variables may be read.
+        """
+        self.required_variables = \
+            None if variables is None else set(variables)
+
     ###########################################################################
     #               Methods for interacting with the simulator                #
     ###########################################################################
@@ -117,6 +140,25 @@ class KernelVehicle(object):
         """
         raise NotImplementedError
 
+    def remove_many(self, veh_ids):
+        """Remove several vehicles.
+
+        This is equivalent to calling `remove` for every vehicle, but allows
+        simulators to share the work needed to remove the vehicles, e.g. to
+        check which vehicles are still in the network.
+
+        Parameters
+        ----------
+        veh_ids : list of str
+            unique identifiers of the vehicles to be removed
+        """
+        for veh_id in list(veh_ids):
+            self.remove(veh_id)
+
+    def clear(self):
+        """Remove all vehicles from the network and the vehicles kernel."""
+        self.remove_many(list(self.get_ids()))
+
     def apply_acceleration(self, veh_id, acc):
         """Apply the acceleration requested by a vehicle in the simulator.
 
@@ -260,6 +302,88 @@ class KernelVehicle(object):
         """
         raise NotImplementedError
 
+    def get_ids_by_lane(self, edge, lane):
+        """Return the names of all vehicles in the specified lane of an edge.
+
+        The vehicles are sorted by their position in the lane, from the back
+        to the front of the edge. If no vehicles are currently in the lane,
+        then returns an empty list.
+
+        Parameters
+        ----------
+        edge : str
+            name of the edge
+        lane : int
+            lane index
+
+        Returns
+        -------
+        list of str
+        """
+        raise NotImplementedError
+
+    def get_lane_occupancy(self, edge, lane):
+        """Return the vehicles in the specified lane of an edge and positions.
+
+        This is the index of the vehicles by edge and lane the kernel builds
+        at every simulation step, which envs may read instead of grouping the
+        vehicles on their own. Both arrays are sorted by position, from the
+        back to the front of the edge, and are read-only.
+
+        Parameters
+        ----------
+        edge : str
+            name of the edge
+        lane : int
+            lane index
+
+        Returns
+        -------
+        np.ndarray of str
+            names of the vehicles in the lane
+        np.ndarray of float
+            positions of these vehicles on the edge
+        """
+        raise NotImplementedError
+
+    def get_edge_aggregates(self, edges):
+        """Return the number and total speed of the vehicles on each edge.
+
+        Parameters
+        ----------
+        edges : list of str
+            names of the edges
+
+        Returns
+        -------
+        np.ndarray of int
+            number of vehicles currently located on every edge
+        np.ndarray of float
+            sum of the speeds of the vehicles located on every edge
+        """
+        raise NotImplementedError
+
+    def get_segment_aggregates(self, segments):
+        """Return the number and mean speed of the vehicles in each segment.
+
+        Vehicles are aggregated over the (edge, segment, lane) cells of the
+        segments, separately for non-rl and rl vehicles.
+
+        Parameters
+        ----------
+        segments : flow.core.kernel.vehicle.EdgeSegments
+            segments the vehicles are aggregated over
+
+        Returns
+        -------
+        np.ndarray of int
+            number of non-rl (row 0) and rl (row 1) vehicles in every cell
+        np.ndarray of float
+            mean speed of the non-rl (row 0) and rl (row 1) vehicles in every
+            cell, 0 if the cell contains no such vehicles
+        """
+        raise NotImplementedError
+
     def get_inflow_rate(self, time_span):
         """Return the inflow rate (in veh/hr) of vehicles from the network.
 
@@ -298,7 +422,7 @@ class KernelVehicle(object):
 
         Returns
         -------
-        float
+        float or array_like of float
         """
         raise NotImplementedError
 
@@ -314,7 +438,7 @@ class KernelVehicle(object):
 
         Returns
         -------
-        float
+        float or array_like of float
         """
         raise NotImplementedError
 
@@ -330,7 +454,7 @@ class KernelVehicle(object):
 
         Returns
         -------
-        float
+        float or array_like of float
         """
         raise NotImplementedError
 
@@ -362,7 +486,7 @@ class KernelVehicle(object):
 
         Returns
         -------
-        int
+        int or array_like of int
         """
         raise NotImplementedError
 
@@ -394,7 +518,7 @@ class KernelVehicle(object):
 
         Returns
         -------
-        float
+        float or array_like of float
         """
         raise NotImplementedError
 
@@ -442,7 +566,7 @@ class KernelVehicle(object):
 
         Returns
         -------
-        float
+        float or array_like of float
         """
         raise NotImplementedError
 
@@ -469,6 +593,11 @@ class KernelVehicle(object):
     def get_acc_controller(self, veh_id, error=None):
         """Return the acceleration controller of the specified vehicle.
 
+        Controllers whose `stateless` attribute is set may be shared by all
+        vehicles of a type. Such a controller is bound to the vehicle it was
+        last requested for, and should be used before the controller of
+        another vehicle is requested.
+
         Parameters
         ----------
         veh_id : str or list of str
@@ -485,6 +614,8 @@ class KernelVehicle(object):
     def get_lane_changing_controller(self, veh_id, error=None):
         """Return the lane changing controller of the specified vehicle.
 
+        See get_acc_controller for controllers that are shared by vehicles.
+
         Parameters
         ----------
         veh_id : str or list of str
@@ -501,6 +632,8 @@ class KernelVehicle(object):
     def get_routing_controller(self, veh_id, error=None):
         """Return the routing controller of the specified vehicle.
 
+        See get_acc_controller for controllers that are shared by vehicles.
+
         Parameters
         ----------
         veh_id : str or list of str
@@ -514,6 +647,33 @@ class KernelVehicle(object):
         """
         raise NotImplementedError
 
+    def get_edge_transition_ids(self):
+        """Return the ids of the vehicles that entered a new edge.
+
+        This includes the vehicles that entered the network during the last
+        simulation step, and all vehicles after a reset.
+
+        Returns
+        -------
+        list of str
+        """
+        raise NotImplementedError
+
+    def get_routing_ids(self):
+        """Return the ids of the vehicles whose routers are to be called.
+
+        Event-driven routers (see flow.controllers.BaseRouter) only need to be
+        called for vehicles that entered a new edge during the last step (see
+        get_edge_transition_ids). By default, the ids of all vehicles with a
+        router are returned.
+
+        Returns
+        -------
+        list of str
+        """
+        return [veh_id for veh_id in self.get_ids()
+                if self.get_routing_controller(veh_id) is not None]
+
     def get_lane_headways(self, veh_id, error=list()):
         """Return the lane headways of the specified vehicles.
 
@@ -635,12 +795,14 @@ class KernelVehicle(object):
 
         Parameters
         ----------
-        veh_id : str
-            vehicle identifier
+        veh_id : str or list of str
+            vehicle identifier, or list of vehicle identifiers
 
         Returns
         -------
-        float
+        float or np.ndarray
+            absolute position of the vehicle, or array of absolute positions
+            if a list of vehicles is provided
         """
         raise NotImplementedError
 
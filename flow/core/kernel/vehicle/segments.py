@@ -0,0 +1,154 @@
+"""Script containing the segments vehicle data is aggregated over."""
+
+import numpy as np
+
+
+class EdgeSegments(object):
+    """Division of edges into segments, over which vehicles are aggregated.
+
+    Every edge is divided into consecutive segments by a list of boundaries,
+    and every segment into the lanes of the edge. This results in a grid of
+    (edge, segment, lane) cells, which are numbered edge by edge, then segment
+    by segment, and finally lane by lane. The vehicle kernels aggregate the
+    data of the vehicles located in every cell through a single pass over the
+    state of all vehicles (see KernelVehicle.get_segment_aggregates).
+
+    Attributes
+    ----------
+    edges : list of str
+        names of the divided edges
+    edge_index : dict < str, int >
+        index of every edge in the above list
+    boundaries : list of np.ndarray
+        boundaries of the segments of every edge, starting at the start of
+        the edge and ending at its end
+    num_lanes : np.ndarray of int
+        number of lanes of every edge
+    segment_start : np.ndarray of int
+        index of the first segment of every edge, when numbering the segments
+        of all edges together. The last element is the total number of
+        segments.
+    cell_start : np.ndarray of int
+        index of the first cell of every edge. The last element is the total
+        number of cells.
+    """
+
+    def __init__(self, edges, boundaries, num_lanes):
+        """Instantiate the segments.
+
+        Parameters
+        ----------
+        edges : list of str
+            names of the divided edges
+        boundaries : list of array_like
+            boundaries of the segments of every edge, starting at the start
+            of the edge and ending at its end (e.g. np.linspace(0, length,
+            num_segments + 1))
+        num_lanes : list of int
+            number of lanes of every edge
+        """
+        self.edges = list(edges)
+        self.edge_index = {edge: i for i, edge in enumerate(self.edges)}
+        self.boundaries = [np.asarray(b, dtype=float) for b in boundaries]
+        self.num_lanes = np.asarray(num_lanes, dtype=np.int64)
+
+        num_segments = np.array([len(b) - 1 for b in self.boundaries],
+                                dtype=np.int64)
+        self.segment_start = np.concatenate(([0], np.cumsum(num_segments)))
+        self.cell_start = np.concatenate(
+            ([0], np.cumsum(num_segments * self.num_lanes)))
+
+    @property
+    def num_cells(self):
+        """Return the total number of (edge, segment, lane) cells."""
+        return int(self.cell_start[-1])
+
+    def segment(self, edge, position):
+        """Return the segments that positions on edges fall on.
+
+        A position located on the boundary of two segments falls on the
+        latter. Positions before the first boundary or after the last one
+        fall on the first and last segment of their edge, respectively.
+
+        Parameters
+        ----------
+        edge : np.ndarray of int
+            index of the edge of every position (-1 if not divided)
+        position : np.ndarray of float
+            positions on the edges
+
+        Returns
+        -------
+        np.ndarray of int
+            index of the segment of every position within its edge (-1 for
+            positions on edges that are not divided)
+        """
+        edge = np.asarray(edge, dtype=np.int64)
+        position = np.asarray(position, dtype=float)
+        segment = np.full(len(edge), -1, dtype=np.int64)
+        for i, bounds in enumerate(self.boundaries):
+            on_edge = edge == i
+            if on_edge.any():
+                segment[on_edge] = np.clip(np.searchsorted(
+                    bounds, position[on_edge], side='right') - 1,
+                    0, len(bounds) - 2)
+        return segment
+
+    def cell(self, edge, position, lane):
+        """Return the cells that edge/position/lane triplets fall on.
+
+        Parameters
+        ----------
+        edge : np.ndarray of int
+            index of the edge of every triplet (-1 if not divided)
+        position : np.ndarray of float
+            positions on the edges
+        lane : np.ndarray of int
+            lane indices
+
+        Returns
+        -------
+        np.ndarray of int
+            index of the cell of every triplet (-1 for triplets on edges that
+            are not divided, or on lanes the edge does not have)
+        """
+        edge = np.asarray(edge, dtype=np.int64)
+        lane = np.asarray(lane, dtype=np.int64)
+        segment = self.segment(edge, position)
+        num_lanes = self.num_lanes[np.maximum(edge, 0)]
+        valid = (edge >= 0) & (lane >= 0) & (lane < num_lanes)
+        return np.where(
+            valid,
+            self.cell_start[np.maximum(edge, 0)] + segment * num_lanes + lane,
+            -1)
+
+    def aggregate(self, cell, is_rl, speed):
+        """Aggregate the data of vehicles over the cells.
+
+        Parameters
+        ----------
+        cell : np.ndarray of int
+            cell of every vehicle (-1 if outside of all cells)
+        is_rl : np.ndarray of bool
+            whether every vehicle is an rl vehicle
+        speed : np.ndarray of float
+            speed of every vehicle
+
+        Returns
+        -------
+        np.ndarray of int
+            number of non-rl (row 0) and rl (row 1) vehicles in every cell
+        np.ndarray of float
+            mean speed of the non-rl (row 0) and rl (row 1) vehicles in every
+            cell, 0 if the cell contains no such vehicles
+        """
+        num_cells = self.num_cells
+        valid = cell >= 0
+        key = np.asarray(is_rl, dtype=np.int64)[valid] * num_cells \
+            + cell[valid]
+        num_veh = np.bincount(key, minlength=2 * num_cells)
+        tot_speed = np.bincount(key, weights=np.asarray(speed)[valid],
+                                minlength=2 * num_cells)
+        mean_speed = np.divide(tot_speed, num_veh,
+                               out=np.zeros(2 * num_cells), where=num_veh > 0)
+        return num_veh.reshape(2, num_cells), mean_speed.reshape(2, num_cells)
@@ -9,20 +9,237 @@ import warnings
 from flow.controllers.car_following_models import SimCarFollowingController
 from flow.controllers.rlcontroller import RLController
 from flow.controllers.lane_change_controllers import SimLaneChangeController
-from bisect import bisect_left
-import itertools
+from flow.utils.exceptions import FatalFlowError
 from copy import deepcopy
+import itertools
 
 # colors for vehicles
 WHITE = (255, 255, 255)
 CYAN = (0, 255, 255)
 RED = (255, 0, 0)
 
+# number of rows initially allocated in the columnar vehicle state store. The
+# store doubles in size whenever it runs out of free rows.
+INITIAL_CAPACITY = 64
+
+# columns of the vehicle state store, and the value each column takes when the
+# data is missing (e.g. the vehicle has not been subscribed to yet). Integer
+# columns containing row indices (leader, follower) use the missing value to
+# denote the absence of a leader/follower.
+COLUMNS = {
+    'speed': (np.float64, np.nan),
+    'default_speed': (np.float64, np.nan),
+    'position': (np.float64, np.nan),
+    'lane': (np.int64, -1),
+    'edge': (np.int64, -1),
+    'length': (np.float64, np.nan),
+    'headway': (np.float64, np.nan),
+    'leader': (np.int64, -1),
+    'follower': (np.int64, -1),
+    'x': (np.float64, np.nan),
+}
+
+# default time span (in seconds) covered by the buffers used to compute
+# inflow and outflow rates. The buffers are enlarged whenever a larger time
+# span is requested
+FLOW_RATE_TIME_SPAN = 3600
+
+# variables that are subscribed to for every vehicle, as they are needed by
+# the kernel itself
+SUBSCRIPTION_VARS = [
+    tc.VAR_LANE_INDEX, tc.VAR_LANEPOSITION, tc.VAR_ROAD_ID, tc.VAR_SPEED
+]
+
+# optional vehicle variables, and the variables that need to be subscribed to
+# in order to read them. The "leader" variable (leader and headway of a
+# vehicle) is retrieved through a leader subscription of the vehicle, while
+# the "follower" variable requires a leader subscription of every vehicle
+OPTIONAL_VARS = collections.OrderedDict([
+    ('route', [tc.VAR_EDGES]),
+    ('orientation', [tc.VAR_POSITION, tc.VAR_ANGLE]),
+    ('default_speed', [tc.VAR_SPEED_WITHOUT_TRACI]),
+    ('leader', []),
+    ('follower', []),
+])
+
+# additional variables that are retrieved when using a context subscription,
+# in order to avoid querying them separately for every entering vehicle
+CONTEXT_SUBSCRIPTION_VARS = [tc.VAR_TYPE, tc.VAR_LENGTH]
+
+# columns of the vehicle state store that are filled directly from the
+# subscription results of each vehicle
+SUBSCRIBED_COLUMNS = [
+    ('speed', tc.VAR_SPEED),
+    ('default_speed', tc.VAR_SPEED_WITHOUT_TRACI),
+    ('position', tc.VAR_LANEPOSITION),
+    ('lane', tc.VAR_LANE_INDEX),
+]
+
+
+class IdSet(object):
+    """Ordered collection of vehicle ids.
+
+    Ids are stored as the keys of a dictionary, so that adding, removing, and
+    checking for an id take constant time while the order in which ids were
+    added is preserved. The ids are also available as a list (see `as_list`),
+    which is only rebuilt once the collection changed.
+    """
+
+    def __init__(self, ids=(), sort=False):
+        """Instantiate the collection.
+
+        Parameters
+        ----------
+        ids : iterable of str, optional
+            initial ids of the collection
+        sort : bool, optional
+            whether the list of ids is sorted instead of following the order
+            in which ids were added
+        """
+        self.__ids = dict.fromkeys(ids)
+        self.__sort = sort
+        self.__list = None
+
+    def add(self, veh_id):
+        """Add an id to the collection, if it is not already in it."""
+        if veh_id not in self.__ids:
+            self.__ids[veh_id] = None
+            self.__list = None
+
+    def discard(self, veh_id):
+        """Remove an id from the collection, if it is in it."""
+        if veh_id in self.__ids:
+            del self.__ids[veh_id]
+            self.__list = None
+
+    def clear(self):
+        """Remove all ids from the collection."""
+        self.__ids.clear()
+        self.__list = None
+
+    def as_list(self):
+        """Return the ids as a list.
+
+        The same list is returned until the collection changes, and should not
+        be modified.
+        """
+        if self.__list is None:
+            self.__list = sorted(self.__ids) if self.__sort \
+                else list(self.__ids)
+        return self.__list
+
+    def __contains__(self, veh_id):
+        """Check whether an id is in the collection."""
+        return veh_id in self.__ids
+
+    def __len__(self):
+        """Return the number of ids in the collection."""
+        return len(self.__ids)
+
+    def __iter__(self):
+        """Iterate over the ids, in the order of `as_list`.
+
+        The collection may be modified during the iteration.
+        """
+        return iter(self.as_list())
+
+
+class ControllerRegistry(object):
+    """Controllers of the vehicles of every type.
+
+    Controllers whose `stateless` attribute is set hold no state specific to
+    the vehicle they control, and a single instance is shared by all vehicles
+    of a type (see `bind`). Other controllers are recycled: the controllers of
+    vehicles that left the network are kept in a pool, and are reinitialized
+    for the next vehicle of the same type that enters the network. Vehicle
+    churn then does not lead to the creation of new controllers.
+    """
+
+    def __init__(self):
+        """Instantiate the registry."""
+        # shared controllers. Key = (vehicle type, kind of controller)
+        self.__shared = {}
+        # controllers that are no longer in use. Key = (vehicle type, kind of
+        # controller), Element = list of controllers
+        self.__pools = collections.defaultdict(list)
+
+    def acquire(self, key, controller_class, veh_id, **kwargs):
+        """Return a controller for a vehicle.
+
+        Parameters
+        ----------
+        key : tuple
+            vehicle type and kind of controller (e.g. "acc_controller")
+        controller_class : type
+            class of the controller
+        veh_id : str
+            name of the vehicle
+        kwargs : dict
+            parameters of the controller, besides the name of the vehicle
+
+        Returns
+        -------
+        object
+            the controller of the vehicle
+        """
+        if getattr(controller_class, 'stateless', False):
+            controller = self.__shared.get(key)
+            if controller is None:
+                controller = controller_class(veh_id=veh_id, **kwargs)
+                self.__shared[key] = controller
+            else:
+                controller.veh_id = veh_id
+        elif self.__pools[key]:
+            controller = self.__pools[key].pop()
+            controller.__init__(veh_id=veh_id, **kwargs)
+        else:
+            controller = controller_class(veh_id=veh_id, **kwargs)
+
+        return controller
+
+    def release(self, key, controller):
+        """Return the controller of a vehicle that left the network.
+
+        Parameters
+        ----------
+        key : tuple
+            vehicle type and kind of controller
+        controller : object
+            the controller of the vehicle
+        """
+        if controller is not None and \
+                not getattr(controller, 'stateless', False):
+            self.__pools[key].append(controller)
+
+    @staticmethod
+    def bind(controller, veh_id):
+        """Bind a controller to the vehicle whose actions are requested.
+
+        Shared controllers read the name of the vehicle they control from
+        their `veh_id` attribute, which is set to the vehicle the controller
+        was last requested for. Other controllers are returned unchanged.
+        """
+        if controller is not None and getattr(controller, 'stateless', False):
+            controller.veh_id = veh_id
+        return controller
+
+    def clear(self):
+        """Remove all controllers from the registry."""
+        self.__shared.clear()
+        self.__pools.clear()
+
 
 class TraCIVehicle(KernelVehicle):
     """Flow kernel for the TraCI API.
 
     Extends flow.core.kernel.vehicle.base.KernelVehicle
+
+    State information that is accessed frequently (speeds, positions, lanes,
+    edges, lengths, headways, leaders and followers) is stored in a columnar
+    (struct-of-arrays) format: every vehicle is assigned a row that it keeps
+    for as long as it is in the network, and every variable is stored in a
+    contiguous numpy array. Requesting a variable for a list or array of
+    vehicles is then performed as a single gather over the relevant column.
     """
 
     def __init__(self,
@@ -31,12 +248,31 @@ class TraCIVehicle(KernelVehicle):
         """See parent class."""
         KernelVehicle.__init__(self, master_kernel, sim_params)
 
-        self.__ids = []  # ids of all vehicles
-        self.__human_ids = []  # ids of human-driven vehicles
-        self.__controlled_ids = []  # ids of flow-controlled vehicles
-        self.__controlled_lc_ids = []  # ids of flow lc-controlled vehicles
-        self.__rl_ids = []  # ids of rl-controlled vehicles
-        self.__observed_ids = []  # ids of the observed vehicles
+        # whether to retrieve the state of all vehicles through a single
+        # context subscription
+        self._context_subscription = sim_params.context_subscription
+
+        # variables that are subscribed to for every vehicle
+        self._subscription_vars = SUBSCRIPTION_VARS + [
+            var for variables in OPTIONAL_VARS.values() for var in variables]
+        # vehicle types whose leaders are subscribed to, None for all types
+        self._leader_types = None
+
+        self.__ids = IdSet()  # ids of all vehicles
+        self.__human_ids = IdSet()  # ids of human-driven vehicles
+        self.__controlled_ids = IdSet()  # ids of flow-controlled vehicles
+        self.__controlled_lc_ids = IdSet()  # ids of lc-controlled vehicles
+        self.__rl_ids = IdSet(sort=True)  # ids of rl-controlled vehicles
+        self.__observed_ids = IdSet()  # ids of the observed vehicles
+
+        # ids of the vehicles whose routers are only called when they enter a
+        # new edge, and of the vehicles whose routers are called at every
+        # step (see the event_driven attribute of flow.controllers.BaseRouter)
+        self.__event_router_ids = IdSet()
+        self.__polled_router_ids = IdSet()
+        # ids of the vehicles that entered a new edge or the network during
+        # the last step
+        self.__edge_transition_ids = []
 
         # vehicles: Key = Vehicle ID, Value = Dictionary describing the vehicle
         # Ordered dictionary used to keep neural net inputs in order
@@ -46,6 +282,66 @@ class TraCIVehicle(KernelVehicle):
         # on the state of the vehicles for a given time step
         self.__sumo_obs = {}
 
+        # columnar vehicle state store. Key = name of the column, Element =
+        # array of values, indexed by the row of each vehicle
+        self.__columns = {
+            name: np.full(INITIAL_CAPACITY, missing, dtype=dtype)
+            for name, (dtype, missing) in COLUMNS.items()}
+        # Key = vehicle ID, Element = row of the vehicle in the store
+        self.__rows = {}
+        # Index = row, Element = ID of the vehicle in this row (None if free)
+        self.__row_ids = [None] * INITIAL_CAPACITY
+        # rows that were released by vehicles that left the network
+        self.__free_rows = []
+        # number of rows that have been used at least once
+        self.__num_rows = 0
+
+        # names of the edges vehicles have been on, indexed by the values in
+        # the "edge" column, and the inverse mapping
+        self.__edge_names = ['']
+        self.__edge_index = {'': 0}
+
+        # multi-lane data (lane headways, tailways, leaders and followers) of
+        # every vehicle. Index = row in the state store, lane index. Leaders
+        # and followers are stored by row (-1 if absent)
+        self.__lane_num = np.zeros(0, dtype=np.int64)
+        self.__lane_headways = np.zeros((0, 0))
+        self.__lane_tailways = np.zeros((0, 0))
+        self.__lane_leaders = np.zeros((0, 0), dtype=np.int64)
+        self.__lane_followers = np.zeros((0, 0), dtype=np.int64)
+
+        # rows of all vehicles, sorted by edge, lane and position. This
+        # ordering is maintained across steps, with the rows of the vehicles
+        # that entered/left the network since the last update as deltas
+        self.__lane_order = np.zeros(0, dtype=np.int64)
+        self.__added_rows = []
+        self.__removed_rows = []
+        # sorted rows of the vehicles located on an edge, and the first and
+        # last (exclusive) index of the vehicles in each lane. Key = edge
+        # index * maximum number of lanes + lane index
+        self.__lane_rows = np.zeros(0, dtype=np.int64)
+        self.__lane_groups = {}
+        self.__max_lanes = 1
+        # lane graph of the scenario, and the first lane in this graph of
+        # every edge in the "edge" column
+        self.__graph_lane_start = (None, np.zeros(0, dtype=np.int64))
+        # starting positions of the edges in the "edge" column, and whether
+        # the positions of vehicles on them are added to compute their
+        # absolute positions (see TraCIScenario.get_edge_starts)
+        self.__edge_starts = (None, np.zeros(0), np.zeros(0, dtype=bool))
+        # segments vehicles were last aggregated over, and the edge of these
+        # segments of every edge in the "edge" column (see
+        # get_segment_aggregates)
+        self.__segment_edges = (None, np.zeros(0, dtype=np.int64))
+
+        # actuation commands (slowDown, changeLane, setRoute) requested during
+        # the current step. Key = (command, vehicle id), Element = arguments
+        self.__commands = collections.OrderedDict()
+        # number of commands sent to sumo, and number of commands that were
+        # dropped because they were replaced or had no effect
+        self.__num_commands_sent = 0
+        self.__num_commands_coalesced = 0
+
         # total number of vehicles in the network
         self.num_vehicles = 0
         # number of rl vehicles in the network
@@ -54,20 +350,124 @@ class TraCIVehicle(KernelVehicle):
         # contains the parameters associated with each type of vehicle
         self.type_parameters = {}
 
+        # controllers of the vehicles of every type
+        self.__controllers = ControllerRegistry()
+
         # contain the minGap attribute of each type of vehicle
         self.minGap = {}
 
         # list of vehicle ids located in each edge in the network
         self._ids_by_edge = dict()
 
-        # number of vehicles that entered the network for every time-step
-        self._num_departed = []
+        # cumulative number of vehicles that entered (column 0) and exited
+        # (column 1) the network since the last reset, for the most recent
+        # time-steps. This is a ring buffer: the totals after step n are
+        # located in row n % capacity
+        self._cum_flows = np.zeros(
+            (int(FLOW_RATE_TIME_SPAN / self.sim_step) + 1, 2), dtype=np.int64)
+        # number of time-steps recorded since the last reset
+        self._num_flow_steps = 0
+        # earliest time-step whose cumulative counts are still available
+        self._first_flow_step = 0
+
+        # ids of the vehicles that entered the network in the last time-step
         self._departed_ids = []
 
-        # number of vehicles to exit the network for every time-step
-        self._num_arrived = []
+        # ids of the vehicles that exited the network in the last time-step
         self._arrived_ids = []
 
+    def pass_api(self, kernel_api):
+        """See parent class.
+
+        If context subscriptions are used, this also subscribes to the
+        variables of all vehicles in the network. Vehicles that are already
+        in the kernel (e.g. when the simulation is restored from a snapshot)
+        are subscribed to again, and their speed and lane change modes, which
+        are not part of the states saved by sumo, are set again.
+        """
+        KernelVehicle.pass_api(self, kernel_api)
+
+        if self._context_subscription:
+            self.kernel_api.simulation.subscribeContext(
+                "", tc.CMD_GET_VEHICLE_VARIABLE, 0,
+                self._subscription_vars + CONTEXT_SUBSCRIPTION_VARS)
+
+        if len(self.__ids) > 0:
+            sumo_ids = set(self.kernel_api.vehicle.getIDList())
+            for veh_id in self.__ids:
+                veh_type = self.__vehicles.get(veh_id, {}).get("type")
+                if veh_id not in sumo_ids or veh_type is None:
+                    continue
+                if not self._context_subscription:
+                    self.kernel_api.vehicle.subscribe(
+                        veh_id, self._subscription_vars)
+                if self._leader_types is None or \
+                        veh_type in self._leader_types:
+                    self.kernel_api.vehicle.subscribeLeader(veh_id, 2000)
+                self.kernel_api.vehicle.setSpeedMode(
+                    veh_id, self.type_parameters[veh_type][
+                        "car_following_params"].speed_mode)
+                self.kernel_api.vehicle.setLaneChangeMode(
+                    veh_id, self.type_parameters[veh_type][
+                        "lane_change_params"].lane_change_mode)
+
+    def set_required_variables(self, variables):
+        """See parent class.
+
+        The variables read by the controllers of every vehicle type (see the
+        required_vehicle_variables attribute of the controller classes) are
+        added to the variables of the environment. Leaders are only
+        subscribed to for vehicle types whose controllers read them, unless
+        the environment reads the leaders or followers of vehicles.
+
+        Raises
+        ------
+        ValueError
+            if an unknown variable is specified
+        """
+        if variables is None:
+            KernelVehicle.set_required_variables(self, None)
+            self._leader_types = None
+            self._subscription_vars = SUBSCRIPTION_VARS + [
+                var for v in OPTIONAL_VARS.values() for var in v]
+            return
+
+        required = set(variables)
+        leader_types = set()
+        for veh_type, params in self.type_parameters.items():
+            for controller in [params['acceleration_controller'],
+                               params['lane_change_controller'],
+                               params['routing_controller']]:
+                if controller is None:
+                    continue
+                # controllers that do not specify the variables they read
+                # may read any variable
+                controller_vars = getattr(
+                    controller[0], 'required_vehicle_variables', None)
+                if controller_vars is None:
+                    controller_vars = OPTIONAL_VARS.keys()
+                required.update(controller_vars)
+                if 'leader' in controller_vars:
+                    leader_types.add(veh_type)
+
+        unknown = required - set(OPTIONAL_VARS)
+        if len(unknown) > 0:
+            raise ValueError('Unknown vehicle variables: {}'.format(
+                ', '.join(sorted(unknown))))
+
+        # leaders and followers read by the environment may belong to any
+        # vehicle
+        if 'follower' in required or 'leader' in set(variables):
+            leader_types = set(self.type_parameters.keys())
+        if 'follower' in required:
+            required.add('leader')
+
+        KernelVehicle.set_required_variables(self, required)
+        self._leader_types = leader_types
+        self._subscription_vars = SUBSCRIPTION_VARS + [
+            var for name, v in OPTIONAL_VARS.items() if name in required
+            for var in v]
+
     def initialize(self, vehicles):
         """Initialize vehicle state information.
 
@@ -84,6 +484,7 @@ class TraCIVehicle(KernelVehicle):
         self.minGap = vehicles.minGap
         self.num_vehicles = 0
         self.num_rl_vehicles = 0
+        self.__controllers.clear()
 
         self.__vehicles.clear()
         for typ in vehicles.initial:
@@ -113,29 +514,42 @@ class TraCIVehicle(KernelVehicle):
             specifies whether the simulator was reset in the last simulation
             step
         """
-        vehicle_obs = {}
-        for veh_id in self.__ids:
-            vehicle_obs[veh_id] = \
-                self.kernel_api.vehicle.getSubscriptionResults(veh_id)
+        if self._context_subscription:
+            # the state of all vehicles is contained in a single response.
+            # Leaders are still subscribed to separately for each vehicle
+            context_obs = \
+                self.kernel_api.simulation.getContextSubscriptionResults("")
+            vehicle_obs = {}
+            for veh_id, obs in (context_obs or {}).items():
+                vehicle_obs[veh_id] = dict(obs)
+                vehicle_obs[veh_id].update(
+                    self.kernel_api.vehicle.getSubscriptionResults(veh_id))
+        else:
+            vehicle_obs = {}
+            for veh_id in self.__ids:
+                vehicle_obs[veh_id] = \
+                    self.kernel_api.vehicle.getSubscriptionResults(veh_id)
         sim_obs = self.kernel_api.simulation.getSubscriptionResults()
 
-        # remove exiting vehicles from the vehicles class
+        # remove exiting vehicles from the vehicles class. These vehicles
+        # already left the network, so sumo does not need to remove them
+        arrived_ids = []
         for veh_id in sim_obs[tc.VAR_ARRIVED_VEHICLES_IDS]:
             if veh_id not in sim_obs[tc.VAR_TELEPORT_STARTING_VEHICLES_IDS]:
-                self.remove(veh_id)
+                arrived_ids.append(veh_id)
                 # remove exiting vehicles from the vehicle subscription if they
                 # haven't been removed already
-                if vehicle_obs[veh_id] is None:
+                if vehicle_obs.get(veh_id) is None:
                     vehicle_obs.pop(veh_id, None)
             else:
                 # this is meant to resolve the KeyError bug when there are
                 # collisions
                 vehicle_obs[veh_id] = self.__sumo_obs[veh_id]
+        self._remove_from_kernel(arrived_ids)
 
         # add entering vehicles into the vehicles class
         for veh_id in sim_obs[tc.VAR_DEPARTED_VEHICLES_IDS]:
-            veh_type = self.kernel_api.vehicle.getTypeID(veh_id)
-            if veh_id in self.get_ids():
+            if veh_id in self.__ids:
                 # this occurs when a vehicle is actively being removed and
                 # placed again in the network to ensure a constant number of
                 # total vehicles (e.g. GreenWaveEnv). In this case, the vehicle
@@ -143,7 +557,7 @@ class TraCIVehicle(KernelVehicle):
                 # updated
                 pass
             else:
-                obs = self._add_departed(veh_id, veh_type)
+                obs = self._add_departed(veh_id, vehicle_obs.get(veh_id))
                 # add the subscription information of the new vehicle
                 vehicle_obs[veh_id] = obs
 
@@ -155,10 +569,10 @@ class TraCIVehicle(KernelVehicle):
             for veh_id in self.__rl_ids:
                 self.__vehicles[veh_id]["last_lc"] = -float("inf")
                 self.prev_last_lc[veh_id] = -float("inf")
-            self._num_departed.clear()
-            self._num_arrived.clear()
-            self._departed_ids.clear()
-            self._arrived_ids.clear()
+            self._num_flow_steps = 0
+            self._first_flow_step = 0
+            self._departed_ids = []
+            self._arrived_ids = []
 
             # add vehicles from a network template, if applicable
             if hasattr(self.master_kernel.scenario.network,
@@ -181,40 +595,70 @@ class TraCIVehicle(KernelVehicle):
                 if vehicle_obs[veh_id][tc.VAR_LANE_INDEX] != prev_lane:
                     self.__vehicles[veh_id]["last_lc"] = self.time_counter
 
-            # updated the list of departed and arrived vehicles
-            self._num_departed.append(
-                len(sim_obs[tc.VAR_DEPARTED_VEHICLES_IDS]))
-            self._num_arrived.append(len(sim_obs[tc.VAR_ARRIVED_VEHICLES_IDS]))
-            self._departed_ids.append(sim_obs[tc.VAR_ARRIVED_VEHICLES_IDS])
-            self._arrived_ids.append(sim_obs[tc.VAR_ARRIVED_VEHICLES_IDS])
-
-        # update the "headway", "leader", and "follower" variables
+            # updated the number and list of departed and arrived vehicles
+            self._record_flows(len(sim_obs[tc.VAR_DEPARTED_VEHICLES_IDS]),
+                               len(sim_obs[tc.VAR_ARRIVED_VEHICLES_IDS]))
+            self._departed_ids = [sim_obs[tc.VAR_DEPARTED_VEHICLES_IDS]]
+            self._arrived_ids = [sim_obs[tc.VAR_ARRIVED_VEHICLES_IDS]]
+
+        # update the columnar state store with the new subscription results
+        veh_ids = self.__ids.as_list()
+        rows = self._get_rows(veh_ids)
+        obs = [vehicle_obs.get(veh_id) or {} for veh_id in veh_ids]
+        for name, var in SUBSCRIBED_COLUMNS:
+            missing = COLUMNS[name][1]
+            self.__columns[name][rows] = [o.get(var, missing) for o in obs]
+        edges = np.array(
+            [self._get_edge_index(o.get(tc.VAR_ROAD_ID)) for o in obs],
+            dtype=np.int64)
+
+        # vehicles that entered a new edge or the network during the last
+        # step. All vehicles are considered to have done so after a reset
+        if reset:
+            self.__edge_transition_ids = veh_ids
+        else:
+            departed = set(sim_obs[tc.VAR_DEPARTED_VEHICLES_IDS])
+            changed = self.__columns["edge"][rows] != edges
+            self.__edge_transition_ids = [
+                veh_id for veh_id, is_changed in zip(veh_ids, changed)
+                if is_changed or veh_id in departed]
+        self.__columns["edge"][rows] = edges
+        self._update_x(rows)
+
+        # update the "headway", "leader", and "follower" variables. Vehicles
+        # with no leader (or collided vehicles) are given a headway of 1000 m
+        leaders = [o.get(tc.VAR_LEADER) for o in obs]
+        self.__columns["headway"][rows] = [
+            1e+3 if lead is None else
+            lead[1] + self.minGap[self.__vehicles[veh_id]["type"]]
+            for veh_id, lead in zip(veh_ids, leaders)]
+        leader_rows = np.array(
+            [-1 if lead is None else self.__rows.get(lead[0], -1)
+             for lead in leaders], dtype=np.int64)
+        self.__columns["leader"][rows] = leader_rows
+        # the follower of a vehicle is the vehicle whose leader it is
+        has_leader = leader_rows >= 0
+        self.__columns["follower"][:] = -1
+        self.__columns["follower"][leader_rows[has_leader]] = rows[has_leader]
+
+        _time_step = sim_obs[tc.VAR_TIME_STEP]
+        _time_delta = sim_obs[tc.VAR_DELTA_T]
         for veh_id in self.__ids:
-            try:
-                _position = vehicle_obs.get(veh_id, {}).get(
-                    tc.VAR_POSITION, -1001)
-                _angle = vehicle_obs.get(veh_id, {}).get(tc.VAR_ANGLE, -1001)
-                _time_step = sim_obs[tc.VAR_TIME_STEP]
-                _time_delta = sim_obs[tc.VAR_DELTA_T]
-                self.__vehicles[veh_id]["orientation"] = \
-                    list(_position) + [_angle]
-                self.__vehicles[veh_id]["timestep"] = _time_step
-                self.__vehicles[veh_id]["timedelta"] = _time_delta
-            except TypeError:
-                pass
-            headway = vehicle_obs.get(veh_id, {}).get(tc.VAR_LEADER, None)
-            # check for a collided vehicle or a vehicle with no leader
-            if headway is None:
-                self.__vehicles[veh_id]["leader"] = None
-                self.__vehicles[veh_id]["follower"] = None
-                self.__vehicles[veh_id]["headway"] = 1e+3
-            else:
-                min_gap = self.minGap[self.get_type(veh_id)]
-                self.__vehicles[veh_id]["headway"] = headway[1] + min_gap
-                self.__vehicles[veh_id]["leader"] = headway[0]
+            self.__vehicles[veh_id]["timestep"] = _time_step
+            self.__vehicles[veh_id]["timedelta"] = _time_delta
+
+        # the orientation of vehicles is only available if it is subscribed to
+        if self.required_variables is None or \
+                "orientation" in self.required_variables:
+            for veh_id in self.__ids:
                 try:
-                    self.__vehicles[headway[0]]["follower"] = veh_id
-                except KeyError:
+                    _position = vehicle_obs.get(veh_id, {}).get(
+                        tc.VAR_POSITION, -1001)
+                    _angle = vehicle_obs.get(veh_id, {}).get(
+                        tc.VAR_ANGLE, -1001)
+                    self.__vehicles[veh_id]["orientation"] = \
+                        list(_position) + [_angle]
+                except TypeError:
                     pass
 
         # update the sumo observations variable
@@ -223,28 +667,35 @@ class TraCIVehicle(KernelVehicle):
         # update the lane leaders data for each vehicle
         self._multi_lane_headways()
 
-        # make sure the rl vehicle list is still sorted
-        self.__rl_ids.sort()
-
-    def _add_departed(self, veh_id, veh_type):
+    def _add_departed(self, veh_id, obs=None):
         """Add a vehicle that entered the network from an inflow or reset.
 
         Parameters
         ----------
         veh_id: str
             name of the vehicle
-        veh_type: str
-            type of vehicle, as specified to sumo
+        obs: dict, optional
+            context subscription results of the vehicle, if available. These
+            are used in place of individual queries to sumo for the type,
+            length, and state of the vehicle.
 
         Returns
         -------
         dict
             subscription results from the new vehicle
         """
+        if obs is not None and tc.VAR_TYPE in obs:
+            veh_type = obs[tc.VAR_TYPE]
+            length = obs[tc.VAR_LENGTH]
+        else:
+            obs = None
+            veh_type = self.kernel_api.vehicle.getTypeID(veh_id)
+            length = self.kernel_api.vehicle.getLength(veh_id)
+
         if veh_type not in self.type_parameters:
             raise KeyError("Entering vehicle is not a valid type.")
 
-        self.__ids.append(veh_id)
+        self.__ids.add(veh_id)
         if veh_id not in self.__vehicles:
             self.num_vehicles += 1
             self.__vehicles[veh_id] = dict()
@@ -255,50 +706,68 @@ class TraCIVehicle(KernelVehicle):
         car_following_params = \
             self.type_parameters[veh_type]["car_following_params"]
 
+        # return the controllers of a vehicle that re-entered the network
+        self._release_controllers(veh_id)
+
         # specify the acceleration controller class
         accel_controller = \
             self.type_parameters[veh_type]["acceleration_controller"]
-        self.__vehicles[veh_id]["acc_controller"] = \
-            accel_controller[0](veh_id,
-                                car_following_params=car_following_params,
-                                **accel_controller[1])
+        self.__vehicles[veh_id]["acc_controller"] = self.__controllers.acquire(
+            (veh_type, "acc_controller"), accel_controller[0], veh_id,
+            car_following_params=car_following_params, **accel_controller[1])
 
         # specify the lane-changing controller class
         lc_controller = \
             self.type_parameters[veh_type]["lane_change_controller"]
-        self.__vehicles[veh_id]["lane_changer"] = \
-            lc_controller[0](veh_id=veh_id, **lc_controller[1])
+        self.__vehicles[veh_id]["lane_changer"] = self.__controllers.acquire(
+            (veh_type, "lane_changer"), lc_controller[0], veh_id,
+            **lc_controller[1])
 
         # specify the routing controller class
         rt_controller = self.type_parameters[veh_type]["routing_controller"]
         if rt_controller is not None:
-            self.__vehicles[veh_id]["router"] = \
-                rt_controller[0](veh_id=veh_id, router_params=rt_controller[1])
+            self.__vehicles[veh_id]["router"] = self.__controllers.acquire(
+                (veh_type, "router"), rt_controller[0], veh_id,
+                router_params=rt_controller[1])
         else:
             self.__vehicles[veh_id]["router"] = None
 
+        # routers are either called when the vehicle enters a new edge, or at
+        # every step
+        self.__event_router_ids.discard(veh_id)
+        self.__polled_router_ids.discard(veh_id)
+        if rt_controller is not None:
+            if getattr(rt_controller[0], 'event_driven', False):
+                self.__event_router_ids.add(veh_id)
+            else:
+                self.__polled_router_ids.add(veh_id)
+
         # add the vehicle's id to the list of vehicle ids
         if accel_controller[0] == RLController:
-            self.__rl_ids.append(veh_id)
+            self.__rl_ids.add(veh_id)
             self.num_rl_vehicles += 1
         else:
-            self.__human_ids.append(veh_id)
+            self.__human_ids.add(veh_id)
             if accel_controller[0] != SimCarFollowingController:
-                self.__controlled_ids.append(veh_id)
+                self.__controlled_ids.add(veh_id)
             if lc_controller[0] != SimLaneChangeController:
-                self.__controlled_lc_ids.append(veh_id)
+                self.__controlled_lc_ids.add(veh_id)
+
+        # subscribe the new vehicle. When using context subscriptions, only
+        # the leader needs to be subscribed to
+        if obs is None:
+            self.kernel_api.vehicle.subscribe(veh_id, self._subscription_vars)
+        if self._leader_types is None or veh_type in self._leader_types:
+            self.kernel_api.vehicle.subscribeLeader(veh_id, 2000)
 
-        # subscribe the new vehicle
-        self.kernel_api.vehicle.subscribe(veh_id, [
-            tc.VAR_LANE_INDEX, tc.VAR_LANEPOSITION, tc.VAR_ROAD_ID,
-            tc.VAR_SPEED, tc.VAR_EDGES, tc.VAR_POSITION, tc.VAR_ANGLE,
-            tc.VAR_SPEED_WITHOUT_TRACI
-        ])
-        self.kernel_api.vehicle.subscribeLeader(veh_id, 2000)
+        # get the subscription results from the new vehicle
+        new_obs = dict(obs or {})
+        new_obs.update(self.kernel_api.vehicle.getSubscriptionResults(veh_id))
 
-        # some constant vehicle parameters to the vehicles class
-        self.__vehicles[veh_id]["length"] = self.kernel_api.vehicle.getLength(
-            veh_id)
+        # assign a row in the state store to the vehicle, and add some
+        # constant vehicle parameters to it
+        row = self._allocate_row(veh_id)
+        self.__columns["length"][row] = length
 
         # set the "last_lc" parameter of the vehicle
         self.__vehicles[veh_id]["last_lc"] = -float("inf")
@@ -317,75 +786,331 @@ class TraCIVehicle(KernelVehicle):
             "lane_change_params"].lane_change_mode
         self.kernel_api.vehicle.setLaneChangeMode(veh_id, lc_mode)
 
-        # get initial state info
+        # get initial state info. The subscription results already contain
+        # the current state of the vehicle, so sumo does not need to be
+        # queried again
         self.__sumo_obs[veh_id] = dict()
-        self.__sumo_obs[veh_id][tc.VAR_ROAD_ID] = \
-            self.kernel_api.vehicle.getRoadID(veh_id)
-        self.__sumo_obs[veh_id][tc.VAR_LANEPOSITION] = \
-            self.kernel_api.vehicle.getLanePosition(veh_id)
-        self.__sumo_obs[veh_id][tc.VAR_LANE_INDEX] = \
-            self.kernel_api.vehicle.getLaneIndex(veh_id)
-        self.__sumo_obs[veh_id][tc.VAR_SPEED] = \
-            self.kernel_api.vehicle.getSpeed(veh_id)
-
-        # make sure that the order of rl_ids is kept sorted
-        self.__rl_ids.sort()
-
-        # get the subscription results from the new vehicle
-        new_obs = self.kernel_api.vehicle.getSubscriptionResults(veh_id)
+        self.__columns["edge"][row] = self._get_edge_index(
+            new_obs.get(tc.VAR_ROAD_ID))
+        self.__columns["position"][row] = new_obs.get(
+            tc.VAR_LANEPOSITION, np.nan)
+        self.__columns["lane"][row] = new_obs.get(tc.VAR_LANE_INDEX, -1)
+        self.__columns["speed"][row] = new_obs.get(tc.VAR_SPEED, np.nan)
 
         return new_obs
 
     def remove(self, veh_id):
         """See parent class."""
-        # remove from sumo
-        if veh_id in self.kernel_api.vehicle.getIDList():
-            self.kernel_api.vehicle.unsubscribe(veh_id)
-            self.kernel_api.vehicle.remove(veh_id)
-
-        try:
-            # remove from the vehicles kernel
-            del self.__vehicles[veh_id]
-            del self.__sumo_obs[veh_id]
-            self.__ids.remove(veh_id)
-
-            # remove it from all other ids (if it is there)
-            if veh_id in self.__human_ids:
-                self.__human_ids.remove(veh_id)
-                if veh_id in self.__controlled_ids:
-                    self.__controlled_ids.remove(veh_id)
-                if veh_id in self.__controlled_lc_ids:
-                    self.__controlled_lc_ids.remove(veh_id)
-            else:
-                self.__rl_ids.remove(veh_id)
+        self.remove_many([veh_id])
+
+    def remove_many(self, veh_ids):
+        """See parent class.
+
+        Vehicles in the vehicles kernel are known to be in the network. The
+        ids of the vehicles in the network are only retrieved from sumo if
+        some of the vehicles are not in the kernel.
+        """
+        veh_ids = list(veh_ids)
+        if any(veh_id not in self.__ids for veh_id in veh_ids):
+            sumo_ids = set(self.kernel_api.vehicle.getIDList())
+            self._remove_from_sumo(
+                [veh_id for veh_id in veh_ids
+                 if veh_id in self.__ids or veh_id in sumo_ids])
+        else:
+            self._remove_from_sumo(veh_ids)
+
+        self._remove_from_kernel(veh_ids)
+
+    def clear(self):
+        """See parent class."""
+        self._remove_from_sumo(self.kernel_api.vehicle.getIDList())
+        self._remove_from_kernel(self.__ids.as_list())
 
-            # make sure that the rl ids remain sorted
-            self.__rl_ids.sort()
-        except KeyError:
-            pass
+    def _remove_from_sumo(self, veh_ids):
+        """Remove vehicles from sumo, along with their subscriptions.
+
+        Parameters
+        ----------
+        veh_ids : list of str
+            names of the vehicles, which are expected to be in the network
+        """
+        for veh_id in veh_ids:
+            try:
+                self.kernel_api.vehicle.unsubscribe(veh_id)
+                self.kernel_api.vehicle.remove(veh_id)
+            except TraCIException:
+                # the vehicle left the network in the meantime (e.g. it is
+                # teleporting)
+                pass
+
+    def _remove_from_kernel(self, veh_ids):
+        """Remove all traces of vehicles from the vehicles kernel.
+
+        Parameters
+        ----------
+        veh_ids : list of str
+            names of the vehicles
+        """
+        if len(veh_ids) == 0:
+            return
+
+        # release the vehicles' rows in the state store
+        self._release_rows(veh_ids)
+
+        for veh_id in veh_ids:
+            # drop any pending command for the vehicle
+            for command in ["slowDown", "changeLane", "setRoute"]:
+                self.__commands.pop((command, veh_id), None)
+
+            # return the controllers of the vehicle to the registry, and
+            # remove it from the vehicles kernel and from all ids
+            self._release_controllers(veh_id)
+            self.__vehicles.pop(veh_id, None)
+            self.__sumo_obs.pop(veh_id, None)
+            for ids in [self.__ids, self.__human_ids, self.__controlled_ids,
+                        self.__controlled_lc_ids, self.__rl_ids,
+                        self.__event_router_ids, self.__polled_router_ids]:
+                ids.discard(veh_id)
 
         # modify the number of vehicles and RL vehicles
-        self.num_vehicles = len(self.get_ids())
-        self.num_rl_vehicles = len(self.get_rl_ids())
+        self.num_vehicles = len(self.__ids)
+        self.num_rl_vehicles = len(self.__rl_ids)
+
+    def _release_controllers(self, veh_id):
+        """Return the controllers of a vehicle to the controller registry."""
+        veh = self.__vehicles.get(veh_id)
+        if veh is None or "acc_controller" not in veh:
+            return
+        for kind in ["acc_controller", "lane_changer", "router"]:
+            self.__controllers.release((veh["type"], kind), veh.pop(kind))
 
     def test_set_speed(self, veh_id, speed):
         """Set the speed of the specified vehicle."""
-        self.__sumo_obs[veh_id][tc.VAR_SPEED] = speed
+        self.__columns["speed"][self.__rows[veh_id]] = speed
 
     def test_set_edge(self, veh_id, edge):
         """Set the speed of the specified vehicle."""
-        self.__sumo_obs[veh_id][tc.VAR_ROAD_ID] = edge
+        self.__columns["edge"][self.__rows[veh_id]] = \
+            self._get_edge_index(edge)
+        self._update_x(np.array([self.__rows[veh_id]]))
 
     def set_follower(self, veh_id, follower):
         """Set the follower of the specified vehicle."""
-        self.__vehicles[veh_id]["follower"] = follower
+        self.__columns["follower"][self.__rows[veh_id]] = \
+            self.__rows.get(follower, -1)
 
     def set_headway(self, veh_id, headway):
         """Set the headway of the specified vehicle."""
-        self.__vehicles[veh_id]["headway"] = headway
+        self.__columns["headway"][self.__rows[veh_id]] = headway
+
+    def _allocate_row(self, veh_id):
+        """Assign a row of the state store to a vehicle.
+
+        Rows released by vehicles that left the network are reused first. If
+        no free rows are available, the capacity of the store is doubled.
+
+        Parameters
+        ----------
+        veh_id : str
+            name of the vehicle
+
+        Returns
+        -------
+        int
+            row of the vehicle in the state store
+        """
+        if veh_id in self.__rows:
+            return self.__rows[veh_id]
+
+        if len(self.__free_rows) > 0:
+            row = self.__free_rows.pop()
+        else:
+            if self.__num_rows == len(self.__row_ids):
+                capacity = len(self.__row_ids)
+                for name, (dtype, missing) in COLUMNS.items():
+                    self.__columns[name] = np.concatenate(
+                        (self.__columns[name],
+                         np.full(capacity, missing, dtype=dtype)))
+                self.__row_ids.extend([None] * capacity)
+            row = self.__num_rows
+            self.__num_rows += 1
+
+        self.__rows[veh_id] = row
+        self.__row_ids[row] = veh_id
+        self.__added_rows.append(row)
+
+        return row
+
+    def _release_rows(self, veh_ids):
+        """Release the rows of vehicles that are leaving the network.
+
+        The contents of the rows are cleared, and any reference to them in the
+        leader/follower columns is removed.
+
+        Parameters
+        ----------
+        veh_ids : list of str
+            names of the vehicles
+        """
+        rows = [self.__rows.pop(veh_id) for veh_id in veh_ids
+                if veh_id in self.__rows]
+        if len(rows) == 0:
+            return
+
+        for name, (_, missing) in COLUMNS.items():
+            self.__columns[name][rows] = missing
+        for name in ["leader", "follower"]:
+            self.__columns[name][np.isin(self.__columns[name], rows)] = -1
+
+        # clear the multi-lane data of the vehicles
+        lane_rows = [row for row in rows if row < len(self.__lane_num)]
+        self.__lane_num[lane_rows] = 0
+        self.__lane_leaders[np.isin(self.__lane_leaders, rows)] = -1
+        self.__lane_followers[np.isin(self.__lane_followers, rows)] = -1
+
+        for row in rows:
+            self.__row_ids[row] = None
+        self.__free_rows.extend(rows)
+        released = set(rows)
+        self.__added_rows = [
+            row for row in self.__added_rows if row not in released]
+        self.__removed_rows.extend(rows)
+
+    def _get_rows(self, veh_ids):
+        """Return the rows of a list of vehicles (-1 if not in the store)."""
+        return np.fromiter((self.__rows.get(veh_id, -1) for veh_id in veh_ids),
+                           dtype=np.int64, count=len(veh_ids))
+
+    def _get_edge_index(self, edge):
+        """Return the index of an edge in the "edge" column.
+
+        Edges that have not been seen yet (e.g. internal edges) are added to
+        the list of known edges. If the edge is None, -1 is returned.
+        """
+        if edge is None:
+            return -1
+        if edge not in self.__edge_index:
+            self.__edge_index[edge] = len(self.__edge_names)
+            self.__edge_names.append(edge)
+        return self.__edge_index[edge]
+
+    def _get_column(self, name, veh_id, error):
+        """Return the value of a column of the state store.
+
+        Parameters
+        ----------
+        name : str
+            name of the column
+        veh_id : str or list of str
+            vehicle id, or list of vehicle ids
+        error : any
+            value that is returned if the vehicle is not found, or if the
+            value is missing
+
+        Returns
+        -------
+        float or int or np.ndarray
+            value of the column for the vehicle. If a list of vehicles is
+            provided, an array of values is returned instead.
+        """
+        column = self.__columns[name]
+        missing = COLUMNS[name][1]
+
+        if isinstance(veh_id, (list, np.ndarray)):
+            rows = self._get_rows(veh_id)
+            values = column[rows]
+            if np.isnan(missing):
+                is_missing = np.isnan(values)
+            else:
+                is_missing = values == missing
+            is_missing |= rows < 0
+            if np.any(is_missing):
+                values = np.where(is_missing, error, values)
+            return values
+
+        row = self.__rows.get(veh_id)
+        if row is None:
+            return error
+        value = column[row]
+        if value == missing or np.isnan(value):
+            return error
+        return value.item()
+
+    def _get_neighbor(self, name, veh_id, error):
+        """Return the leader or follower of the specified vehicle(s).
+
+        Parameters
+        ----------
+        name : str
+            "leader" or "follower"
+        veh_id : str or list of str
+            vehicle id, or list of vehicle ids
+        error : any
+            value that is returned if the vehicle is not found
+
+        Returns
+        -------
+        str or list of str
+            name of the leader/follower, or None if the vehicle does not have
+            one
+        """
+        if isinstance(veh_id, (list, np.ndarray)):
+            rows = self._get_rows(veh_id)
+            neighbors = self.__columns[name][rows]
+            return [error if row < 0 else
+                    None if nbr < 0 else self.__row_ids[nbr]
+                    for row, nbr in zip(rows, neighbors)]
+
+        row = self.__rows.get(veh_id)
+        if row is None:
+            return error
+        neighbor = self.__columns[name][row]
+        return None if neighbor < 0 else self.__row_ids[neighbor]
+
+    def _check_required(self, variable, veh_id=None):
+        """Ensure that a vehicle variable is retrieved before reading it.
+
+        Parameters
+        ----------
+        variable : str
+            name of the optional vehicle variable, see OPTIONAL_VARS
+        veh_id : str or list of str, optional
+            vehicle(s) whose leader is read. Leaders are only available for
+            vehicles whose leaders are subscribed to.
+
+        Raises
+        ------
+        flow.utils.exceptions.FatalFlowError
+            if the variable is not retrieved from sumo because it was not
+            declared by the environment or the controllers of the vehicles
+        """
+        if self.required_variables is None:
+            return
+
+        if variable not in self.required_variables:
+            raise FatalFlowError(
+                'The vehicle variable "{}" is not retrieved from the '
+                'simulator, since it is missing from the required vehicle '
+                'variables of the environment and the controllers.'.format(
+                    variable))
+
+        if variable == 'leader' and veh_id is not None:
+            veh_ids = veh_id if isinstance(veh_id, (list, np.ndarray)) \
+                else [veh_id]
+            for vid in veh_ids:
+                veh_type = self.__vehicles.get(vid, {}).get('type')
+                if veh_type is not None and \
+                        veh_type not in self._leader_types:
+                    raise FatalFlowError(
+                        'The leader of vehicle {} is not retrieved from the '
+                        'simulator, since it is not read by the controllers '
+                        'of vehicles of type {}. Add "leader" to the required '
+                        'vehicle variables of the environment.'.format(
+                            vid, veh_type))
 
     def get_orientation(self, veh_id):
         """See parent class."""
+        self._check_required('orientation')
         return self.__vehicles[veh_id]["orientation"]
 
     def get_timestep(self, veh_id):
@@ -405,37 +1130,35 @@ class TraCIVehicle(KernelVehicle):
 
     def get_ids(self):
         """See parent class."""
-        return self.__ids
+        return self.__ids.as_list()
 
     def get_human_ids(self):
         """See parent class."""
-        return self.__human_ids
+        return self.__human_ids.as_list()
 
     def get_controlled_ids(self):
         """See parent class."""
-        return self.__controlled_ids
+        return self.__controlled_ids.as_list()
 
     def get_controlled_lc_ids(self):
         """See parent class."""
-        return self.__controlled_lc_ids
+        return self.__controlled_lc_ids.as_list()
 
     def get_rl_ids(self):
         """See parent class."""
-        return self.__rl_ids
+        return self.__rl_ids.as_list()
 
     def set_observed(self, veh_id):
         """See parent class."""
-        if veh_id not in self.__observed_ids:
-            self.__observed_ids.append(veh_id)
+        self.__observed_ids.add(veh_id)
 
     def remove_observed(self, veh_id):
         """See parent class."""
-        if veh_id in self.__observed_ids:
-            self.__observed_ids.remove(veh_id)
+        self.__observed_ids.discard(veh_id)
 
     def get_observed_ids(self):
         """See parent class."""
-        return self.__observed_ids
+        return self.__observed_ids.as_list()
 
     def get_ids_by_edge(self, edges):
         """See parent class."""
@@ -443,24 +1166,132 @@ class TraCIVehicle(KernelVehicle):
             return sum([self.get_ids_by_edge(edge) for edge in edges], [])
         return self._ids_by_edge.get(edges, []) or []
 
+    def get_edge_aggregates(self, edges):
+        """See parent class."""
+        edge = self.__columns["edge"][:self.__num_rows]
+        speed = self.__columns["speed"][:self.__num_rows]
+        present = (edge >= 0) & ~np.isnan(speed)
+        num_edges = len(self.__edge_names)
+        num_veh = np.bincount(edge[present], minlength=num_edges)
+        tot_speed = np.bincount(
+            edge[present], weights=speed[present], minlength=num_edges)
+
+        # edges no vehicle has been on yet are not part of the "edge" column
+        index = np.array([self.__edge_index.get(e, -1) for e in edges],
+                         dtype=np.int64)
+        found = index >= 0
+        return np.where(found, num_veh[index], 0), \
+            np.where(found, tot_speed[index], 0.)
+
+    def get_segment_aggregates(self, segments):
+        """See parent class."""
+        edge = self.__columns["edge"][:self.__num_rows]
+        rows = np.flatnonzero(edge >= 0)
+        seg_edge = self._get_segment_edges(segments)[edge[rows]]
+        rows, seg_edge = rows[seg_edge >= 0], seg_edge[seg_edge >= 0]
+
+        cell = segments.cell(seg_edge, self.__columns["position"][rows],
+                             self.__columns["lane"][rows])
+        speed = self.__columns["speed"][rows]
+        cell[np.isnan(speed)] = -1
+
+        is_rl = np.zeros(self.__num_rows, dtype=bool)
+        rl_rows = self._get_rows(self.__rl_ids.as_list())
+        is_rl[rl_rows[rl_rows >= 0]] = True
+
+        return segments.aggregate(cell, is_rl[rows], speed)
+
+    def _get_segment_edges(self, segments):
+        """Return the edge of the segments of every edge in the "edge" column.
+
+        The mapping is cached for the last segments it was requested for, and
+        extended whenever new edges are added to the "edge" column.
+
+        Returns
+        -------
+        np.ndarray of int
+            index of every edge in segments.edges (-1 if not divided)
+        """
+        cached, edge_map = self.__segment_edges
+        if cached is not segments or len(edge_map) < len(self.__edge_names):
+            edge_map = np.array([segments.edge_index.get(edge, -1)
+                                 for edge in self.__edge_names],
+                                dtype=np.int64)
+            self.__segment_edges = (segments, edge_map)
+        return edge_map
+
     def get_inflow_rate(self, time_span):
         """See parent class."""
-        if len(self._num_departed) == 0:
-            return 0
-        num_inflow = self._num_departed[-int(time_span / self.sim_step):]
-        return 3600 * sum(num_inflow) / (len(num_inflow) * self.sim_step)
+        return self._get_flow_rate(0, time_span)
 
     def get_outflow_rate(self, time_span):
         """See parent class."""
-        if len(self._num_arrived) == 0:
+        return self._get_flow_rate(1, time_span)
+
+    def _record_flows(self, num_departed, num_arrived):
+        """Add the number of departed and arrived vehicles of a time-step."""
+        capacity = len(self._cum_flows)
+        n = self._num_flow_steps
+        self._cum_flows[(n + 1) % capacity] = \
+            self._cum_flows[n % capacity] + [num_departed, num_arrived]
+        self._num_flow_steps += 1
+        self._first_flow_step = max(self._first_flow_step, n + 2 - capacity)
+
+    def _get_flow_rate(self, column, time_span):
+        """Return the inflow or outflow rate over the last time_span seconds.
+
+        The rate is computed from the difference between two cumulative
+        counts, and is thus independent of the length of the time span.
+
+        If the time span exceeds the span covered by the buffer of cumulative
+        counts, the buffer is enlarged so that, once enough time-steps have
+        been recorded, future calls cover the full time span. Until then, the
+        time span is clipped to the available time-steps.
+
+        Parameters
+        ----------
+        column : int
+            0 for the inflow rate, 1 for the outflow rate
+        time_span : float
+            time span (in seconds) over which the rate is computed
+
+        Returns
+        -------
+        float
+            flow rate, in veh/hr
+        """
+        n = self._num_flow_steps
+        if n == 0:
             return 0
-        num_outflow = self._num_arrived[-int(time_span / self.sim_step):]
-        return 3600 * sum(num_outflow) / (len(num_outflow) * self.sim_step)
+
+        # number of time-steps to compute the rate over
+        num_steps = int(time_span / self.sim_step)
+        if num_steps >= len(self._cum_flows):
+            self._resize_flow_buffer(num_steps + 1)
+        if num_steps <= 0 or num_steps > n:
+            num_steps = n
+        num_steps = min(num_steps, n - self._first_flow_step)
+
+        capacity = len(self._cum_flows)
+        num_vehicles = self._cum_flows[n % capacity, column] \
+            - self._cum_flows[(n - num_steps) % capacity, column]
+        return 3600 * num_vehicles / (num_steps * self.sim_step)
+
+    def _resize_flow_buffer(self, capacity):
+        """Enlarge the buffer of cumulative inflows and outflows.
+
+        The cumulative counts that are currently stored are kept.
+        """
+        old_capacity = len(self._cum_flows)
+        cum_flows = np.zeros((capacity, 2), dtype=np.int64)
+        steps = np.arange(self._first_flow_step, self._num_flow_steps + 1)
+        cum_flows[steps % capacity] = self._cum_flows[steps % old_capacity]
+        self._cum_flows = cum_flows
 
     def get_num_arrived(self):
         """See parent class."""
-        if len(self._num_arrived) > 0:
-            return self._num_arrived[-1]
+        if len(self._arrived_ids) > 0:
+            return len(self._arrived_ids[-1])
         else:
             return 0
 
@@ -480,82 +1311,91 @@ class TraCIVehicle(KernelVehicle):
 
     def get_speed(self, veh_id, error=-1001):
         """See parent class."""
-        if isinstance(veh_id, (list, np.ndarray)):
-            return [self.get_speed(vehID, error) for vehID in veh_id]
-        return self.__sumo_obs.get(veh_id, {}).get(tc.VAR_SPEED, error)
+        return self._get_column("speed", veh_id, error)
 
     def get_default_speed(self, veh_id, error=-1001):
         """See parent class."""
-        if isinstance(veh_id, (list, np.ndarray)):
-            return [self.get_default_speed(vehID, error) for vehID in veh_id]
-        return self.__sumo_obs.get(veh_id, {}).get(tc.VAR_SPEED_WITHOUT_TRACI,
-                                                   error)
+        self._check_required('default_speed')
+        return self._get_column("default_speed", veh_id, error)
 
     def get_position(self, veh_id, error=-1001):
         """See parent class."""
-        if isinstance(veh_id, (list, np.ndarray)):
-            return [self.get_position(vehID, error) for vehID in veh_id]
-        return self.__sumo_obs.get(veh_id, {}).get(tc.VAR_LANEPOSITION, error)
+        return self._get_column("position", veh_id, error)
 
     def get_edge(self, veh_id, error=""):
         """See parent class."""
         if isinstance(veh_id, (list, np.ndarray)):
-            return [self.get_edge(vehID, error) for vehID in veh_id]
-        return self.__sumo_obs.get(veh_id, {}).get(tc.VAR_ROAD_ID, error)
+            edges = self._get_column("edge", veh_id, -1)
+            return [error if edge < 0 else self.__edge_names[edge]
+                    for edge in edges]
+        edge = self._get_column("edge", veh_id, -1)
+        return error if edge < 0 else self.__edge_names[edge]
 
     def get_lane(self, veh_id, error=-1001):
         """See parent class."""
-        if isinstance(veh_id, (list, np.ndarray)):
-            return [self.get_lane(vehID, error) for vehID in veh_id]
-        return self.__sumo_obs.get(veh_id, {}).get(tc.VAR_LANE_INDEX, error)
+        return self._get_column("lane", veh_id, error)
 
     def get_route(self, veh_id, error=list()):
         """See parent class."""
+        self._check_required('route')
         if isinstance(veh_id, (list, np.ndarray)):
             return [self.get_route(vehID, error) for vehID in veh_id]
         return self.__sumo_obs.get(veh_id, {}).get(tc.VAR_EDGES, error)
 
     def get_length(self, veh_id, error=-1001):
         """See parent class."""
-        if isinstance(veh_id, (list, np.ndarray)):
-            return [self.get_length(vehID, error) for vehID in veh_id]
-        return self.__vehicles.get(veh_id, {}).get("length", error)
+        return self._get_column("length", veh_id, error)
 
     def get_leader(self, veh_id, error=""):
         """See parent class."""
-        if isinstance(veh_id, (list, np.ndarray)):
-            return [self.get_leader(vehID, error) for vehID in veh_id]
-        return self.__vehicles.get(veh_id, {}).get("leader", error)
+        self._check_required('leader', veh_id)
+        return self._get_neighbor("leader", veh_id, error)
 
     def get_follower(self, veh_id, error=""):
         """See parent class."""
-        if isinstance(veh_id, (list, np.ndarray)):
-            return [self.get_follower(vehID, error) for vehID in veh_id]
-        return self.__vehicles.get(veh_id, {}).get("follower", error)
+        self._check_required('follower')
+        return self._get_neighbor("follower", veh_id, error)
 
     def get_headway(self, veh_id, error=-1001):
         """See parent class."""
-        if isinstance(veh_id, (list, np.ndarray)):
-            return [self.get_headway(vehID, error) for vehID in veh_id]
-        return self.__vehicles.get(veh_id, {}).get("headway", error)
+        self._check_required('leader', veh_id)
+        return self._get_column("headway", veh_id, error)
 
     def get_last_lc(self, veh_id, error=-1001):
         """See parent class."""
         if isinstance(veh_id, (list, np.ndarray)):
-            return [self.get_headway(vehID, error) for vehID in veh_id]
+            return [self.get_last_lc(vehID, error) for vehID in veh_id]
 
         if veh_id not in self.__rl_ids:
             warnings.warn('Vehicle {} is not RL vehicle, "last_lc" term set to'
                           ' {}.'.format(veh_id, error))
             return error
         else:
-            return self.__vehicles.get(veh_id, {}).get("headway", error)
+            return self.__vehicles.get(veh_id, {}).get("last_lc", error)
+
+    def get_edge_transition_ids(self):
+        """See parent class."""
+        return self.__edge_transition_ids
+
+    def get_routing_ids(self):
+        """See parent class."""
+        if len(self.__polled_router_ids) == 0:
+            return [veh_id for veh_id in self.__edge_transition_ids
+                    if veh_id in self.__event_router_ids]
+
+        # preserve the order of the vehicles
+        transitions = set(self.__edge_transition_ids)
+        return [veh_id for veh_id in self.__ids
+                if veh_id in self.__polled_router_ids or
+                (veh_id in transitions and veh_id in self.__event_router_ids)]
 
     def get_acc_controller(self, veh_id, error=None):
         """See parent class."""
         if isinstance(veh_id, (list, np.ndarray)):
             return [self.get_acc_controller(vehID, error) for vehID in veh_id]
-        return self.__vehicles.get(veh_id, {}).get("acc_controller", error)
+        veh = self.__vehicles.get(veh_id, {})
+        controller = veh.get("acc_controller", error)
+        return self.__controllers.bind(controller, veh_id)
 
     def get_lane_changing_controller(self, veh_id, error=None):
         """See parent class."""
@@ -564,7 +1404,9 @@ class TraCIVehicle(KernelVehicle):
                 self.get_lane_changing_controller(vehID, error)
                 for vehID in veh_id
             ]
-        return self.__vehicles.get(veh_id, {}).get("lane_changer", error)
+        veh = self.__vehicles.get(veh_id, {})
+        controller = veh.get("lane_changer", error)
+        return self.__controllers.bind(controller, veh_id)
 
     def get_routing_controller(self, veh_id, error=None):
         """See parent class."""
@@ -572,315 +1414,457 @@ class TraCIVehicle(KernelVehicle):
             return [
                 self.get_routing_controller(vehID, error) for vehID in veh_id
             ]
-        return self.__vehicles.get(veh_id, {}).get("router", error)
+        veh = self.__vehicles.get(veh_id, {})
+        controller = veh.get("router", error)
+        return self.__controllers.bind(controller, veh_id)
 
     def set_lane_headways(self, veh_id, lane_headways):
         """Set the lane headways of the specified vehicle."""
-        self.__vehicles[veh_id]["lane_headways"] = lane_headways
+        row = self._set_num_lanes(veh_id, len(lane_headways))
+        self.__lane_headways[row, :len(lane_headways)] = lane_headways
 
     def get_lane_headways(self, veh_id, error=list()):
         """See parent class."""
-        if isinstance(veh_id, (list, np.ndarray)):
-            return [self.get_lane_headways(vehID, error) for vehID in veh_id]
-        return self.__vehicles.get(veh_id, {}).get("lane_headways", error)
+        return self._get_lane_data(self.__lane_headways, veh_id, error)
 
     def get_lane_leaders_speed(self, veh_id, error=list()):
         """See parent class."""
-        lane_leaders = self.get_lane_leaders(veh_id)
-        return [0 if lane_leader == '' else self.get_speed(lane_leader)
-                for lane_leader in lane_leaders]
+        return self._get_lane_speeds(self.__lane_leaders, veh_id, error)
 
     def get_lane_followers_speed(self, veh_id, error=list()):
         """See parent class."""
-        lane_followers = self.get_lane_followers(veh_id)
-        return [0 if lane_follower == '' else self.get_speed(lane_follower)
-                for lane_follower in lane_followers]
+        return self._get_lane_speeds(self.__lane_followers, veh_id, error)
 
     def set_lane_leaders(self, veh_id, lane_leaders):
         """Set the lane leaders of the specified vehicle."""
-        self.__vehicles[veh_id]["lane_leaders"] = lane_leaders
+        row = self._set_num_lanes(veh_id, len(lane_leaders))
+        self.__lane_leaders[row, :len(lane_leaders)] = \
+            self._get_rows(lane_leaders)
 
     def get_lane_leaders(self, veh_id, error=list()):
         """See parent class."""
-        if isinstance(veh_id, (list, np.ndarray)):
-            return [self.get_lane_leaders(vehID, error) for vehID in veh_id]
-        return self.__vehicles[veh_id]["lane_leaders"]
+        return self._get_lane_data(self.__lane_leaders, veh_id, error)
 
     def set_lane_tailways(self, veh_id, lane_tailways):
         """Set the lane tailways of the specified vehicle."""
-        self.__vehicles[veh_id]["lane_tailways"] = lane_tailways
+        row = self._set_num_lanes(veh_id, len(lane_tailways))
+        self.__lane_tailways[row, :len(lane_tailways)] = lane_tailways
 
     def get_lane_tailways(self, veh_id, error=list()):
         """See parent class."""
-        if isinstance(veh_id, (list, np.ndarray)):
-            return [self.get_lane_tailways(vehID, error) for vehID in veh_id]
-        return self.__vehicles.get(veh_id, {}).get("lane_tailways", error)
+        return self._get_lane_data(self.__lane_tailways, veh_id, error)
 
     def set_lane_followers(self, veh_id, lane_followers):
         """Set the lane followers of the specified vehicle."""
-        self.__vehicles[veh_id]["lane_followers"] = lane_followers
+        row = self._set_num_lanes(veh_id, len(lane_followers))
+        self.__lane_followers[row, :len(lane_followers)] = \
+            self._get_rows(lane_followers)
 
     def get_lane_followers(self, veh_id, error=list()):
         """See parent class."""
-        if isinstance(veh_id, (list, np.ndarray)):
-            return [self.get_lane_followers(vehID, error) for vehID in veh_id]
-        return self.__vehicles.get(veh_id, {}).get("lane_followers", error)
+        return self._get_lane_data(self.__lane_followers, veh_id, error)
 
-    def _multi_lane_headways(self):
-        """Compute multi-lane data for all vehicles.
+    def _set_num_lanes(self, veh_id, num_lanes):
+        """Prepare the multi-lane data of a vehicle to be set manually.
 
-        This includes the lane leaders/followers/headways/tailways/
-        leader velocity/follower velocity for all
-        vehicles in the network.
+        Returns
+        -------
+        int
+            row of the vehicle in the multi-lane data arrays
         """
-        edge_list = self.master_kernel.scenario.get_edge_list()
-        junction_list = self.master_kernel.scenario.get_junction_list()
-        tot_list = edge_list + junction_list
-        num_edges = (len(self.master_kernel.scenario.get_edge_list()) + len(
-            self.master_kernel.scenario.get_junction_list()))
-
-        # maximum number of lanes in the network
-        max_lanes = max([self.master_kernel.scenario.num_lanes(edge_id)
-                         for edge_id in tot_list])
-
-        # Key = edge id
-        # Element = list, with the ith element containing tuples with the name
-        #           and position of all vehicles in lane i
-        edge_dict = dict.fromkeys(tot_list)
-
-        # add the vehicles to the edge_dict element
-        for veh_id in self.get_ids():
-            edge = self.get_edge(veh_id)
-            lane = self.get_lane(veh_id)
-            pos = self.get_position(veh_id)
-            if edge:
-                if edge_dict[edge] is None:
-                    edge_dict[edge] = [[] for _ in range(max_lanes)]
-                edge_dict[edge][lane].append((veh_id, pos))
-
-        # sort all lanes in each edge by position
-        for edge in tot_list:
-            if edge_dict[edge] is None:
-                del edge_dict[edge]
-            else:
-                for lane in range(max_lanes):
-                    edge_dict[edge][lane].sort(key=lambda x: x[1])
-
-        for veh_id in self.get_rl_ids():
-            # collect the lane leaders, followers, headways, and tailways for
-            # each vehicle
-            edge = self.get_edge(veh_id)
-            if edge:
-                headways, tailways, leaders, followers = \
-                    self._multi_lane_headways_util(veh_id, edge_dict,
-                                                   num_edges)
-
-                # add the above values to the vehicles class
-                self.set_lane_headways(veh_id, headways)
-                self.set_lane_tailways(veh_id, tailways)
-                self.set_lane_leaders(veh_id, leaders)
-                self.set_lane_followers(veh_id, followers)
+        row = self.__rows[veh_id]
+        capacity = len(self.__row_ids)
+        max_lanes = max(num_lanes, self.__lane_headways.shape[1])
+        if self.__lane_headways.shape != (capacity, max_lanes):
+            self._reset_lane_data(capacity, max_lanes, keep=True)
+        self.__lane_num[row] = num_lanes
+        return row
 
-        self._ids_by_edge = dict().fromkeys(edge_list)
-
-        for edge_id in edge_dict:
-            edges = list(itertools.chain.from_iterable(edge_dict[edge_id]))
-            # check for edges with no vehicles
-            if len(edges) > 0:
-                edges, _ = zip(*edges)
-                self._ids_by_edge[edge_id] = list(edges)
-            else:
-                self._ids_by_edge[edge_id] = []
+    def _reset_lane_data(self, capacity, max_lanes, keep=False):
+        """Reallocate the arrays containing the multi-lane data.
 
-    def _multi_lane_headways_util(self, veh_id, edge_dict, num_edges):
-        """Compute multi-lane data for the specified vehicle.
+        Parameters
+        ----------
+        capacity : int
+            number of rows in the arrays
+        max_lanes : int
+            maximum number of lanes in the network
+        keep : bool, optional
+            whether to copy the previous multi-lane data to the new arrays
+        """
+        old = (self.__lane_num, self.__lane_headways, self.__lane_tailways,
+               self.__lane_leaders, self.__lane_followers)
+
+        self.__lane_num = np.zeros(capacity, dtype=np.int64)
+        self.__lane_headways = np.full((capacity, max_lanes), 1000.)
+        self.__lane_tailways = np.full((capacity, max_lanes), 1000.)
+        self.__lane_leaders = np.full((capacity, max_lanes), -1, np.int64)
+        self.__lane_followers = np.full((capacity, max_lanes), -1, np.int64)
+
+        if keep:
+            new = (self.__lane_num, self.__lane_headways,
+                   self.__lane_tailways, self.__lane_leaders,
+                   self.__lane_followers)
+            num_rows = len(old[0])
+            for old_data, new_data in zip(old, new):
+                if old_data.ndim == 1:
+                    new_data[:num_rows] = old_data
+                else:
+                    new_data[:num_rows, :old_data.shape[1]] = old_data
+
+    def _get_lane_data(self, data, veh_id, error):
+        """Return the multi-lane data of the specified vehicle(s).
 
         Parameters
         ----------
-        veh_id : str
-            name of the vehicle
-        edge_dict : dict < list<tuple> >
-            Key = Edge name
-                Index = lane index
-                Element = list sorted by position of (vehicle id, position)
+        data : np.ndarray
+            one of the multi-lane data arrays
+        veh_id : str or list of str
+            vehicle id, or list of vehicle ids
+        error : any
+            value that is returned if the vehicle is not found
 
         Returns
         -------
-        headway : list<float>
-            Index = lane index
-            Element = headway at this lane
-        tailway : list<float>
+        list
             Index = lane index
-            Element = tailway at this lane
-        lead_speed : list<str>
-            Index = lane index
-            Element = speed of leader at this lane
-        follow_speed : list<str>
-            Index = lane index
-            Element = speed of follower at this lane
-        leader : list<str>
-            Index = lane index
-            Element = leader at this lane
-        follower : list<str>
-            Index = lane index
-            Element = follower at this lane
-        """
-        this_pos = self.get_position(veh_id)
-        this_edge = self.get_edge(veh_id)
-        this_lane = self.get_lane(veh_id)
-        num_lanes = self.master_kernel.scenario.num_lanes(this_edge)
-
-        # set default values for all output values
-        headway = [1000] * num_lanes
-        tailway = [1000] * num_lanes
-        leader = [""] * num_lanes
-        follower = [""] * num_lanes
-
-        for lane in range(num_lanes):
-            # check the vehicle's current  edge for lane leaders and followers
-            if len(edge_dict[this_edge][lane]) > 0:
-                ids, positions = zip(*edge_dict[this_edge][lane])
-                ids = list(ids)
-                positions = list(positions)
-                index = bisect_left(positions, this_pos)
-
-                # if you are at the end or the front of the edge, the lane
-                # leader is in the edges in front of you
-                if (lane == this_lane and index < len(positions) - 1) \
-                        or (lane != this_lane and index < len(positions)):
-                    # check if the index does not correspond to the current
-                    # vehicle
-                    if ids[index] == veh_id:
-                        leader[lane] = ids[index + 1]
-                        headway[lane] = (positions[index + 1] - this_pos -
-                                         self.get_length(leader[lane]))
-                    else:
-                        leader[lane] = ids[index]
-                        headway[lane] = (positions[index] - this_pos
-                                         - self.get_length(leader[lane]))
-
-                # you are in the back of the queue, the lane follower is in the
-                # edges behind you
-                if index > 0:
-                    follower[lane] = ids[index - 1]
-                    tailway[lane] = (this_pos - positions[index - 1]
-                                     - self.get_length(veh_id))
-
-            # if lane leader not found, check next edges
-            if leader[lane] == "":
-                headway[lane], leader[lane] = self._next_edge_leaders(
-                    veh_id, edge_dict, lane, num_edges)
-
-            # if lane follower not found, check previous edges
-            if follower[lane] == "":
-                tailway[lane], follower[lane] = self._prev_edge_followers(
-                    veh_id, edge_dict, lane, num_edges)
-
-        return headway, tailway, leader, follower
-
-    def _next_edge_leaders(self, veh_id, edge_dict, lane, num_edges):
-        """Search for leaders in the next edge.
-
-        Looks to the edges/junctions in front of the vehicle's current edge
-        for potential leaders. This is currently done by only looking one
-        edge/junction forwards.
+            Element = data at this lane. Leaders and followers are returned by
+            name, with "" denoting the absence of a leader/follower.
+        """
+        if isinstance(veh_id, (list, np.ndarray)):
+            return [self._get_lane_data(data, vehID, error)
+                    for vehID in veh_id]
+
+        row = self.__rows.get(veh_id)
+        if row is None or row >= len(self.__lane_num) \
+                or self.__lane_num[row] == 0:
+            return error
+
+        values = data[row, :self.__lane_num[row]]
+        if data.dtype == np.int64:
+            return ["" if r < 0 else self.__row_ids[r] for r in values]
+        return values.tolist()
+
+    def _get_lane_speeds(self, data, veh_id, error):
+        """Return the speeds of the lane leaders/followers of vehicle(s).
+
+        Parameters
+        ----------
+        data : np.ndarray
+            the lane leaders or lane followers array
+        veh_id : str or list of str
+            vehicle id, or list of vehicle ids
+        error : any
+            value that is returned if the vehicle is not found
 
         Returns
         -------
-        headway : float
-            lane headway for the specified lane
-        leader : str
-            lane leader for the specified lane
+        list of float
+            Index = lane index
+            Element = speed of the leader/follower at this lane, or 0 if there
+            is none
         """
-        pos = self.get_position(veh_id)
-        edge = self.get_edge(veh_id)
+        if isinstance(veh_id, (list, np.ndarray)):
+            return [self._get_lane_speeds(data, vehID, error)
+                    for vehID in veh_id]
 
-        headway = 1000  # env.scenario.length
-        leader = ""
-        add_length = 0  # length increment in headway
+        row = self.__rows.get(veh_id)
+        if row is None or row >= len(self.__lane_num) \
+                or self.__lane_num[row] == 0:
+            return error
 
-        for _ in range(num_edges):
-            # break if there are no edge/lane pairs behind the current one
-            if len(self.master_kernel.scenario.next_edge(edge, lane)) == 0:
-                break
+        rows = data[row, :self.__lane_num[row]]
+        speed = self.__columns["speed"][rows]
+        speed[np.isnan(speed)] = -1001
+        speed[rows < 0] = 0
+        return speed.tolist()
 
-            add_length += self.master_kernel.scenario.edge_length(edge)
-            edge, lane = self.master_kernel.scenario.next_edge(edge, lane)[0]
+    def _multi_lane_headways(self):
+        """Compute multi-lane data for all vehicles.
 
-            try:
-                if len(edge_dict[edge][lane]) > 0:
-                    leader = edge_dict[edge][lane][0][0]
-                    headway = edge_dict[edge][lane][0][1] - pos + add_length \
-                        - self.get_length(leader)
-            except KeyError:
-                # current edge has no vehicles, so move on
-                continue
+        This includes the lane leaders/followers/headways/tailways of every
+        vehicle in the network. The ordering of the vehicles by edge, lane and
+        position is first updated (see _update_lane_order), after which the
+        position of every vehicle in each lane of its edge is found through a
+        single binary search. Leaders/followers
+        that are not located on the vehicle's edge are searched for in the
+        lanes in front/behind it, all at once, through the lane graph of the
+        scenario (see flow.core.kernel.scenario.traci.LaneGraph). At every
+        junction, only the first outgoing/incoming lane is followed.
+
+        This method also updates the list of vehicle ids located in each edge.
+        """
+        scenario = self.master_kernel.scenario
+        edge_list = scenario.get_edge_list()
+        tot_list = edge_list + scenario.get_junction_list()
+        num_edges = len(tot_list)
 
-            # stop if a lane follower is found
-            if leader != "":
-                break
+        # maximum number of lanes in the network
+        max_lanes = max([scenario.num_lanes(edge_id) for edge_id in tot_list])
 
-        return headway, leader
+        # reset the multi-lane data of all vehicles
+        self._reset_lane_data(len(self.__row_ids), max_lanes)
 
-    def _prev_edge_followers(self, veh_id, edge_dict, lane, num_edges):
-        """Search for followers in the previous edge.
+        # sort the vehicles by edge, lane, and position
+        rows, values, span, pos_min = self._update_lane_order(max_lanes)
+        edges = self.__columns["edge"][rows]
+        lanes = self.__columns["lane"][rows]
+        pos = self.__columns["position"][rows]
+        length = self.__columns["length"]
+        num_veh = len(rows)
+        groups = self.__lane_groups
 
-        Looks to the edges/junctions behind the vehicle's current edge for
-        potential followers. This is currently done by only looking one
-        edge/junction backwards.
+        self._ids_by_edge = dict().fromkeys(edge_list)
+        if num_veh == 0:
+            return
+
+        # index of the first vehicle in each edge
+        edge_start = np.flatnonzero(np.diff(edges, prepend=-1))
+
+        # create a (vehicle, lane) pair for every lane of a vehicle's edge
+        edge_lanes = np.array([scenario.num_lanes(self.__edge_names[edge])
+                               for edge in edges[edge_start]], dtype=np.int64)
+        veh_lanes = np.repeat(
+            edge_lanes, np.diff(np.append(edge_start, num_veh)))
+        veh = np.repeat(np.arange(num_veh), veh_lanes)
+        lane = np.arange(len(veh)) - np.repeat(
+            np.cumsum(veh_lanes) - veh_lanes, veh_lanes)
+
+        # index of the first vehicle in each lane ahead of (or at the same
+        # position as) the vehicle
+        lane_keys = edges[veh] * max_lanes + lane
+        index = np.searchsorted(values,
+                                lane_keys * span + (pos[veh] - pos_min))
+        start = np.searchsorted(values, lane_keys * span)
+        end = np.searchsorted(values, (lane_keys + 1) * span)
+
+        # leaders in the vehicle's edge
+        has_leader = np.where(lane == lanes[veh], index < end - 1,
+                              index < end)
+        leader = np.where(index == veh, index + 1, index)
+        leader = np.minimum(leader, num_veh - 1)
+        headway = pos[leader] - pos[veh] - length[rows[leader]]
+
+        # followers in the vehicle's edge
+        has_follower = index > start
+        follower = index - 1
+        tailway = pos[veh] - pos[follower] - length[rows[veh]]
+
+        veh_rows = rows[veh]
+        self.__lane_num[rows] = veh_lanes
+        self.__lane_headways[veh_rows[has_leader], lane[has_leader]] = \
+            headway[has_leader]
+        self.__lane_leaders[veh_rows[has_leader], lane[has_leader]] = \
+            rows[leader[has_leader]]
+        self.__lane_tailways[veh_rows[has_follower], lane[has_follower]] = \
+            tailway[has_follower]
+        self.__lane_followers[veh_rows[has_follower], lane[has_follower]] = \
+            rows[follower[has_follower]]
+
+        # if lane leaders/followers are not found, search for them in the
+        # lanes in front of/behind the vehicle's edge
+        graph = scenario.lane_graph
+        graph_start = self._get_graph_lane_start(graph)
+
+        # index of the first and last vehicle in each lane of the graph
+        keys = np.array(list(groups.keys()), dtype=np.int64)
+        bounds = np.array(list(groups.values()), dtype=np.int64)
+        graph_lanes = graph_start[keys // max_lanes]
+        known = graph_lanes >= 0
+        graph_lanes = graph_lanes[known] + keys[known] % max_lanes
+        first = np.full(graph.num_lanes, -1, dtype=np.int64)
+        last = np.full(graph.num_lanes, -1, dtype=np.int64)
+        first[graph_lanes] = bounds[known, 0]
+        last[graph_lanes] = bounds[known, 1] - 1
+        occupied = first >= 0
+
+        # lane of the graph corresponding to every (vehicle, lane) pair
+        veh_graph_lanes = np.where(graph_start[edges[veh]] >= 0,
+                                   graph_start[edges[veh]] + lane, -1)
+
+        i = np.flatnonzero(~has_leader)
+        found, dist = graph.search(
+            veh_graph_lanes[i], occupied, forward=True, max_hops=num_edges)
+        i, leader = i[found >= 0], first[found[found >= 0]]
+        v = veh[i]
+        self.__lane_headways[rows[v], lane[i]] = \
+            pos[leader] - pos[v] + dist[found >= 0] - length[rows[leader]]
+        self.__lane_leaders[rows[v], lane[i]] = rows[leader]
+
+        i = np.flatnonzero(~has_follower)
+        found, dist = graph.search(
+            veh_graph_lanes[i], occupied, forward=False, max_hops=num_edges)
+        i, follower = i[found >= 0], last[found[found >= 0]]
+        v = veh[i]
+        self.__lane_tailways[rows[v], lane[i]] = \
+            pos[v] - length[rows[v]] - pos[follower] + dist[found >= 0]
+        self.__lane_followers[rows[v], lane[i]] = rows[follower]
+
+        # update the list of vehicles located in each edge
+        for edge, ids in zip(edges[edge_start],
+                             np.split(rows, edge_start[1:])):
+            self._ids_by_edge[self.__edge_names[edge]] = \
+                [self.__row_ids[row] for row in ids]
+
+    def _update_lane_order(self, max_lanes):
+        """Update the ordering of the vehicles by edge, lane, and position.
+
+        The ordering is maintained across simulation steps. Vehicles that left
+        the network since the last update are removed from it, and vehicles
+        that entered the network are appended to it. Since the order of the
+        vehicles barely changes from one step to the next, the ordering is
+        then repaired with an adaptive (timsort) sort, which runs in linear
+        time on nearly sorted arrays, and is skipped entirely if the vehicles
+        are still in order.
+
+        Parameters
+        ----------
+        max_lanes : int
+            maximum number of lanes in the network
 
         Returns
         -------
-        tailway : float
-            lane tailway for the specified lane
-        follower : str
-            lane follower for the specified lane
+        np.ndarray
+            rows of the vehicles located on an edge, sorted by edge, lane, and
+            position
+        np.ndarray
+            sorting values of these vehicles, combining the (edge, lane) key
+            of a vehicle and its position, in the same order
+        float
+            span of the positions of the vehicles, used to compute the
+            sorting values
+        float
+            minimum position of the vehicles, used to compute the sorting
+            values
         """
-        pos = self.get_position(veh_id)
-        edge = self.get_edge(veh_id)
-
-        tailway = 1000  # env.scenario.length
-        follower = ""
-        add_length = 0  # length increment in headway
-
-        for _ in range(num_edges):
-            # break if there are no edge/lane pairs behind the current one
-            if len(self.master_kernel.scenario.prev_edge(edge, lane)) == 0:
-                break
-
-            edge, lane = self.master_kernel.scenario.prev_edge(edge, lane)[0]
-            add_length += self.master_kernel.scenario.edge_length(edge)
+        # apply the vehicles that entered/left the network as deltas
+        order = self.__lane_order
+        if len(self.__removed_rows) > 0:
+            order = order[~np.isin(order, self.__removed_rows)]
+        if len(self.__added_rows) > 0:
+            order = np.append(order, self.__added_rows).astype(np.int64)
+        self.__removed_rows = []
+        self.__added_rows = []
+
+        edges = self.__columns["edge"][order]
+        lanes = self.__columns["lane"][order]
+        pos = self.__columns["position"][order]
+
+        # vehicles that are not located on an edge (e.g. teleporting vehicles)
+        # are placed at the front of the ordering
+        on_edge = edges > 0
+        if np.any(on_edge):
+            pos_min = pos[on_edge].min()
+            span = pos[on_edge].max() - pos_min + 1
+        else:
+            pos_min, span = 0, 1
+        values = np.where(on_edge, (edges * max_lanes + lanes) * span
+                          + (pos - pos_min), -1.)
+
+        # repair the ordering if any vehicle is out of order
+        if np.any(values[1:] < values[:-1]):
+            perm = np.argsort(values, kind="stable")
+            order, values = order[perm], values[perm]
+        self.__lane_order = order
+
+        # keep only the vehicles located on an edge
+        num_off_edge = len(order) - np.count_nonzero(on_edge)
+        rows, values = order[num_off_edge:], values[num_off_edge:]
+
+        # first and last index (exclusive) of the vehicles in each lane
+        keys = self.__columns["edge"][rows] * max_lanes \
+            + self.__columns["lane"][rows]
+        group_start = np.flatnonzero(np.diff(keys, prepend=-1))
+        group_end = np.append(group_start[1:], len(keys))
+        self.__lane_groups = dict(zip(
+            keys[group_start].tolist(),
+            zip(group_start.tolist(), group_end.tolist())))
+        self.__lane_rows = rows
+        self.__max_lanes = max_lanes
+
+        return rows, values, span, pos_min
+
+    def get_ids_by_lane(self, edge, lane):
+        """See parent class."""
+        return [self.__row_ids[row] for row in self._get_lane_rows(edge, lane)]
 
-            try:
-                if len(edge_dict[edge][lane]) > 0:
-                    tailway = pos - edge_dict[edge][lane][-1][1] + add_length \
-                              - self.get_length(veh_id)
-                    follower = edge_dict[edge][lane][-1][0]
-            except KeyError:
-                # current edge has no vehicles, so move on
-                continue
+    def get_lane_occupancy(self, edge, lane):
+        """See parent class."""
+        rows = self._get_lane_rows(edge, lane)
+        ids = np.empty(len(rows), dtype=object)
+        ids[:] = [self.__row_ids[row] for row in rows]
+        pos = self.__columns["position"][rows]
+        ids.flags.writeable = False
+        pos.flags.writeable = False
+        return ids, pos
+
+    def _get_lane_rows(self, edge, lane):
+        """Return the rows of the vehicles in a lane, sorted by position."""
+        if edge not in self.__edge_index or not 0 <= lane < self.__max_lanes:
+            return self.__lane_rows[:0]
+        key = self.__edge_index[edge] * self.__max_lanes + lane
+        if key not in self.__lane_groups:
+            return self.__lane_rows[:0]
+        start, end = self.__lane_groups[key]
+        return self.__lane_rows[start:end]
+
+    def _get_graph_lane_start(self, graph):
+        """Return the first lane in the lane graph of every known edge.
 
-            # stop if a lane follower is found
-            if follower != "":
-                break
+        Parameters
+        ----------
+        graph : flow.core.kernel.scenario.traci.LaneGraph
+            compiled lane connectivity of the network
 
-        return tailway, follower
+        Returns
+        -------
+        np.ndarray
+            index of the first lane of every edge in the graph, indexed by the
+            values in the "edge" column (-1 if the edge is not in the graph)
+        """
+        cached_graph, graph_start = self.__graph_lane_start
+        if cached_graph is not graph:
+            graph_start = np.zeros(0, dtype=np.int64)
+
+        # the names of the edges vehicles have been on only grow
+        num_known = len(graph_start)
+        if num_known < len(self.__edge_names):
+            new = [graph.edge_index.get(edge, -1)
+                   for edge in self.__edge_names[num_known:]]
+            new = np.array(new, dtype=np.int64)
+            new = np.where(new >= 0, graph.lane_start[new], -1)
+            graph_start = np.append(graph_start, new)
+            self.__graph_lane_start = (graph, graph_start)
+
+        return graph_start
 
     def apply_acceleration(self, veh_ids, acc):
-        """See parent class."""
+        """See parent class.
+
+        The accelerations may be provided as a numpy array, in which case NaN
+        values (like None values) denote vehicles that should not be actuated.
+        The resulting commands are buffered and sent to sumo right before the
+        next simulation step (see flush_commands).
+        """
         # to hand the case of a single vehicle
         if type(veh_ids) == str:
             veh_ids = [veh_ids]
             acc = [acc]
 
-        for i, vid in enumerate(veh_ids):
-            if acc[i] is not None and vid in self.get_ids():
-                this_vel = self.get_speed(vid)
-                next_vel = max([this_vel + acc[i] * self.sim_step, 0])
-                self.kernel_api.vehicle.slowDown(vid, next_vel, 1e-3)
+        acc = np.array(acc, dtype=float).flatten()
+        next_vel = np.maximum(self.get_speed(veh_ids) + acc * self.sim_step, 0)
+        valid = ~np.isnan(acc) & (self._get_rows(veh_ids) >= 0)
+
+        for veh_id, vel in zip(itertools.compress(veh_ids, valid),
+                               next_vel[valid]):
+            self._add_command("slowDown", veh_id, vel, 1e-3)
 
     def apply_lane_change(self, veh_ids, direction):
-        """See parent class."""
+        """See parent class.
+
+        The resulting commands are buffered and sent to sumo right before the
+        next simulation step (see flush_commands).
+        """
         # to hand the case of a single vehicle
         if type(veh_ids) == str:
             veh_ids = [veh_ids]
@@ -906,15 +1890,20 @@ class TraCIVehicle(KernelVehicle):
 
             # perform the requested lane action action in TraCI
             if target_lane != this_lane:
-                self.kernel_api.vehicle.changeLane(
-                    veh_id, int(target_lane), 100000)
+                self._add_command(
+                    "changeLane", veh_id, int(target_lane), 100000)
 
                 if veh_id in self.get_rl_ids():
                     self.prev_last_lc[veh_id] = \
                         self.__vehicles[veh_id]["last_lc"]
 
     def choose_routes(self, veh_ids, route_choices):
-        """See parent class."""
+        """See parent class.
+
+        The resulting commands are buffered and sent to sumo right before the
+        next simulation step (see flush_commands). Routes that match the
+        current route of a vehicle are not sent.
+        """
         # to hand the case of a single vehicle
         if type(veh_ids) == str:
             veh_ids = [veh_ids]
@@ -922,17 +1911,115 @@ class TraCIVehicle(KernelVehicle):
 
         for i, veh_id in enumerate(veh_ids):
             if route_choices[i] is not None:
-                self.kernel_api.vehicle.setRoute(
-                    vehID=veh_id, edgeList=route_choices[i])
+                route = self.__sumo_obs.get(veh_id, {}).get(tc.VAR_EDGES)
+                if route is not None and \
+                        tuple(route_choices[i]) == tuple(route):
+                    self.__num_commands_coalesced += 1
+                    continue
+                self._add_command("setRoute", veh_id, route_choices[i])
+
+    def _add_command(self, command, veh_id, *args):
+        """Add an actuation command to the command buffer.
+
+        If a command of the same type was already requested for the vehicle
+        during the current step, it is replaced by the new one.
+
+        Parameters
+        ----------
+        command : str
+            name of the method of the TraCI vehicle domain, e.g. "slowDown"
+        veh_id : str
+            name of the vehicle
+        args : tuple
+            remaining arguments of the command
+        """
+        if (command, veh_id) in self.__commands:
+            self.__num_commands_coalesced += 1
+        self.__commands[(command, veh_id)] = args
+
+    def flush_commands(self):
+        """Send all buffered actuation commands to sumo.
+
+        This is called by the simulation kernel right before advancing the
+        simulation.
+        """
+        for (command, veh_id), args in self.__commands.items():
+            getattr(self.kernel_api.vehicle, command)(veh_id, *args)
+        self.__num_commands_sent += len(self.__commands)
+        self.__commands.clear()
+
+    def get_command_stats(self):
+        """Return statistics on the actuation commands sent to sumo.
+
+        Returns
+        -------
+        dict
+            * "sent": number of commands that were sent to sumo
+            * "coalesced": number of commands that were not sent because they
+              were replaced by a later command for the same vehicle within the
+              same step, or because they would not have had any effect
+        """
+        return {"sent": self.__num_commands_sent,
+                "coalesced": self.__num_commands_coalesced}
 
     def get_x_by_id(self, veh_id):
-        """See parent class."""
+        """See parent class.
+
+        The absolute positions of all vehicles are computed once per step,
+        and stored in the "x" column of the state store. A list of vehicles
+        may also be provided, in which case an array of absolute positions is
+        returned.
+        """
+        if isinstance(veh_id, (list, np.ndarray)):
+            x = self._get_column("x", veh_id, np.nan)
+            for i in np.flatnonzero(np.isnan(x)):
+                x[i] = self._compute_x(veh_id[i])
+            return x
+
+        x = self._get_column("x", veh_id, None)
+        return self._compute_x(veh_id) if x is None else x
+
+    def _compute_x(self, veh_id):
+        """Compute the absolute position of a vehicle from its edge."""
         if self.get_edge(veh_id) == '':
             # occurs when a vehicle crashes is teleported for some other reason
             return 0.
         return self.master_kernel.scenario.get_x(
             self.get_edge(veh_id), self.get_position(veh_id))
 
+    def _update_x(self, rows):
+        """Update the absolute positions of vehicles in the state store.
+
+        Vehicles that are not on an edge are given an absolute position of 0.
+        The absolute position of vehicles whose edge has no starting position
+        is left missing, and computed by get_x_by_id when requested.
+
+        Parameters
+        ----------
+        rows : np.ndarray
+            rows of the vehicles
+        """
+        scenario = self.master_kernel.scenario
+        cached, starts, on_edge = self.__edge_starts
+        if cached is not scenario.total_edgestarts_dict:
+            starts, on_edge = np.zeros(0), np.zeros(0, dtype=bool)
+
+        # the names of the edges vehicles have been on only grow
+        num_known = len(starts)
+        if num_known < len(self.__edge_names):
+            new_starts, new_on_edge = scenario.get_edge_starts(
+                self.__edge_names[num_known:])
+            starts = np.append(starts, new_starts)
+            on_edge = np.append(on_edge, new_on_edge)
+            self.__edge_starts = \
+                (scenario.total_edgestarts_dict, starts, on_edge)
+
+        edges = self.__columns["edge"][rows]
+        x = np.where(on_edge[edges],
+                     starts[edges] + self.__columns["position"][rows],
+                     starts[edges])
+        self.__columns["x"][rows] = np.where(edges > 0, x, 0.)
+
     def update_vehicle_colors(self):
         """See parent class.
 
@@ -951,14 +2038,13 @@ class TraCIVehicle(KernelVehicle):
         # color vehicles white if not observed and cyan if observed
         for veh_id in self.get_human_ids():
             try:
-                color = CYAN if veh_id in self.get_observed_ids() else WHITE
+                color = CYAN if veh_id in self.__observed_ids else WHITE
                 self.set_color(veh_id=veh_id, color=color)
             except (FatalTraCIError, TraCIException):
                 pass
 
         # clear the list of observed vehicles
-        for veh_id in self.get_observed_ids():
-            self.remove_observed(veh_id)
+        self.__observed_ids.clear()
 
     def get_color(self, veh_id):
         """See parent class.
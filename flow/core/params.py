@@ -549,6 +549,20 @@ class SumoParams(SimParams):
         they teleport after teleport_time seconds
     num_clients : int, optional
         Number of clients that will connect to Traci
+    context_subscription : bool, optional
+        specifies whether to retrieve the state of all vehicles through a
+        single context subscription to the simulation, rather than through
+        one subscription per vehicle. This reduces the number of calls to
+        sumo when many vehicles enter the network. Defaults to False
+    num_snapshots : int, optional
+        number of snapshots of the simulation kept per network. A snapshot
+        stores the state of the simulation at the end of the warmup steps of
+        a rollout. Once the number of snapshots for a network is reached,
+        resets restore one of these snapshots, chosen at random, instead of
+        re-introducing the initial vehicles and performing the warmup steps
+        again. Each snapshot is taken during a separate rollout, such that
+        different snapshots may differ due to random initial positions or
+        noise. Defaults to 0 (snapshots are not used)
     """
 
     def __init__(self,
@@ -567,7 +581,9 @@ class SumoParams(SimParams):
                  restart_instance=False,
                  print_warnings=True,
                  teleport_time=-1,
-                 num_clients=1):
+                 num_clients=1,
+                 context_subscription=False,
+                 num_snapshots=0):
         """Instantiate SumoParams."""
         super(SumoParams, self).__init__(
             sim_step, render, restart_instance, emission_path, save_render,
@@ -580,6 +596,8 @@ class SumoParams(SimParams):
         self.print_warnings = print_warnings
         self.teleport_time = teleport_time
         self.num_clients = num_clients
+        self.context_subscription = context_subscription
+        self.num_snapshots = num_snapshots
 
 
 class EnvParams:
@@ -727,6 +745,10 @@ class InitialConfig:
         * dict of edges: where the key is the name of the edge to be
           utilized, and the elements are the number of cars to place on
           each edge
+    seed : int, optional
+        seed of the random number generator used to draw random starting
+        positions and perturbations. If no seed is specified, the global
+        numpy random number generator is used.
     additional_params : dict, optional
         some other network-specific params
     """
@@ -740,6 +762,7 @@ class InitialConfig:
                  bunching=0,
                  lanes_distribution=float("inf"),
                  edges_distribution="all",
+                 seed=None,
                  additional_params=None):
         """Instantiate InitialConfig.
 
@@ -755,6 +778,7 @@ class InitialConfig:
         self.bunching = bunching
         self.lanes_distribution = lanes_distribution
         self.edges_distribution = edges_distribution
+        self.seed = seed
         self.additional_params = additional_params or dict()
 
 
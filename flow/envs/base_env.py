@@ -4,6 +4,7 @@ from copy import deepcopy
 import os
 import atexit
 import time
+import tempfile
 import traceback
 import numpy as np
 import random
@@ -64,7 +65,7 @@ class Env(*classdef):
     scenario : flow.scenarios.Scenario
         see flow/scenarios/base_scenario.py
     simulator : str
-        the simulator used, one of {'traci', 'aimsun'}
+        the simulator used, one of {'traci', 'libsumo', 'aimsun'}
     k : flow.core.kernel.Kernel
         Flow kernel object, using for state acquisition and issuing commands to
         the certain components of the simulator. For more information, see:
@@ -95,8 +96,29 @@ class Env(*classdef):
         renderer class, used to collect image-based representations of the
         traffic network. This attribute is set to None if `sim_params.render`
         is set to True or False.
+    required_vehicle_variables : list of str or None
+        optional vehicle variables read by the environment (e.g. in
+        `get_state` and `compute_reward`). The speed, position, lane, and edge
+        of vehicles are always available. The other variables are "route",
+        "orientation", "default_speed", "leader" (the leader and headway of
+        vehicles), and "follower". Only these variables, and the ones read by
+        the controllers of the vehicles, are retrieved from the simulator,
+        and reading any other variable raises an error. If set to None, all
+        variables are retrieved.
+    required_traffic_light_variables : list of str or None
+        traffic light variables read by the environment, a subset of
+        {"state"}. If set to None, all variables are retrieved.
+    snapshot_attributes : tuple of str
+        names of the attributes of the environment that change during a
+        rollout, and that are stored in snapshots of the simulation (see
+        `SumoParams.num_snapshots`) along with the state of the simulator and
+        the kernel
     """
 
+    required_vehicle_variables = None
+    required_traffic_light_variables = None
+    snapshot_attributes = ('time_counter', 'state')
+
     def __init__(self, env_params, sim_params, scenario, simulator='traci'):
         """Initialize the environment class.
 
@@ -109,7 +131,8 @@ class Env(*classdef):
         scenario : flow.scenarios.Scenario
             see flow/scenarios/base_scenario.py
         simulator : str
-            the simulator used, one of {'traci', 'aimsun'}. Defaults to 'traci'
+            the simulator used, one of {'traci', 'libsumo', 'aimsun'}. Defaults
+            to 'traci'
 
         Raises
         ------
@@ -137,6 +160,15 @@ class Env(*classdef):
         self.step_counter = 0
         # initial_state:
         self.initial_state = {}
+        # snapshots of the simulation at the end of the warmup steps, for
+        # every network (see _get_snapshot_key)
+        self._snapshots = {}
+        # seed of the simulation instance used in the next rollout, when the
+        # instance is restarted upon reset. These seeds are drawn from a
+        # separate generator, so that preparing the next instance in advance
+        # does not alter the sequence of the global one
+        self._next_seed = None
+        self._seed_rng = random.Random(sim_params.seed)
         self.state = None
         self.obs_var_labels = []
 
@@ -157,6 +189,16 @@ class Env(*classdef):
         # initial the vehicles kernel using the VehicleParams object
         self.k.vehicle.initialize(deepcopy(scenario.vehicles))
 
+        # specify the variables that need to be retrieved from the simulator.
+        # The pyglet renderer also reads the orientation of vehicles
+        vehicle_variables = self.required_vehicle_variables
+        if vehicle_variables is not None and \
+                sim_params.render in ['gray', 'dgray', 'rgb', 'drgb']:
+            vehicle_variables = list(vehicle_variables) + ['orientation']
+        self.k.vehicle.set_required_variables(vehicle_variables)
+        self.k.traffic_light.set_required_variables(
+            self.required_traffic_light_variables)
+
         # initialize the simulation using the simulation kernel. This will use
         # the scenario kernel as an input in order to determine what network
         # needs to be simulated.
@@ -183,6 +225,7 @@ class Env(*classdef):
         self.k.vehicle.master_kernel = self.k
 
         self.setup_initial_state()
+        self._prepare_restart()
 
         # use pyglet to render the simulation
         if self.sim_params.render in ['gray', 'dgray', 'rgb', 'drgb']:
@@ -253,6 +296,26 @@ class Env(*classdef):
         self.k.pass_api(kernel_api)
 
         self.setup_initial_state()
+        self._prepare_restart()
+
+    def _prepare_restart(self):
+        """Prepare the simulation instance of the next rollout.
+
+        If the simulation is restarted upon every reset, the instance used by
+        the next rollout is started in the background while the current one is
+        running. The seed of the next instance is chosen here as a result.
+        """
+        self.k.simulation.discard_prepared()
+        if not self.sim_params.restart_instance:
+            self._next_seed = None
+            return
+
+        # issue a random seed to induce randomness into the next rollout
+        self._next_seed = self._seed_rng.randint(0, 1e5)
+
+        sim_params = deepcopy(self.sim_params)
+        sim_params.seed = self._next_seed
+        self.k.simulation.prepare_simulation(self.k.scenario, sim_params)
 
     def setup_initial_state(self):
         """Store information on the initial state of vehicles in the network.
@@ -315,14 +378,11 @@ class Env(*classdef):
             self.step_counter += 1
 
             # perform acceleration actions for controlled human-driven vehicles
-            if len(self.k.vehicle.get_controlled_ids()) > 0:
-                accel = []
-                for veh_id in self.k.vehicle.get_controlled_ids():
-                    action = self.k.vehicle.get_acc_controller(
-                        veh_id).get_action(self)
-                    accel.append(action)
-                self.k.vehicle.apply_acceleration(
-                    self.k.vehicle.get_controlled_ids(), accel)
+            controlled_ids = self.k.vehicle.get_controlled_ids()
+            if len(controlled_ids) > 0:
+                # actions of None are stored as NaN, and are not applied
+                accel = self.get_controller_actions(controlled_ids)
+                self.k.vehicle.apply_acceleration(controlled_ids, accel)
 
             # perform lane change actions for controlled human-driven vehicles
             if len(self.k.vehicle.get_controlled_lc_ids()) > 0:
@@ -336,17 +396,12 @@ class Env(*classdef):
                     direction=direction)
 
             # perform (optionally) routing actions for all vehicles in the
-            # network, including RL and SUMO-controlled vehicles
-            routing_ids = []
-            routing_actions = []
-            for veh_id in self.k.vehicle.get_ids():
-                if self.k.vehicle.get_routing_controller(veh_id) \
-                        is not None:
-                    routing_ids.append(veh_id)
-                    route_contr = self.k.vehicle.get_routing_controller(
-                        veh_id)
-                    routing_actions.append(route_contr.choose_route(self))
-
+            # network, including RL and SUMO-controlled vehicles. Event-driven
+            # routers are only called when their vehicle enters a new edge
+            routing_ids = self.k.vehicle.get_routing_ids()
+            routing_actions = [
+                self.k.vehicle.get_routing_controller(veh_id).choose_route(
+                    self) for veh_id in routing_ids]
             self.k.vehicle.choose_routes(routing_ids, routing_actions)
 
             self.apply_rl_actions(rl_actions)
@@ -409,6 +464,10 @@ class Env(*classdef):
         If "shuffle" is set to True in InitialConfig, the initial positions of
         vehicles is recalculated and the vehicles are shuffled.
 
+        If snapshots are used (see SumoParams.num_snapshots), the state of the
+        network at the end of the warmup steps of an earlier rollout may be
+        restored instead.
+
         Returns
         -------
         observation : array_like
@@ -437,7 +496,11 @@ class Env(*classdef):
                 (self.step_counter > 2e6 and self.simulator != 'aimsun'):
             self.step_counter = 0
             # issue a random seed to induce randomness into the next rollout
-            self.sim_params.seed = random.randint(0, 1e5)
+            # (chosen in advance if the instance was prepared)
+            if self._next_seed is not None:
+                self.sim_params.seed = self._next_seed
+            else:
+                self.sim_params.seed = random.randint(0, 1e5)
 
             self.k.vehicle = deepcopy(self.initial_vehicles)
             self.k.vehicle.master_kernel = self.k
@@ -448,25 +511,27 @@ class Env(*classdef):
         elif self.initial_config.shuffle:
             self.setup_initial_state()
 
-        # clear all vehicles from the network and the vehicles class
-        if self.simulator == 'traci':
-            for veh_id in self.k.kernel_api.vehicle.getIDList():  # FIXME: hack
-                try:
-                    self.k.vehicle.remove(veh_id)
-                except (FatalTraCIError, TraCIException):
-                    pass
+        # restore a snapshot of the simulation at the end of the warmup steps
+        # of an earlier rollout, if available
+        snapshot = self._choose_snapshot()
+        if snapshot is not None:
+            observation = self._restore_snapshot(snapshot)
+            self.render(reset=True)
+            return observation
 
         # clear all vehicles from the network and the vehicles class
-        # FIXME (ev, ak) this is weird and shouldn't be necessary
-        for veh_id in list(self.k.vehicle.get_ids()):
-            # do not try to remove the vehicles from the network in the first
-            # step after initializing the network, as there will be no vehicles
-            if self.step_counter == 0:
-                continue
-            try:
-                self.k.vehicle.remove(veh_id)
-            except (FatalTraCIError, TraCIException):
-                print("Error during start: {}".format(traceback.format_exc()))
+        try:
+            if self.step_counter != 0:
+                self.k.vehicle.clear()
+            elif self.simulator in ['traci', 'libsumo']:
+                # do not try to remove the vehicles of the vehicles class in
+                # the first step after initializing the network, as there
+                # will be no vehicles
+                # FIXME (ev, ak) this is weird and shouldn't be necessary
+                self.k.vehicle.remove_many(
+                    self.k.kernel_api.vehicle.getIDList())  # FIXME: hack
+        except (FatalTraCIError, TraCIException):
+            print("Error during start: {}".format(traceback.format_exc()))
 
         # reintroduce the initial vehicles to the network
         for veh_id in self.initial_ids:
@@ -485,7 +550,7 @@ class Env(*classdef):
                 # if a vehicle was not removed in the first attempt, remove it
                 # now and then reintroduce it
                 self.k.vehicle.remove(veh_id)
-                if self.simulator == 'traci':
+                if self.simulator in ['traci', 'libsumo']:
                     self.k.kernel_api.vehicle.remove(veh_id)  # FIXME: hack
                 self.k.vehicle.add(
                     veh_id=veh_id,
@@ -505,7 +570,7 @@ class Env(*classdef):
         if self.sim_params.render:
             self.k.vehicle.update_vehicle_colors()
 
-        if self.simulator == 'traci':
+        if self.simulator in ['traci', 'libsumo']:
             initial_ids = self.k.kernel_api.vehicle.getIDList()
         else:
             initial_ids = self.initial_ids
@@ -532,15 +597,159 @@ class Env(*classdef):
         for _ in range(self.env_params.warmup_steps):
             observation, _, _, _ = self.step(rl_actions=None)
 
+        # store a snapshot of the simulation, if requested
+        self._save_snapshot(observation)
+
         # render a frame
         self.render(reset=True)
 
         return observation
 
+    def _get_snapshot_key(self):
+        """Return a key identifying the network snapshots are taken in."""
+        return (self.scenario.orig_name,
+                repr(self.scenario.net_params.additional_params))
+
+    def _choose_snapshot(self):
+        """Choose a snapshot of the simulation to restore upon reset.
+
+        Returns
+        -------
+        dict or None
+            a snapshot created by `_save_snapshot`, chosen at random from the
+            snapshots of the current network. None if snapshots are not used,
+            or if more snapshots need to be taken.
+        """
+        num_snapshots = getattr(self.sim_params, 'num_snapshots', 0)
+        if self.simulator not in ['traci', 'libsumo'] or num_snapshots == 0:
+            return None
+
+        snapshots = self._snapshots.get(self._get_snapshot_key(), [])
+        if len(snapshots) < num_snapshots:
+            return None
+
+        return random.choice(snapshots)
+
+    def _save_snapshot(self, observation):
+        """Store a snapshot of the current state of the simulation.
+
+        The snapshot contains the state of the simulator (saved to a temporary
+        file), a copy of the vehicle and traffic light kernels, the attributes
+        of the environment specified in `snapshot_attributes`, and the
+        observation returned by the reset. Nothing is stored if snapshots are
+        not used, or if enough snapshots were already taken.
+
+        Parameters
+        ----------
+        observation : array_like
+            the observation returned by the reset
+        """
+        num_snapshots = getattr(self.sim_params, 'num_snapshots', 0)
+        if self.simulator not in ['traci', 'libsumo'] or num_snapshots == 0:
+            return
+
+        snapshots = self._snapshots.setdefault(self._get_snapshot_key(), [])
+        if len(snapshots) >= num_snapshots:
+            return
+
+        fd, filename = tempfile.mkstemp(prefix='flow-snapshot-', suffix='.xml')
+        os.close(fd)
+        self.k.simulation.save_state(filename)
+
+        snapshots.append({
+            'filename': filename,
+            'vehicle': self._copy_kernel(self.k.vehicle),
+            'traffic_light': self._copy_kernel(self.k.traffic_light),
+            'attributes': {name: deepcopy(getattr(self, name))
+                           for name in self.snapshot_attributes},
+            'observation': deepcopy(observation),
+        })
+
+    def _restore_snapshot(self, snapshot):
+        """Restore a snapshot of the simulation created by `_save_snapshot`.
+
+        Parameters
+        ----------
+        snapshot : dict
+            the snapshot to restore
+
+        Returns
+        -------
+        array_like
+            the observation returned by the reset the snapshot was taken in
+        """
+        self.k.simulation.load_state(snapshot['filename'])
+
+        self.k.vehicle = deepcopy(snapshot['vehicle'])
+        self.k.vehicle.master_kernel = self.k
+        self.k.traffic_light = deepcopy(snapshot['traffic_light'])
+        self.k.traffic_light.master_kernel = self.k
+
+        # sumo drops all subscriptions when loading a state, so subscribe to
+        # the simulation, vehicles, and traffic lights again
+        self.k.pass_api(self.k.kernel_api)
+
+        for name, value in snapshot['attributes'].items():
+            setattr(self, name, deepcopy(value))
+
+        # update the colors of vehicles
+        if self.sim_params.render:
+            self.k.vehicle.update_vehicle_colors()
+
+        return deepcopy(snapshot['observation'])
+
+    @staticmethod
+    def _copy_kernel(kernel):
+        """Return a copy of a kernel subclass without the simulator api."""
+        kernel_api, master_kernel = kernel.kernel_api, kernel.master_kernel
+        kernel.kernel_api = None
+        kernel.master_kernel = None
+        kernel_copy = deepcopy(kernel)
+        kernel.kernel_api = kernel_api
+        kernel.master_kernel = master_kernel
+        return kernel_copy
+
     def additional_command(self):
         """Additional commands that may be performed by the step method."""
         pass
 
+    def get_controller_actions(self, veh_ids):
+        """Return the actions of the acceleration controllers of vehicles.
+
+        The actions of vehicles sharing a controller (see the `stateless`
+        attribute of the controllers) are computed at once through the
+        get_actions method of the controller. Other controllers compute the
+        action of their vehicle individually through get_action.
+
+        Parameters
+        ----------
+        veh_ids : list of str
+            names of the vehicles
+
+        Returns
+        -------
+        np.ndarray
+            the action of every vehicle. Actions of None are stored as NaN.
+        """
+        accel = np.full(len(veh_ids), np.nan)
+
+        # indices of the vehicles using each shared controller
+        shared = {}
+        for i, veh_id in enumerate(veh_ids):
+            controller = self.k.vehicle.get_acc_controller(veh_id)
+            if getattr(controller, 'stateless', False):
+                shared.setdefault(controller, []).append(i)
+            else:
+                action = controller.get_action(self)
+                if action is not None:
+                    accel[i] = action
+
+        for controller, indices in shared.items():
+            accel[indices] = controller.get_actions(
+                self, [veh_ids[i] for i in indices])
+
+        return accel
+
     def clip_actions(self, rl_actions=None):
         """Clip the actions passed from the RL agent.
 
@@ -653,7 +862,18 @@ class Env(*classdef):
         Should be done at end of every experiment. Must be in Env because the
         environment opens the TraCI connection.
         """
+        # remove the files containing the states of the simulation snapshots
+        for snapshots in self._snapshots.values():
+            for snapshot in snapshots:
+                try:
+                    os.remove(snapshot['filename'])
+                except FileNotFoundError:
+                    pass
+        self._snapshots.clear()
+
         try:
+            # terminate the simulation instance prepared for the next rollout
+            self.k.simulation.discard_prepared()
             # close everything within the kernel
             self.k.close()
             # close pyglet renderer
@@ -1,5 +1,4 @@
 import numpy as np
-from collections import defaultdict
 
 from flow.envs import Env
 
@@ -62,7 +61,6 @@ class BayBridgeEnv(Env):
 
     def __init__(self, env_params, sim_params, scenario, simulator='traci'):
         super().__init__(env_params, sim_params, scenario, simulator)
-        self.edge_dict = defaultdict(list)
         self.cars_waiting_for_toll = dict()
         self.cars_before_ramp = dict()
         self.toll_wait_time = np.abs(
@@ -81,24 +79,12 @@ class BayBridgeEnv(Env):
 
     def additional_command(self):
         super().additional_command()
-        # build a list of vehicles and their edges and positions
-        self.edge_dict = defaultdict(list)
-        # update the dict with all the edges in edge_list so we can look
-        # forward for edges
-        self.edge_dict.update(
-            (k, [[] for _ in range(MAX_LANES)]) for k in EDGE_LIST)
-        for veh_id in self.k.vehicle.get_ids():
-            edge = self.k.vehicle.get_edge(veh_id)
-            if edge not in self.edge_dict:
-                self.edge_dict.update({edge: [[] for _ in range(MAX_LANES)]})
-            lane = self.k.vehicle.get_lane(veh_id)  # integer
-            pos = self.k.vehicle.get_position(veh_id)
-
-            # perform necessary lane change actions to keep vehicle in the
-            # right route
-            self.edge_dict[edge][lane].append((veh_id, pos))
-            if edge == "124952171" and lane == 1:
-                self.k.vehicle.apply_lane_change([veh_id], direction=[1])
+        # perform necessary lane change actions to keep vehicles in the
+        # right route
+        veh_ids, _ = self.k.vehicle.get_lane_occupancy("124952171", 1)
+        if len(veh_ids) > 0:
+            self.k.vehicle.apply_lane_change(
+                list(veh_ids), direction=[1] * len(veh_ids))
 
         if not self.disable_tb:
             self.apply_toll_bridge_control()
@@ -109,7 +95,7 @@ class BayBridgeEnv(Env):
         cars_that_have_left = []
         for veh_id in self.cars_before_ramp:
             if self.k.vehicle.get_edge(veh_id) == EDGE_AFTER_RAMP_METER:
-                if self.simulator == 'traci':
+                if self.simulator in ['traci', 'libsumo']:
                     lane_change_mode = self.cars_before_ramp[veh_id][
                         'lane_change_mode']
                     self.k.kernel_api.vehicle.setLaneChangeMode(
@@ -123,33 +109,35 @@ class BayBridgeEnv(Env):
             self.cars_before_ramp.__delitem__(veh_id)
 
         for lane in range(NUM_RAMP_METERS):
-            cars_in_lane = self.edge_dict[EDGE_BEFORE_RAMP_METER][lane]
-
-            for car in cars_in_lane:
-                veh_id, pos = car
-                if pos > RAMP_METER_AREA:
-                    if veh_id not in self.cars_waiting_for_toll:
-                        if self.simulator == 'traci':
-                            # Disable lane changes inside Toll Area
-                            lane_change_mode = self.k.kernel_api.vehicle.\
-                                getLaneChangeMode(veh_id)
-                            self.k.kernel_api.vehicle.setLaneChangeMode(
-                                veh_id, 512)
-                        else:
-                            lane_change_mode = None
-                        color = self.k.vehicle.get_color(veh_id)
-                        self.k.vehicle.set_color(veh_id, (0, 255, 255))
-                        self.cars_before_ramp[veh_id] = {
-                            "lane_change_mode": lane_change_mode,
-                            "color": color
-                        }
+            cars_in_lane, pos = self.k.vehicle.get_lane_occupancy(
+                EDGE_BEFORE_RAMP_METER, lane)
+
+            # the vehicles are sorted by position, so the ones past the start
+            # of the ramp meter area are at the end of the lane
+            start = np.searchsorted(pos, RAMP_METER_AREA, side='right')
+            for veh_id in cars_in_lane[start:]:
+                if veh_id not in self.cars_waiting_for_toll:
+                    if self.simulator in ['traci', 'libsumo']:
+                        # Disable lane changes inside Toll Area
+                        lane_change_mode = self.k.kernel_api.vehicle.\
+                            getLaneChangeMode(veh_id)
+                        self.k.kernel_api.vehicle.setLaneChangeMode(
+                            veh_id, 512)
+                    else:
+                        lane_change_mode = None
+                    color = self.k.vehicle.get_color(veh_id)
+                    self.k.vehicle.set_color(veh_id, (0, 255, 255))
+                    self.cars_before_ramp[veh_id] = {
+                        "lane_change_mode": lane_change_mode,
+                        "color": color
+                    }
 
     def apply_toll_bridge_control(self):
         cars_that_have_left = []
         for veh_id in self.cars_waiting_for_toll:
             if self.k.vehicle.get_edge(veh_id) == EDGE_AFTER_TOLL:
                 lane = self.k.vehicle.get_lane(veh_id)
-                if self.simulator == 'traci':
+                if self.simulator in ['traci', 'libsumo']:
                     lane_change_mode = \
                         self.cars_waiting_for_toll[veh_id]["lane_change_mode"]
                     self.k.kernel_api.vehicle.setLaneChangeMode(
@@ -178,33 +166,33 @@ class BayBridgeEnv(Env):
         traffic_light_states = ["G"] * NUM_TOLL_LANES
 
         for lane in range(NUM_TOLL_LANES):
-            cars_in_lane = self.edge_dict[EDGE_BEFORE_TOLL][lane]
-
-            for car in cars_in_lane:
-                veh_id, pos = car
-                if pos > TOLL_BOOTH_AREA:
-                    if veh_id not in self.cars_waiting_for_toll:
-                        if self.simulator == 'traci':
-                            # Disable lane changes inside Toll Area
-                            lc_mode = self.k.kernel_api.vehicle.\
-                                getLaneChangeMode(veh_id)
-                            self.k.kernel_api.vehicle.setLaneChangeMode(
-                                veh_id, 512)
-                        else:
-                            lc_mode = None
-                        color = self.k.vehicle.get_color(veh_id)
-                        self.k.vehicle.set_color(veh_id, (255, 0, 255))
-                        self.cars_waiting_for_toll[veh_id] = {
-                            "lane_change_mode": lc_mode,
-                            "color": color
-                        }
+            cars_in_lane, pos = self.k.vehicle.get_lane_occupancy(
+                EDGE_BEFORE_TOLL, lane)
+
+            start = np.searchsorted(pos, TOLL_BOOTH_AREA, side='right')
+            for veh_id, veh_pos in zip(cars_in_lane[start:], pos[start:]):
+                if veh_id not in self.cars_waiting_for_toll:
+                    if self.simulator in ['traci', 'libsumo']:
+                        # Disable lane changes inside Toll Area
+                        lc_mode = self.k.kernel_api.vehicle.\
+                            getLaneChangeMode(veh_id)
+                        self.k.kernel_api.vehicle.setLaneChangeMode(
+                            veh_id, 512)
                     else:
-                        if pos > 120:
-                            if self.toll_wait_time[lane] < 0:
-                                traffic_light_states[lane] = "G"
-                            else:
-                                traffic_light_states[lane] = "r"
-                                self.toll_wait_time[lane] -= 1
+                        lc_mode = None
+                    color = self.k.vehicle.get_color(veh_id)
+                    self.k.vehicle.set_color(veh_id, (255, 0, 255))
+                    self.cars_waiting_for_toll[veh_id] = {
+                        "lane_change_mode": lc_mode,
+                        "color": color
+                    }
+                else:
+                    if veh_pos > 120:
+                        if self.toll_wait_time[lane] < 0:
+                            traffic_light_states[lane] = "G"
+                        else:
+                            traffic_light_states[lane] = "r"
+                            self.toll_wait_time[lane] -= 1
 
         new_tls_state = "".join(traffic_light_states)
 
@@ -16,11 +16,13 @@ from flow.core.params import SumoCarFollowingParams, SumoLaneChangeParams
 from flow.core.params import VehicleParams
 
 from copy import deepcopy
+import heapq
 
 import numpy as np
 from gym.spaces.box import Box
 
 from flow.core import rewards
+from flow.core.kernel.vehicle import EdgeSegments
 from flow.envs.base_env import Env
 
 MAX_LANES = 4  # base number of largest number of lanes in the network
@@ -101,6 +103,13 @@ class BottleneckEnv(Env):
         number of vehicles.
     """
 
+    # the states of the toll booth, the ramp meter, and the outflow
+    # measurement change during a rollout
+    snapshot_attributes = Env.snapshot_attributes + (
+        'cars_waiting_for_toll', 'cars_before_ramp', 'toll_wait_time',
+        'tl_state', 'next_period', 'q', 'feedback_timer', 'cycle_time',
+        'ramp_state', 'smoothed_num', 'outflow_index')
+
     def __init__(self, env_params, sim_params, scenario, simulator='traci'):
         for p in ADDITIONAL_ENV_PARAMS.keys():
             if p not in env_params.additional_params:
@@ -111,7 +120,6 @@ class BottleneckEnv(Env):
         env_add_params = self.env_params.additional_params
         # tells how scaled the number of lanes are
         self.scaling = scenario.net_params.additional_params.get("scaling", 1)
-        self.edge_dict = dict()
         self.cars_waiting_for_toll = dict()
         self.cars_before_ramp = dict()
         self.toll_wait_time = np.abs(
@@ -144,22 +152,6 @@ class BottleneckEnv(Env):
     def additional_command(self):
         super().additional_command()
 
-        # build a dict containing the list of vehicles and their position for
-        # each edge and for each lane within the edge
-        empty_edge = [[] for _ in range(MAX_LANES * self.scaling)]
-
-        self.edge_dict = {k: deepcopy(empty_edge) for k in EDGE_LIST}
-        for veh_id in self.k.vehicle.get_ids():
-            try:
-                edge = self.k.vehicle.get_edge(veh_id)
-                if edge not in self.edge_dict:
-                    self.edge_dict[edge] = deepcopy(empty_edge)
-                lane = self.k.vehicle.get_lane(veh_id)  # integer
-                pos = self.k.vehicle.get_position(veh_id)
-                self.edge_dict[edge][lane].append((veh_id, pos))
-            except Exception:
-                pass
-
         if not self.env_params.additional_params['disable_tb']:
             self.apply_toll_bridge_control()
         if not self.env_params.additional_params['disable_ramp_metering']:
@@ -181,7 +173,7 @@ class BottleneckEnv(Env):
             if self.k.vehicle.get_edge(veh_id) == EDGE_AFTER_RAMP_METER:
                 color = self.cars_before_ramp[veh_id]['color']
                 self.k.vehicle.set_color(veh_id, color)
-                if self.simulator == 'traci':
+                if self.simulator in ['traci', 'libsumo']:
                     lane_change_mode = self.cars_before_ramp[veh_id][
                         'lane_change_mode']
                     self.k.kernel_api.vehicle.setLaneChangeMode(
@@ -192,26 +184,29 @@ class BottleneckEnv(Env):
             del self.cars_before_ramp[veh_id]
 
         for lane in range(NUM_RAMP_METERS * self.scaling):
-            cars_in_lane = self.edge_dict[EDGE_BEFORE_RAMP_METER][lane]
-
-            for veh_id, pos in cars_in_lane:
-                if pos > RAMP_METER_AREA:
-                    if veh_id not in self.cars_waiting_for_toll:
-                        if self.simulator == 'traci':
-                            # Disable lane changes inside Toll Area
-                            lane_change_mode = \
-                                self.k.kernel_api.vehicle.getLaneChangeMode(
-                                    veh_id)
-                            self.k.kernel_api.vehicle.setLaneChangeMode(
-                                veh_id, 512)
-                        else:
-                            lane_change_mode = None
-                        color = self.k.vehicle.get_color(veh_id)
-                        self.k.vehicle.set_color(veh_id, (0, 255, 255))
-                        self.cars_before_ramp[veh_id] = {
-                            'lane_change_mode': lane_change_mode,
-                            'color': color
-                        }
+            cars_in_lane, pos = self.k.vehicle.get_lane_occupancy(
+                EDGE_BEFORE_RAMP_METER, lane)
+
+            # the vehicles are sorted by position, so the ones past the start
+            # of the ramp meter area are at the end of the lane
+            start = np.searchsorted(pos, RAMP_METER_AREA, side='right')
+            for veh_id in cars_in_lane[start:]:
+                if veh_id not in self.cars_waiting_for_toll:
+                    if self.simulator in ['traci', 'libsumo']:
+                        # Disable lane changes inside Toll Area
+                        lane_change_mode = \
+                            self.k.kernel_api.vehicle.getLaneChangeMode(
+                                veh_id)
+                        self.k.kernel_api.vehicle.setLaneChangeMode(
+                            veh_id, 512)
+                    else:
+                        lane_change_mode = None
+                    color = self.k.vehicle.get_color(veh_id)
+                    self.k.vehicle.set_color(veh_id, (0, 255, 255))
+                    self.cars_before_ramp[veh_id] = {
+                        'lane_change_mode': lane_change_mode,
+                        'color': color
+                    }
 
     def alinea(self):
         """Utilize the ALINEA algorithm for toll booth metering control.
@@ -252,7 +247,7 @@ class BottleneckEnv(Env):
                 lane = self.k.vehicle.get_lane(veh_id)
                 color = self.cars_waiting_for_toll[veh_id]["color"]
                 self.k.vehicle.set_color(veh_id, color)
-                if self.simulator == 'traci':
+                if self.simulator in ['traci', 'libsumo']:
                     lane_change_mode = \
                         self.cars_waiting_for_toll[veh_id]["lane_change_mode"]
                     self.k.kernel_api.vehicle.setLaneChangeMode(
@@ -278,31 +273,32 @@ class BottleneckEnv(Env):
         traffic_light_states = ["G"] * NUM_TOLL_LANES * self.scaling
 
         for lane in range(NUM_TOLL_LANES * self.scaling):
-            cars_in_lane = self.edge_dict[EDGE_BEFORE_TOLL][lane]
-
-            for veh_id, pos in cars_in_lane:
-                if pos > TOLL_BOOTH_AREA:
-                    if veh_id not in self.cars_waiting_for_toll:
-                        # Disable lane changes inside Toll Area
-                        if self.simulator == 'traci':
-                            lane_change_mode = self.k.kernel_api.vehicle.\
-                                getLaneChangeMode(veh_id)
-                            self.k.kernel_api.vehicle.setLaneChangeMode(
-                                veh_id, 512)
-                        else:
-                            lane_change_mode = None
-                        color = self.k.vehicle.get_color(veh_id)
-                        self.k.vehicle.set_color(veh_id, (255, 0, 255))
-                        self.cars_waiting_for_toll[veh_id] = \
-                            {'lane_change_mode': lane_change_mode,
-                             'color': color}
+            cars_in_lane, pos = self.k.vehicle.get_lane_occupancy(
+                EDGE_BEFORE_TOLL, lane)
+
+            start = np.searchsorted(pos, TOLL_BOOTH_AREA, side='right')
+            for veh_id, veh_pos in zip(cars_in_lane[start:], pos[start:]):
+                if veh_id not in self.cars_waiting_for_toll:
+                    # Disable lane changes inside Toll Area
+                    if self.simulator in ['traci', 'libsumo']:
+                        lane_change_mode = self.k.kernel_api.vehicle.\
+                            getLaneChangeMode(veh_id)
+                        self.k.kernel_api.vehicle.setLaneChangeMode(
+                            veh_id, 512)
                     else:
-                        if pos > 50:
-                            if self.toll_wait_time[lane] < 0:
-                                traffic_light_states[lane] = "G"
-                            else:
-                                traffic_light_states[lane] = "r"
-                                self.toll_wait_time[lane] -= 1
+                        lane_change_mode = None
+                    color = self.k.vehicle.get_color(veh_id)
+                    self.k.vehicle.set_color(veh_id, (255, 0, 255))
+                    self.cars_waiting_for_toll[veh_id] = \
+                        {'lane_change_mode': lane_change_mode,
+                         'color': color}
+                else:
+                    if veh_pos > 50:
+                        if self.toll_wait_time[lane] < 0:
+                            traffic_light_states[lane] = "G"
+                        else:
+                            traffic_light_states[lane] = "r"
+                            self.toll_wait_time[lane] -= 1
 
         new_tl_state = "".join(traffic_light_states)
 
@@ -312,16 +308,17 @@ class BottleneckEnv(Env):
                 node_id=TB_TL_ID, state=new_tl_state)
 
     def get_bottleneck_density(self, lanes=None):
-        bottleneck_ids = self.k.vehicle.get_ids_by_edge(['3', '4'])
         if lanes:
-            veh_ids = [
-                veh_id for veh_id in bottleneck_ids
-                if str(self.k.vehicle.get_edge(veh_id)) + "_" +
-                str(self.k.vehicle.get_lane(veh_id)) in lanes
-            ]
+            # lanes are given as "<edge>_<lane index>"
+            num_veh = 0
+            for edge, lane in set(tuple(lane.rsplit("_", 1))
+                                  for lane in lanes):
+                if edge in ['3', '4']:
+                    num_veh += len(self.k.vehicle.get_lane_occupancy(
+                        edge, int(lane))[0])
         else:
-            veh_ids = self.k.vehicle.get_ids_by_edge(['3', '4'])
-        return len(veh_ids) / BOTTLE_NECK_LEN
+            num_veh = len(self.k.vehicle.get_ids_by_edge(['3', '4']))
+        return num_veh / BOTTLE_NECK_LEN
 
     # Dummy action and observation spaces
     @property
@@ -381,6 +378,10 @@ class BottleNeckAccelEnv(BottleneckEnv):
         A rollout is terminated once the time horizon is reached.
    """
 
+    # the slots of the rl vehicles in the observation change during a rollout
+    snapshot_attributes = BottleneckEnv.snapshot_attributes + (
+        'rl_id_list', 'rl_id_slot', '_free_slots')
+
     def __init__(self, env_params, sim_params, scenario, simulator='traci'):
         for p in ADDITIONAL_RL_ENV_PARAMS.keys():
             if p not in env_params.additional_params:
@@ -393,6 +394,25 @@ class BottleNeckAccelEnv(BottleneckEnv):
         self.rl_id_list = deepcopy(self.initial_vehicles.get_rl_ids())
         self.max_speed = self.k.scenario.max_speed()
 
+        # slot of every rl vehicle in the observation. The ids of the rl
+        # vehicles are only known once they enter the network, at which point
+        # they are given the lowest free slot (see _update_rl_slots)
+        self.rl_id_slot = {veh_id: i for i, veh_id in
+                           enumerate(self.rl_id_list)}
+        self._free_slots = list(range(len(self.rl_id_list), self.num_rl))
+
+        # observation buffer, and views of the rl vehicle data, relative
+        # vehicle data, and per edge data within it (see get_state)
+        edges = self.k.scenario.get_edge_list()
+        num_lanes = MAX_LANES * self.scaling
+        self._obs = np.zeros(self.observation_space.shape)
+        self._rl_obs = self._obs[:4 * self.num_rl].reshape(self.num_rl, 4)
+        self._relative_obs = self._obs[4 * self.num_rl:-2 * len(edges)] \
+            .reshape(self.num_rl, 4, num_lanes)
+        self._edge_obs = self._obs[-2 * len(edges):].reshape(len(edges), 2)
+        self._edge_lengths = np.array(
+            [self.k.scenario.edge_length(edge) for edge in edges])
+
     @property
     def observation_space(self):
         """See class definition."""
@@ -407,97 +427,89 @@ class BottleNeckAccelEnv(BottleneckEnv):
         """See class definition."""
         headway_scale = 1000
 
-        rl_ids = self.k.vehicle.get_rl_ids()
+        # rl vehicles that are in the network, and their slots. Missing
+        # vehicles leave their slots padded with zeros
+        self._update_rl_slots(self.k.vehicle.get_rl_ids())
+        rl_ids = [veh_id for veh_id in self.k.vehicle.get_rl_ids()
+                  if veh_id in self.rl_id_slot]
+        slots = [self.rl_id_slot[veh_id] for veh_id in rl_ids]
 
         # rl vehicle data (absolute position, speed, and lane index)
-        rl_obs = np.empty(0)
-        id_counter = 0
-        for veh_id in rl_ids:
-            # check if we have skipped a vehicle, if not, pad
-            rl_id_num = self.rl_id_list.index(veh_id)
-            if rl_id_num != id_counter:
-                rl_obs = np.concatenate(
-                    (rl_obs, np.zeros(4 * (rl_id_num - id_counter))))
-                id_counter = rl_id_num + 1
-            else:
-                id_counter += 1
-
+        rl_obs = self._rl_obs
+        rl_obs.fill(0)
+        if len(rl_ids) > 0:
             # get the edge and convert it to a number
-            edge_num = self.k.vehicle.get_edge(veh_id)
-            if edge_num is None or edge_num == '' or edge_num[0] == ':':
-                edge_num = -1
-            else:
-                edge_num = int(edge_num) / 6
-            rl_obs = np.concatenate((rl_obs, [
-                self.k.vehicle.get_x_by_id(veh_id) / 1000,
-                (self.k.vehicle.get_speed(veh_id) / self.max_speed),
-                (self.k.vehicle.get_lane(veh_id) / MAX_LANES), edge_num
-            ]))
-
-        # if all the missing vehicles are at the end, pad
-        diff = self.num_rl - int(rl_obs.shape[0] / 4)
-        if diff > 0:
-            rl_obs = np.concatenate((rl_obs, np.zeros(4 * diff)))
+            edge_num = [
+                -1 if edge is None or edge == '' or edge[0] == ':'
+                else int(edge) / 6
+                for edge in self.k.vehicle.get_edge(rl_ids)]
+            rl_obs[slots, 0] = np.asarray(
+                self.k.vehicle.get_x_by_id(rl_ids), dtype=float) / 1000
+            rl_obs[slots, 1] = np.asarray(
+                self.k.vehicle.get_speed(rl_ids), dtype=float) / self.max_speed
+            rl_obs[slots, 2] = np.asarray(
+                self.k.vehicle.get_lane(rl_ids), dtype=float) / MAX_LANES
+            rl_obs[slots, 3] = edge_num
 
         # relative vehicles data (lane headways, tailways, vel_ahead, and
         # vel_behind)
-        relative_obs = np.empty(0)
-        id_counter = 0
-        for veh_id in rl_ids:
-            # check if we have skipped a vehicle, if not, pad
-            rl_id_num = self.rl_id_list.index(veh_id)
-            if rl_id_num != id_counter:
-                pad_mat = np.zeros(
-                    4 * MAX_LANES * self.scaling * (rl_id_num - id_counter))
-                relative_obs = np.concatenate((relative_obs, pad_mat))
-                id_counter = rl_id_num + 1
-            else:
-                id_counter += 1
-            num_lanes = MAX_LANES * self.scaling
-            headway = np.asarray([1000] * num_lanes) / headway_scale
-            tailway = np.asarray([1000] * num_lanes) / headway_scale
-            vel_in_front = np.asarray([0] * num_lanes) / self.max_speed
-            vel_behind = np.asarray([0] * num_lanes) / self.max_speed
-
-            lane_leaders = self.k.vehicle.get_lane_leaders(veh_id)
-            lane_followers = self.k.vehicle.get_lane_followers(veh_id)
+        relative_obs = self._relative_obs
+        relative_obs.fill(0)
+        relative_obs[slots, :2] = 1000 / headway_scale
+        for veh_id, slot in zip(rl_ids, slots):
+            headway, tailway, vel_in_front, vel_behind = relative_obs[slot]
+
             lane_headways = self.k.vehicle.get_lane_headways(veh_id)
             lane_tailways = self.k.vehicle.get_lane_tailways(veh_id)
-            headway[0:len(lane_headways)] = (
-                np.asarray(lane_headways) / headway_scale)
-            tailway[0:len(lane_tailways)] = (
-                np.asarray(lane_tailways) / headway_scale)
-            for i, lane_leader in enumerate(lane_leaders):
-                if lane_leader != '':
-                    vel_in_front[i] = (
-                        self.k.vehicle.get_speed(lane_leader) / self.max_speed)
-            for i, lane_follower in enumerate(lane_followers):
-                if lane_followers != '':
-                    vel_behind[i] = (self.k.vehicle.get_speed(lane_follower) /
-                                     self.max_speed)
-
-            relative_obs = np.concatenate((relative_obs, headway, tailway,
-                                           vel_in_front, vel_behind))
-
-        # if all the missing vehicles are at the end, pad
-        diff = self.num_rl - int(relative_obs.shape[0] / (4 * MAX_LANES))
-        if diff > 0:
-            relative_obs = np.concatenate((relative_obs,
-                                           np.zeros(4 * MAX_LANES * diff)))
-
-        # per edge data (average speed, density
-        edge_obs = []
-        for edge in self.k.scenario.get_edge_list():
-            veh_ids = self.k.vehicle.get_ids_by_edge(edge)
-            if len(veh_ids) > 0:
-                avg_speed = (sum(self.k.vehicle.get_speed(veh_ids)) /
-                             len(veh_ids)) / self.max_speed
-                density = len(veh_ids) / self.k.scenario.edge_length(edge)
-                edge_obs += [avg_speed, density]
-            else:
-                edge_obs += [0, 0]
-
-        return np.concatenate((rl_obs, relative_obs, edge_obs))
+            lane_leaders_speed = self.k.vehicle.get_lane_leaders_speed(veh_id)
+            lane_followers_speed = \
+                self.k.vehicle.get_lane_followers_speed(veh_id)
+            headway[:len(lane_headways)] = \
+                np.asarray(lane_headways) / headway_scale
+            tailway[:len(lane_tailways)] = \
+                np.asarray(lane_tailways) / headway_scale
+            vel_in_front[:len(lane_leaders_speed)] = \
+                np.asarray(lane_leaders_speed) / self.max_speed
+            vel_behind[:len(lane_followers_speed)] = \
+                np.asarray(lane_followers_speed) / self.max_speed
+
+        # per edge data (average speed, density)
+        num_veh, tot_speed = self.k.vehicle.get_edge_aggregates(
+            self.k.scenario.get_edge_list())
+        self._edge_obs[:, 0] = np.divide(
+            tot_speed, num_veh, out=np.zeros(len(num_veh)),
+            where=num_veh > 0) / self.max_speed
+        self._edge_obs[:, 1] = num_veh / self._edge_lengths
+
+        return self._obs.copy()
+
+    def _update_rl_slots(self, rl_ids):
+        """Assign the observation slots to the rl vehicles in the network.
+
+        Vehicles that left the network release their slots, unless they are
+        reintroduced under the same ids (see add_rl_if_exit). Vehicles that
+        entered it are given the lowest free slots, and are not observed if
+        no slot is free.
+
+        Parameters
+        ----------
+        rl_ids : list of str
+            ids of the rl vehicles in the network
+        """
+        in_network = set(rl_ids)
+        exited = [] if self.add_rl_if_exit else \
+            [veh_id for veh_id in self.rl_id_slot if veh_id not in in_network]
+        entered = [veh_id for veh_id in rl_ids
+                   if veh_id not in self.rl_id_slot]
+        if len(exited) == 0 and (len(entered) == 0 or
+                                 len(self._free_slots) == 0):
+            return
+
+        for veh_id in exited:
+            heapq.heappush(self._free_slots, self.rl_id_slot.pop(veh_id))
+        for veh_id in entered[:len(self._free_slots)]:
+            self.rl_id_slot[veh_id] = heapq.heappop(self._free_slots)
+        self.rl_id_list = sorted(self.rl_id_slot, key=self.rl_id_slot.get)
 
     def compute_reward(self, rl_actions, **kwargs):
         """See class definition."""
@@ -565,7 +577,7 @@ class BottleNeckAccelEnv(BottleneckEnv):
                 set(self.rl_id_list).difference(self.k.vehicle.get_rl_ids()))
             for rl_id in diff_list:
                 # distribute rl cars evenly over lanes
-                lane_num = self.rl_id_list.index(rl_id) % \
+                lane_num = self.rl_id_slot[rl_id] % \
                            MAX_LANES * self.scaling
                 # reintroduce it at the start of the network
                 try:
@@ -666,36 +678,19 @@ class DesiredVelocityEnv(BottleneckEnv):
         # have same action, else False
         self.symmetric = additional_params.get("symmetric")
 
-        # action index tells us, given an edge and a lane,the offset into
-        # rl_actions that we should take.
-        self.action_index = [0]
-        for i, (edge, segment, controlled) in enumerate(self.segments[:-1]):
-            if self.symmetric:
-                self.action_index += [
-                    self.action_index[i] + segment * controlled
-                ]
-            else:
-                num_lanes = self.k.scenario.num_lanes(edge)
-                self.action_index += [
-                    self.action_index[i] + segment * controlled * num_lanes
-                ]
-
-        self.action_index = {}
-        action_list = [0]
-        index = 0
-        for (edge, num_segments, controlled) in self.segments:
-            if controlled:
-                if self.symmetric:
-                    self.action_index[edge] = [action_list[index]]
-                    action_list += [action_list[index] + controlled]
-                else:
-                    num_lanes = self.k.scenario.num_lanes(edge)
-                    self.action_index[edge] = [action_list[index]]
-                    action_list += [
-                        action_list[index] +
-                        num_segments * controlled * num_lanes
-                    ]
-                index += 1
+        # (edge, segment, lane) cells of the controlled and observed segments.
+        # The cells of the controlled segments are ordered as the actions of
+        # the rl vehicles located in them (or their segments if symmetric)
+        self.controlled_grid = EdgeSegments(
+            self.controlled_edges,
+            [self.slices[edge] for edge in self.controlled_edges],
+            [self.k.scenario.num_lanes(edge)
+             for edge in self.controlled_edges])
+        obs_edges = [edge for edge, _ in self.obs_segments]
+        self.observed_grid = EdgeSegments(
+            obs_edges,
+            [self.obs_slices[edge] for edge in obs_edges],
+            [self.k.scenario.num_lanes(edge) for edge in obs_edges])
 
     @property
     def observation_space(self):
@@ -732,59 +727,15 @@ class DesiredVelocityEnv(BottleneckEnv):
         # number of rl vehicles in each segment in each lane
         # mean speed in each segment, and mean rl speed in each
         # segment in each lane
-        num_vehicles_list = []
-        num_rl_vehicles_list = []
-        vehicle_speeds_list = []
-        rl_speeds_list = []
-        for i, edge in enumerate(EDGE_LIST):
-            num_lanes = self.k.scenario.num_lanes(edge)
-            num_vehicles = np.zeros((self.num_obs_segments[i], num_lanes))
-            num_rl_vehicles = np.zeros((self.num_obs_segments[i], num_lanes))
-            vehicle_speeds = np.zeros((self.num_obs_segments[i], num_lanes))
-            rl_vehicle_speeds = np.zeros((self.num_obs_segments[i], num_lanes))
-            ids = self.k.vehicle.get_ids_by_edge(edge)
-            lane_list = self.k.vehicle.get_lane(ids)
-            pos_list = self.k.vehicle.get_position(ids)
-            for i, id in enumerate(ids):
-                segment = np.searchsorted(self.obs_slices[edge],
-                                          pos_list[i]) - 1
-                if id in self.k.vehicle.get_rl_ids():
-                    rl_vehicle_speeds[segment, lane_list[i]] \
-                        += self.k.vehicle.get_speed(id)
-                    num_rl_vehicles[segment, lane_list[i]] += 1
-                else:
-                    vehicle_speeds[segment, lane_list[i]] \
-                        += self.k.vehicle.get_speed(id)
-                    num_vehicles[segment, lane_list[i]] += 1
-
-            # normalize
-
-            num_vehicles /= NUM_VEHICLE_NORM
-            num_rl_vehicles /= NUM_VEHICLE_NORM
-            num_vehicles_list += num_vehicles.flatten().tolist()
-            num_rl_vehicles_list += num_rl_vehicles.flatten().tolist()
-            vehicle_speeds_list += vehicle_speeds.flatten().tolist()
-            rl_speeds_list += rl_vehicle_speeds.flatten().tolist()
-
-        unnorm_veh_list = np.asarray(num_vehicles_list) * NUM_VEHICLE_NORM
-        unnorm_rl_list = np.asarray(num_rl_vehicles_list) * NUM_VEHICLE_NORM
-
-        # compute the mean speed if the speed isn't zero
-        num_rl = len(num_rl_vehicles_list)
-        num_veh = len(num_vehicles_list)
-        mean_speed = np.nan_to_num([
-            vehicle_speeds_list[i] / unnorm_veh_list[i]
-            if int(unnorm_veh_list[i]) else 0 for i in range(num_veh)
-        ])
-        mean_speed_norm = mean_speed / 50
-        mean_rl_speed = np.nan_to_num([
-            rl_speeds_list[i] / unnorm_rl_list[i]
-            if int(unnorm_rl_list[i]) else 0 for i in range(num_rl)
-        ]) / 50
+        num_vehicles, mean_speed = self.k.vehicle.get_segment_aggregates(
+            self.observed_grid)
+
         outflow = np.asarray(
             self.k.vehicle.get_outflow_rate(20 * self.sim_step) / 2000.0)
-        return np.concatenate((num_vehicles_list, num_rl_vehicles_list,
-                               mean_speed_norm, mean_rl_speed, [outflow]))
+        return np.concatenate((num_vehicles[0] / NUM_VEHICLE_NORM,
+                               num_vehicles[1] / NUM_VEHICLE_NORM,
+                               mean_speed[0] / 50, mean_speed[1] / 50,
+                               [outflow]))
 
     def _apply_rl_actions(self, rl_actions):
         """
@@ -794,27 +745,32 @@ class DesiredVelocityEnv(BottleneckEnv):
         * Then they're split into segment actions.
         * Then they're split into lane actions.
         """
-        for rl_id in self.k.vehicle.get_rl_ids():
-            edge = self.k.vehicle.get_edge(rl_id)
-            lane = self.k.vehicle.get_lane(rl_id)
+        rl_ids = self.k.vehicle.get_rl_ids()
+        if len(rl_ids) == 0:
+            return
+
+        # find the cell (or segment) of the controlled edges every rl vehicle
+        # falls into, which is also the index of its action
+        grid = self.controlled_grid
+        edges = self.k.vehicle.get_edge(rl_ids)
+        edge_index = np.array([grid.edge_index.get(edge, -1)
+                               for edge in edges], dtype=np.int64)
+        pos = np.asarray(self.k.vehicle.get_position(rl_ids), dtype=float)
+        if self.symmetric:
+            action_index = grid.segment(edge_index, pos)
+            action_index[edge_index >= 0] += \
+                grid.segment_start[edge_index[edge_index >= 0]]
+        else:
+            lanes = np.asarray(self.k.vehicle.get_lane(rl_ids))
+            action_index = grid.cell(edge_index, pos, lanes)
+
+        for rl_id, edge, index in zip(rl_ids, edges, action_index.tolist()):
             if edge:
                 # If in outer lanes, on a controlled edge, in a controlled lane
-                if edge[0] != ':' and edge in self.controlled_edges:
-                    pos = self.k.vehicle.get_position(rl_id)
-
-                    if not self.symmetric:
-                        num_lanes = self.k.scenario.num_lanes(edge)
-                        # find what segment we fall into
-                        bucket = np.searchsorted(self.slices[edge], pos) - 1
-                        action = rl_actions[int(lane) + bucket * num_lanes +
-                                            self.action_index[edge]]
-                    else:
-                        # find what segment we fall into
-                        bucket = np.searchsorted(self.slices[edge], pos) - 1
-                        action = rl_actions[bucket + self.action_index[edge]]
-
+                if index >= 0:
                     max_speed_curr = self.k.vehicle.get_max_speed(rl_id)
-                    next_max = np.clip(max_speed_curr + action, 0.01, 23.0)
+                    next_max = np.clip(
+                        max_speed_curr + rl_actions[index], 0.01, 23.0)
                     self.k.vehicle.set_max_speed(rl_id, next_max)
 
                 else:
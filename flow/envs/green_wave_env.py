@@ -6,6 +6,7 @@ from gym.spaces.box import Box
 from gym.spaces.tuple_space import Tuple
 
 from flow.core import rewards
+from flow.core.kernel.traffic_light import TrafficLightPhases
 from flow.envs.base_env import Env
 
 ADDITIONAL_ENV_PARAMS = {
@@ -18,6 +19,11 @@ ADDITIONAL_ENV_PARAMS = {
     "discrete": False,
 }
 
+# names of the edges of the grid, e.g. "bot0_1", and of the internal edges of
+# its intersections, e.g. ":center3_0"
+EDGE_PATTERN = re.compile(r"([a-zA-Z]+)(\d+)_(\d+)$")
+CENTER_PATTERN = re.compile(r":center(\d+)")
+
 ADDITIONAL_PO_ENV_PARAMS = {
     # num of vehicles the agent can observe on each incoming edge
     "num_observed": 2,
@@ -63,6 +69,12 @@ class TrafficLightGridEnv(Env):
         vehicles.
     """
 
+    # vehicles are only observed through their speeds, edges and positions
+    required_vehicle_variables = ()
+
+    # the phases of the traffic lights change during a rollout
+    snapshot_attributes = Env.snapshot_attributes + ('tl_phases',)
+
     def __init__(self, env_params, sim_params, scenario, simulator='traci'):
 
         for p in ADDITIONAL_ENV_PARAMS.keys():
@@ -88,29 +100,21 @@ class TrafficLightGridEnv(Env):
         }
         self.node_mapping = scenario.get_node_mapping()
 
-        # Keeps track of the last time the traffic lights in an intersection
-        # were allowed to change (the last time the lights were allowed to
-        # change from a red-green state to a red-yellow state.)
-        self.last_change = np.zeros((self.rows * self.cols, 1))
-        # Keeps track of the direction of the intersection (the direction that
-        # is currently being allowed to flow. 0 indicates flow from top to
-        # bottom, and 1 indicates flow from left to right.)
-        self.direction = np.zeros((self.rows * self.cols, 1))
-        # Value of 1 indicates that the intersection is in a red-yellow state.
-        # value 0 indicates that the intersection is in a red-green state.
-        self.currently_yellow = np.zeros((self.rows * self.cols, 1))
-
         # when this hits min_switch_time we change from yellow to red
-        # the second column indicates the direction that is currently being
-        # allowed to flow. 0 is flowing top to bottom, 1 is left to right
-        # For third column, 0 signifies yellow and 1 green or red
         self.min_switch_time = env_params.additional_params["switch_time"]
 
+        # Phases of the traffic lights of the intersections. Direction 0
+        # indicates flow from top to bottom, and 1 from left to right.
+        self.tl_phases = TrafficLightPhases(
+            node_ids=['center{}'.format(i)
+                      for i in range(self.rows * self.cols)],
+            green_states=("GrGr", "rGrG"),
+            yellow_states=("yryr", "ryry"),
+            min_switch_time=self.min_switch_time)
+
         if self.tl_type != "actuated":
-            for i in range(self.rows * self.cols):
-                self.k.traffic_light.set_state(
-                    node_id='center' + str(i), state="GrGr")
-                self.currently_yellow[i] = 0
+            self.k.traffic_light.set_states(
+                self.tl_phases.node_ids, self.tl_phases.get_states())
 
         # # Additional Information for Plotting
         # self.edge_mapping = {"top": [], "bot": [], "right": [], "left": []}
@@ -124,6 +128,52 @@ class TrafficLightGridEnv(Env):
         # check whether the action space is meant to be discrete or continuous
         self.discrete = env_params.additional_params.get("discrete", False)
 
+        # metadata of the edges vehicles may be located on, computed once for
+        # every edge (see _get_edge_rows). Each array contains one element per
+        # edge, in the order of the rows in self._edge_rows:
+        # - _edge_code: number uniquely identifying the edge (see _split_edge)
+        # - _edge_length: length of the edge up to its intersection
+        # - _edge_pos_coeff: coefficient of the position of vehicles in their
+        #   distance to the intersection, 0 if this distance is fixed
+        # - _edge_route: route vehicles reaching the end of the edge are placed
+        #   back on, None if the edge does not leave the grid
+        # - _edge_is_final: whether the edge leaves the grid
+        self._edge_rows = {}
+        self._edge_code = np.zeros(0, dtype=int)
+        self._edge_length = np.zeros(0)
+        self._edge_pos_coeff = np.zeros(0)
+        self._edge_route = []
+        self._edge_is_final = np.zeros(0, dtype=bool)
+        self._add_edges([""] + self.k.scenario.get_edge_list()
+                        + self.k.scenario.get_junction_list())
+
+    @property
+    def last_change(self):
+        """Return the time since the lights of every intersection switched.
+
+        This is the time since the lights were last allowed to change from a
+        red-green state to a red-yellow state, as a column vector.
+        """
+        return self.tl_phases.last_change.reshape(-1, 1)
+
+    @property
+    def direction(self):
+        """Return the direction traffic is allowed to flow in.
+
+        0 indicates flow from top to bottom, and 1 from left to right, for
+        every intersection as a column vector.
+        """
+        return self.tl_phases.direction.reshape(-1, 1)
+
+    @property
+    def currently_yellow(self):
+        """Return whether the lights of every intersection are yellow.
+
+        1 indicates that the intersection is in a red-yellow state, and 0 in a
+        red-green state, for every intersection as a column vector.
+        """
+        return self.tl_phases.currently_yellow.reshape(-1, 1)
+
     @property
     def action_space(self):
         """See class definition."""
@@ -170,22 +220,16 @@ class TrafficLightGridEnv(Env):
                        grid_array["inner_length"])
 
         # get the state arrays
-        speeds = [
-            self.k.vehicle.get_speed(veh_id) / self.k.scenario.max_speed()
-            for veh_id in self.k.vehicle.get_ids()
-        ]
-        dist_to_intersec = [
-            self.get_distance_to_intersection(veh_id) / max_dist
-            for veh_id in self.k.vehicle.get_ids()
-        ]
-        edges = [
-            self._convert_edge(self.k.vehicle.get_edge(veh_id)) /
-            (self.k.scenario.network.num_edges - 1)
-            for veh_id in self.k.vehicle.get_ids()
-        ]
+        ids = self.k.vehicle.get_ids()
+        rows = self._get_edge_rows(self.k.vehicle.get_edge(ids))
+        speeds = np.asarray(self.k.vehicle.get_speed(ids), dtype=float) \
+            / self.k.scenario.max_speed()
+        dist_to_intersec = self._intersection_dist(
+            rows, self.k.vehicle.get_position(ids)) / max_dist
+        edges = self._edge_code[rows] / (self.k.scenario.network.num_edges - 1)
 
         state = [
-            speeds, dist_to_intersec, edges,
+            speeds.tolist(), dist_to_intersec.tolist(), edges.tolist(),
             self.last_change.flatten().tolist(),
             self.direction.flatten().tolist(),
             self.currently_yellow.flatten().tolist()
@@ -204,34 +248,10 @@ class TrafficLightGridEnv(Env):
             # that should not switch the direction
             rl_mask = rl_actions > 0.0
 
-        for i, action in enumerate(rl_mask):
-            if self.currently_yellow[i] == 1:  # currently yellow
-                self.last_change[i] += self.sim_step
-                # Check if our timer has exceeded the yellow phase, meaning it
-                # should switch to red
-                if self.last_change[i] >= self.min_switch_time:
-                    if self.direction[i] == 0:
-                        self.k.traffic_light.set_state(
-                            node_id='center{}'.format(i),
-                            state="GrGr")
-                    else:
-                        self.k.traffic_light.set_state(
-                            node_id='center{}'.format(i),
-                            state='rGrG')
-                    self.currently_yellow[i] = 0
-            else:
-                if action:
-                    if self.direction[i] == 0:
-                        self.k.traffic_light.set_state(
-                            node_id='center{}'.format(i),
-                            state='yryr')
-                    else:
-                        self.k.traffic_light.set_state(
-                            node_id='center{}'.format(i),
-                            state='ryry')
-                    self.last_change[i] = 0.0
-                    self.direction[i] = not self.direction[i]
-                    self.currently_yellow[i] = 1
+        # only the traffic lights whose state changed are set
+        node_ids, states = self.tl_phases.step(
+            np.asarray(rl_mask, dtype=bool), self.sim_step)
+        self.k.traffic_light.set_states(node_ids, states)
 
     def compute_reward(self, rl_actions, **kwargs):
         """See class definition."""
@@ -259,23 +279,40 @@ class TrafficLightGridEnv(Env):
             the intersection the vehicle will be arriving at)
         """
         if isinstance(veh_ids, list):
-            return [self.find_intersection_dist(veh_id) for veh_id in veh_ids]
+            rows = self._get_edge_rows(self.k.vehicle.get_edge(veh_ids))
+            return self._intersection_dist(
+                rows, self.k.vehicle.get_position(veh_ids)).tolist()
         else:
             return self.find_intersection_dist(veh_ids)
 
     def find_intersection_dist(self, veh_id):
         """Return distance from the vehicle's current position to the position
         of the node it is heading toward."""
-        edge_id = self.k.vehicle.get_edge(veh_id)
-        # FIXME this might not be the best way of handling this
-        if edge_id == "":
-            return -10
-        if 'center' in edge_id:
-            return 0
-        edge_len = self.k.scenario.edge_length(edge_id)
-        relative_pos = self.k.vehicle.get_position(veh_id)
-        dist = edge_len - relative_pos
-        return dist
+        rows = self._get_edge_rows([self.k.vehicle.get_edge(veh_id)])
+        return self._intersection_dist(
+            rows, [self.k.vehicle.get_position(veh_id)])[0]
+
+    def _intersection_dist(self, rows, positions):
+        """Return the distances of positions to the end of their edges.
+
+        Positions on internal edges are at a distance of 0 from their
+        intersection, and positions outside of the network (edge "") at a
+        distance of -10.
+
+        Parameters
+        ----------
+        rows : np.ndarray of int
+            rows of the edges of the positions (see _get_edge_rows)
+        positions : array_like of float
+            positions on the edges
+
+        Returns
+        -------
+        np.ndarray of float
+            distance of every position to the intersection
+        """
+        return self._edge_length[rows] \
+            - self._edge_pos_coeff[rows] * np.asarray(positions, dtype=float)
 
     def _convert_edge(self, edges):
         """Converts the string edge to a number.
@@ -300,23 +337,22 @@ class TrafficLightGridEnv(Env):
             a number uniquely identifying each edge
         """
         if isinstance(edges, list):
-            return [self._split_edge(edge) for edge in edges]
+            rows = self._get_edge_rows(edges)
+            return self._edge_code[rows].tolist()
         else:
-            return self._split_edge(edges)
+            row = self._get_edge_rows([edges])[0]
+            return int(self._edge_code[row])
 
     def _split_edge(self, edge):
         """Utility function for convert_edge"""
         if edge:
             if edge[0] == ":":  # center
-                center_index = int(edge.split("center")[1][0])
+                center_index = int(CENTER_PATTERN.match(edge).group(1))
                 base = ((self.cols + 1) * self.rows * 2) \
                     + ((self.rows + 1) * self.cols * 2)
                 return base + center_index + 1
             else:
-                pattern = re.compile(r"[a-zA-Z]+")
-                edge_type = pattern.match(edge).group()
-                edge = edge.split(edge_type)[1].split('_')
-                row_index, col_index = [int(x) for x in edge]
+                edge_type, row_index, col_index = self._parse_edge(edge)
                 if edge_type in ['bot', 'top']:
                     rows_below = 2 * (self.cols + 1) * row_index
                     cols_below = 2 * (self.cols * (row_index + 1))
@@ -330,24 +366,45 @@ class TrafficLightGridEnv(Env):
         else:
             return 0
 
-    def additional_command(self):
-        """Used to insert vehicles that are on the exit edge and place them
-        back on their entrance edge."""
-        for veh_id in self.k.vehicle.get_ids():
-            self._reroute_if_final_edge(veh_id)
+    @staticmethod
+    def _parse_edge(edge):
+        """Return the type, row index and column index of an edge of the grid.
 
-    def _reroute_if_final_edge(self, veh_id):
-        """Checks if an edge is the final edge. If it is return the route it
-        should start off at."""
-        edge = self.k.vehicle.get_edge(veh_id)
-        if edge == "":
-            return
-        if edge[0] == ":":  # center edge
-            return
-        pattern = re.compile(r"[a-zA-Z]+")
-        edge_type = pattern.match(edge).group()
-        edge = edge.split(edge_type)[1].split('_')
-        row_index, col_index = [int(x) for x in edge]
+        Parameters
+        ----------
+        edge : str
+            name of the edge, e.g. "bot0_1"
+
+        Returns
+        -------
+        str
+            type of the edge: "bot", "top", "left" or "right"
+        int
+            row index of the edge
+        int
+            column index of the edge
+        """
+        edge_type, row_index, col_index = EDGE_PATTERN.match(edge).groups()
+        return edge_type, int(row_index), int(col_index)
+
+    def _final_edge_route(self, edge):
+        """Return the route vehicles at the end of an edge are placed back on.
+
+        Parameters
+        ----------
+        edge : str
+            name of the edge
+
+        Returns
+        -------
+        str or None
+            the route (i.e. first edge) vehicles on the edge should start off
+            at once they reach the end of the network, None if the edge is not
+            a final edge of the network
+        """
+        if edge == "" or edge[0] == ":":  # center edge
+            return None
+        edge_type, row_index, col_index = self._parse_edge(edge)
 
         # find the route that we're going to place the vehicle on if we are
         # going to remove it
@@ -360,6 +417,68 @@ class TrafficLightGridEnv(Env):
             route_id = "left{}_{}".format(self.rows, col_index)
         elif edge_type == 'right' and row_index == self.rows:
             route_id = "right0_{}".format(col_index)
+        return route_id
+
+    def _add_edges(self, edges):
+        """Compute the metadata of edges and add it to the edge arrays."""
+        codes, lengths, pos_coeffs = [], [], []
+        for edge in edges:
+            self._edge_rows[edge] = len(self._edge_rows)
+            codes.append(self._split_edge(edge))
+            # FIXME this might not be the best way of handling this
+            if edge == "":
+                lengths.append(-10)
+                pos_coeffs.append(0)
+            elif 'center' in edge:
+                lengths.append(0)
+                pos_coeffs.append(0)
+            else:
+                lengths.append(self.k.scenario.edge_length(edge))
+                pos_coeffs.append(1)
+            self._edge_route.append(self._final_edge_route(edge))
+
+        self._edge_code = np.append(self._edge_code, codes).astype(int)
+        self._edge_length = np.append(self._edge_length, lengths)
+        self._edge_pos_coeff = np.append(self._edge_pos_coeff, pos_coeffs)
+        self._edge_is_final = np.array(
+            [route is not None for route in self._edge_route], dtype=bool)
+
+    def _get_edge_rows(self, edges):
+        """Return the rows of edges in the edge metadata.
+
+        The metadata of edges that were not encountered yet is computed and
+        added to the edge arrays.
+
+        Parameters
+        ----------
+        edges : list of str
+            names of the edges
+
+        Returns
+        -------
+        np.ndarray of int
+            row of every edge
+        """
+        try:
+            return np.array([self._edge_rows[edge] for edge in edges],
+                            dtype=int)
+        except KeyError:
+            self._add_edges(sorted(set(edges) - set(self._edge_rows)))
+            return self._get_edge_rows(edges)
+
+    def additional_command(self):
+        """Used to insert vehicles that are on the exit edge and place them
+        back on their entrance edge."""
+        ids = self.k.vehicle.get_ids()
+        rows = self._get_edge_rows(self.k.vehicle.get_edge(ids))
+        for i in np.flatnonzero(self._edge_is_final[rows]):
+            self._reroute_if_final_edge(ids[i])
+
+    def _reroute_if_final_edge(self, veh_id):
+        """Checks if an edge is the final edge. If it is return the route it
+        should start off at."""
+        row = self._get_edge_rows([self.k.vehicle.get_edge(veh_id)])[0]
+        route_id = self._edge_route[row]
 
         if route_id is not None:
             type_id = self.k.vehicle.get_type(veh_id)
@@ -383,26 +502,104 @@ class TrafficLightGridEnv(Env):
         """
         if k < 0:
             raise IndexError("k must be greater than 0")
+        if not isinstance(edges, list):
+            edges = [edges]
+
         dists = []
+        for edge in edges:
+            dists += self._k_closest(edge, k)[0].tolist()
+        return dists
 
-        def sort_lambda(veh_id):
-            return self.get_distance_to_intersection(veh_id)
+    def _k_closest(self, edge, k):
+        """Return the k closest vehicles to the intersection of an edge.
 
-        if isinstance(edges, list):
-            for edge in edges:
-                vehicles = self.k.vehicle.get_ids_by_edge(edge)
-                dist = sorted(
-                    vehicles,
-                    key=sort_lambda
-                )
-                dists += dist[:k]
+        Parameters
+        ----------
+        edge : str
+            name of the edge
+        k : int
+            maximum number of vehicles
+
+        Returns
+        -------
+        np.ndarray of str
+            names of the vehicles, sorted by distance to the intersection.
+            Vehicles at the same distance are sorted lane by lane, and from
+            the back to the front of each lane.
+        np.ndarray of float
+            distance of these vehicles to the intersection
+        """
+        # vehicles of the edge in the order of get_ids_by_edge, i.e. lane by
+        # lane and from the back to the front of each lane
+        occupancy = [self.k.vehicle.get_lane_occupancy(edge, lane)
+                     for lane in range(self.k.scenario.num_lanes(edge))]
+        if len(occupancy) == 0:
+            return np.zeros(0, dtype=object), np.zeros(0)
+        vehicles = np.concatenate([ids for ids, _ in occupancy])
+        dist = self._intersection_dist(
+            np.full(len(vehicles), self._get_edge_rows([edge])[0]),
+            np.concatenate([pos for _, pos in occupancy]))
+
+        # only the vehicles at most as far as the k-th closest one are sorted
+        if 0 < k < len(vehicles):
+            kth = dist[np.argpartition(dist, k - 1)[k - 1]]
+            closest = np.flatnonzero(dist <= kth)
         else:
-            vehicles = self.k.vehicle.get_ids_by_edge(edges)
-            dist = sorted(
-                vehicles,
-                key=lambda veh_id: self.get_distance_to_intersection(veh_id))
-            dists += dist[:k]
-        return dists
+            closest = np.arange(len(vehicles))
+        closest = closest[np.argsort(dist[closest], kind='stable')][:k]
+        return vehicles[closest], dist[closest]
+
+    def _k_closest_by_edge(self, edges, k):
+        """Return the k closest vehicles to the intersection of every edge.
+
+        This is equivalent to calling _k_closest on every edge, but selects
+        the vehicles of all edges at once.
+
+        Parameters
+        ----------
+        edges : list of str
+            names of the edges
+        k : int
+            maximum number of vehicles per edge
+
+        Returns
+        -------
+        np.ndarray of str
+            names of the vehicles, edge by edge, and sorted by distance to the
+            intersection on each edge
+        np.ndarray of float
+            distance of these vehicles to the intersection
+        np.ndarray of int
+            index of the edge of these vehicles in edges
+        np.ndarray of int
+            rank of these vehicles on their edge, starting at 0 for the
+            closest vehicle
+        """
+        veh_ids = self.k.vehicle.get_ids()
+        ids = np.empty(len(veh_ids), dtype=object)
+        ids[:] = veh_ids
+        rows = self._get_edge_rows(self.k.vehicle.get_edge(veh_ids))
+        dist = self._intersection_dist(
+            rows, self.k.vehicle.get_position(veh_ids))
+
+        # index of the edge of every vehicle in edges (-1 if not in edges)
+        edge_rows = self._get_edge_rows(edges)
+        edge_index = np.full(len(self._edge_rows), -1, dtype=int)
+        edge_index[edge_rows] = np.arange(len(edges))
+        edge_index = edge_index[rows]
+        keep = np.flatnonzero(edge_index >= 0)
+
+        # sort the vehicles by edge and distance to the intersection, with
+        # ties broken as in _k_closest
+        lanes = np.asarray(self.k.vehicle.get_lane(ids[keep].tolist()))
+        order = keep[np.lexsort((lanes, dist[keep], edge_index[keep]))]
+        edge_index = edge_index[order]
+        edge_start = np.searchsorted(edge_index, np.arange(len(edges)))
+        rank = np.arange(len(order)) - edge_start[edge_index]
+        closest = rank < k
+
+        order = order[closest]
+        return ids[order], dist[order], edge_index[closest], rank[closest]
 
 
 class PO_TrafficLightGridEnv(TrafficLightGridEnv):
@@ -442,6 +639,9 @@ class PO_TrafficLightGridEnv(TrafficLightGridEnv):
 
     """
 
+    snapshot_attributes = TrafficLightGridEnv.snapshot_attributes + (
+        'observed_ids',)
+
     def __init__(self, env_params, sim_params, scenario, simulator='traci'):
         super().__init__(env_params, sim_params, scenario, simulator)
 
@@ -480,65 +680,50 @@ class PO_TrafficLightGridEnv(TrafficLightGridEnv):
         light and for each vehicle its velocity, distance to intersection,
         edge_number traffic light state. This is partially observed
         """
-        speeds = []
-        dist_to_intersec = []
-        edge_number = []
         max_speed = max(
             self.k.scenario.speed_limit(edge)
             for edge in self.k.scenario.get_edge_list())
         grid_array = self.net_params.additional_params["grid_array"]
         max_dist = max(grid_array["short_length"], grid_array["long_length"],
                        grid_array["inner_length"])
-        all_observed_ids = []
-
-        for node, edges in self.scenario.get_node_mapping():
-            for edge in edges:
-                observed_ids = \
-                    self.k_closest_to_intersection(edge, self.num_observed)
-                all_observed_ids += observed_ids
-
-                # check which edges we have so we can always pad in the right
-                # positions
-                speeds += [
-                    self.k.vehicle.get_speed(veh_id) / max_speed
-                    for veh_id in observed_ids
-                ]
-                dist_to_intersec += [
-                    (self.k.scenario.edge_length(
-                        self.k.vehicle.get_edge(veh_id))
-                     - self.k.vehicle.get_position(veh_id)) / max_dist
-                    for veh_id in observed_ids
-                ]
-                edge_number += \
-                    [self._convert_edge(self.k.vehicle.get_edge(veh_id))
-                     / (self.k.scenario.network.num_edges - 1)
-                     for veh_id in observed_ids]
-
-                if len(observed_ids) < self.num_observed:
-                    diff = self.num_observed - len(observed_ids)
-                    speeds += [0] * diff
-                    dist_to_intersec += [0] * diff
-                    edge_number += [0] * diff
+
+        # the observed vehicles of every edge heading toward a node, padded
+        # with zeros up to num_observed
+        observed_edges = [edge for _, edges in self.scenario.get_node_mapping()
+                          for edge in edges]
+        speeds = np.zeros((len(observed_edges), self.num_observed))
+        dist_to_intersec = np.zeros((len(observed_edges), self.num_observed))
+        edge_number = np.zeros((len(observed_edges), self.num_observed))
+        observed_ids, dist, edge_index, rank = \
+            self._k_closest_by_edge(observed_edges, self.num_observed)
+        all_observed_ids = observed_ids.tolist()
+        edge_rows = self._get_edge_rows(observed_edges)
+
+        speeds[edge_index, rank] = self.k.vehicle.get_speed(all_observed_ids)
+        dist_to_intersec[edge_index, rank] = dist
+        edge_number[edge_index, rank] = self._edge_code[edge_rows][edge_index]
+
+        speeds /= max_speed
+        dist_to_intersec /= max_dist
+        edge_number /= self.k.scenario.network.num_edges - 1
 
         # now add in the density and average velocity on the edges
-        density = []
-        velocity_avg = []
-        for edge in self.k.scenario.get_edge_list():
-            ids = self.k.vehicle.get_ids_by_edge(edge)
-            if len(ids) > 0:
-                density += [5 * len(ids) / self.k.scenario.edge_length(edge)]
-                velocity_avg += [
-                    np.mean(
-                        [self.k.vehicle.get_speed(veh_id)
-                         for veh_id in ids]) / max_speed
-                ]
-            else:
-                density += [0]
-                velocity_avg += [0]
+        edge_list = self.k.scenario.get_edge_list()
+        num_veh, tot_speed = self.k.vehicle.get_edge_aggregates(edge_list)
+        edge_rows = self._get_edge_rows(edge_list)
+        occupied = num_veh > 0
+        density = np.zeros(len(edge_list))
+        velocity_avg = np.zeros(len(edge_list))
+        density[occupied] = \
+            5 * num_veh[occupied] / self._edge_length[edge_rows[occupied]]
+        velocity_avg[occupied] = \
+            tot_speed[occupied] / num_veh[occupied] / max_speed
+
         self.observed_ids = all_observed_ids
         return np.array(
             np.concatenate([
-                speeds, dist_to_intersec, edge_number, density, velocity_avg,
+                speeds.flatten(), dist_to_intersec.flatten(),
+                edge_number.flatten(), density, velocity_avg,
                 self.last_change.flatten().tolist(),
                 self.direction.flatten().tolist(),
                 self.currently_yellow.flatten().tolist()
@@ -5,6 +5,7 @@ from flow.envs.base_env import Env
 
 from gym.spaces.box import Box
 
+from itertools import compress, repeat
 import numpy as np
 
 ADDITIONAL_ENV_PARAMS = {
@@ -67,6 +68,14 @@ class AccelEnv(Env):
         self.prev_pos = dict()
         self.absolute_position = dict()
 
+        # sorted vehicle ids, the ids and absolute positions they were sorted
+        # from, and the indices of the sorted vehicles in these ids
+        self._abs_version = 0
+        self._sorted_version = -1
+        self._sorted_from = None
+        self._sorted_order = None
+        self._sorted_ids = None
+
         super().__init__(env_params, sim_params, scenario, simulator)
 
     @property
@@ -90,10 +99,9 @@ class AccelEnv(Env):
 
     def _apply_rl_actions(self, rl_actions):
         """See class definition."""
+        rl_ids = set(self.k.vehicle.get_rl_ids())
         sorted_rl_ids = [
-            veh_id for veh_id in self.sorted_ids
-            if veh_id in self.k.vehicle.get_rl_ids()
-        ]
+            veh_id for veh_id in self.sorted_ids if veh_id in rl_ids]
         self.k.vehicle.apply_acceleration(sorted_rl_ids, rl_actions)
 
     def compute_reward(self, rl_actions, **kwargs):
@@ -105,12 +113,12 @@ class AccelEnv(Env):
 
     def get_state(self):
         """See class definition."""
-        speed = [self.k.vehicle.get_speed(veh_id) / self.k.scenario.max_speed()
-                 for veh_id in self.sorted_ids]
-        pos = [self.k.vehicle.get_x_by_id(veh_id) / self.k.scenario.length()
-               for veh_id in self.sorted_ids]
+        sorted_ids = self.sorted_ids
+        speed = np.asarray(self.k.vehicle.get_speed(sorted_ids), dtype=float)
+        pos = self.k.vehicle.get_x_by_id(sorted_ids)
 
-        return np.array(speed + pos)
+        return np.concatenate((speed / self.k.scenario.max_speed(),
+                               pos / self.k.scenario.length()))
 
     def additional_command(self):
         """See parent class.
@@ -123,19 +131,26 @@ class AccelEnv(Env):
             for veh_id in self.k.vehicle.get_human_ids():
                 self.k.vehicle.set_observed(veh_id)
 
-        # update the "absolute_position" variable
-        for veh_id in self.k.vehicle.get_ids():
-            this_pos = self.k.vehicle.get_x_by_id(veh_id)
-
-            if this_pos == -1001:
-                # in case the vehicle isn't in the network
-                self.absolute_position[veh_id] = -1001
-            else:
-                change = this_pos - self.prev_pos.get(veh_id, this_pos)
-                self.absolute_position[veh_id] = \
-                    (self.absolute_position.get(veh_id, this_pos) + change) \
-                    % self.k.scenario.length()
-                self.prev_pos[veh_id] = this_pos
+        # update the "absolute_position" variable. Vehicles that aren't in
+        # the network have a position of -1001.
+        veh_ids = self.k.vehicle.get_ids()
+        this_pos = np.asarray(self.k.vehicle.get_x_by_id(veh_ids), dtype=float)
+        default = this_pos.tolist()
+        prev_pos = np.fromiter(map(self.prev_pos.get, veh_ids, default),
+                               dtype=float, count=len(veh_ids))
+        abs_pos = np.fromiter(
+            map(self.absolute_position.get, veh_ids, default),
+            dtype=float, count=len(veh_ids))
+        in_network = this_pos != -1001
+        abs_pos = np.where(
+            in_network,
+            np.mod(abs_pos + (this_pos - prev_pos), self.k.scenario.length()),
+            -1001)
+
+        self.absolute_position.update(zip(veh_ids, abs_pos.tolist()))
+        self.prev_pos.update(zip(compress(veh_ids, in_network),
+                                 this_pos[in_network].tolist()))
+        self._abs_version += 1
 
     @property
     def sorted_ids(self):
@@ -143,16 +158,68 @@ class AccelEnv(Env):
 
         This environment does this by sorting vehicles by their absolute
         position, defined as their initial position plus distance traveled.
+        The order is only updated once the absolute positions or the vehicles
+        in the network change, starting from the previous order.
 
         Returns
         -------
         list of str
-            a list of all vehicle IDs sorted by position
+            a list of all vehicle IDs sorted by position. The same list is
+            returned until the order changes, and should not be modified.
+        """
+        veh_ids = self.k.vehicle.get_ids()
+        if not self.env_params.additional_params['sort_vehicles']:
+            return veh_ids
+
+        same_ids = veh_ids is self._sorted_from or veh_ids == self._sorted_from
+        if not same_ids or self._sorted_version != self._abs_version:
+            self._update_sorted_ids(veh_ids, same_ids)
+        return self._sorted_ids
+
+    def _update_sorted_ids(self, veh_ids, same_ids):
+        """Sort the vehicle ids by absolute position, from the last order.
+
+        On a ring, the order of vehicles only changes when they overtake one
+        another or enter and leave the network, so the previous order usually
+        remains sorted, and is otherwise nearly sorted.
+
+        Parameters
+        ----------
+        veh_ids : list of str
+            ids of the vehicles in the network
+        same_ids : bool
+            whether these are the ids that were last sorted
         """
-        if self.env_params.additional_params['sort_vehicles']:
-            return sorted(self.k.vehicle.get_ids(), key=self._get_abs_position)
+        num_vehicles = len(veh_ids)
+        if same_ids:
+            order = self._sorted_order
         else:
-            return self.k.vehicle.get_ids()
+            # previous order of the vehicles still in the network, followed by
+            # the vehicles that entered it
+            index = dict(zip(veh_ids, range(num_vehicles)))
+            order = np.fromiter(
+                map(index.get, self._sorted_ids or [], repeat(-1)),
+                dtype=int)
+            order = order[order >= 0]
+            is_new = np.ones(num_vehicles, dtype=bool)
+            is_new[order] = False
+            order = np.concatenate((order, np.flatnonzero(is_new)))
+
+        # vehicles with equal positions are ordered as in veh_ids
+        abs_pos = np.fromiter(
+            map(self.absolute_position.get, veh_ids, repeat(-1001)),
+            dtype=float, count=num_vehicles)[order]
+        in_order = np.all((abs_pos[:-1] < abs_pos[1:]) | (
+            (abs_pos[:-1] == abs_pos[1:]) & (order[:-1] < order[1:])))
+
+        if not in_order:
+            order = order[np.lexsort((order, abs_pos))]
+        if not (same_ids and in_order):
+            self._sorted_ids = [veh_ids[i] for i in order.tolist()]
+
+        self._sorted_order = order
+        self._sorted_from = veh_ids
+        self._sorted_version = self._abs_version
 
     def _get_abs_position(self, veh_id):
         """Return the absolute position of a vehicle."""
@@ -166,8 +233,10 @@ class AccelEnv(Env):
         """
         obs = super().reset()
 
-        for veh_id in self.k.vehicle.get_ids():
-            self.absolute_position[veh_id] = self.k.vehicle.get_x_by_id(veh_id)
-            self.prev_pos[veh_id] = self.k.vehicle.get_x_by_id(veh_id)
+        veh_ids = self.k.vehicle.get_ids()
+        pos = self.k.vehicle.get_x_by_id(veh_ids).tolist()
+        self.absolute_position.update(zip(veh_ids, pos))
+        self.prev_pos.update(zip(veh_ids, pos))
+        self._abs_version += 1
 
         return obs
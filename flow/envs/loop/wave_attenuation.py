@@ -77,6 +77,10 @@ class WaveAttenuationEnv(Env):
         vehicles collide into one another.
     """
 
+    # the observations include the speed and headway of the rl vehicle's leader
+    required_vehicle_variables = ('leader',)
+    required_traffic_light_variables = ()
+
     def __init__(self, env_params, sim_params, scenario, simulator='traci'):
         for p in ADDITIONAL_ENV_PARAMS.keys():
             if p not in env_params.additional_params:
@@ -139,12 +143,12 @@ class WaveAttenuationEnv(Env):
 
     def get_state(self):
         """See class definition."""
-        speed = [self.k.vehicle.get_speed(veh_id) / self.k.scenario.max_speed()
-                 for veh_id in self.k.vehicle.get_ids()]
-        pos = [self.k.vehicle.get_x_by_id(veh_id) / self.k.scenario.length()
-               for veh_id in self.k.vehicle.get_ids()]
+        veh_ids = self.k.vehicle.get_ids()
+        speed = np.asarray(self.k.vehicle.get_speed(veh_ids), dtype=float)
+        pos = self.k.vehicle.get_x_by_id(veh_ids)
 
-        return np.array(speed + pos)
+        return np.concatenate((speed / self.k.scenario.max_speed(),
+                               pos / self.k.scenario.length()))
 
     def additional_command(self):
         """Define which vehicles are observed for visualization purposes."""
@@ -70,6 +70,15 @@ class WaveAttenuationMergePOEnv(Env):
         vehicles collide into one another.
     """
 
+    # the observations include the speeds and headways of the leaders and
+    # followers of rl vehicles
+    required_vehicle_variables = ('leader', 'follower')
+    required_traffic_light_variables = ()
+
+    # the rl vehicles that are controlled change during a rollout
+    snapshot_attributes = Env.snapshot_attributes + (
+        'rl_queue', 'rl_veh', 'leader', 'follower')
+
     def __init__(self, env_params, sim_params, scenario, simulator='traci'):
         for p in ADDITIONAL_ENV_PARAMS.keys():
             if p not in env_params.additional_params:
@@ -119,10 +128,16 @@ class WaveAttenuationMergePOEnv(Env):
         max_speed = self.k.scenario.max_speed()
         max_length = self.k.scenario.length()
 
+        # absolute positions of the rl vehicles and their leaders
+        lead_ids = [self.k.vehicle.get_leader(rl_id) for rl_id in self.rl_veh]
+        x_ids = list(self.rl_veh) + [
+            lead_id for lead_id in lead_ids if lead_id not in ["", None]]
+        x = dict(zip(x_ids, self.k.vehicle.get_x_by_id(x_ids).tolist()))
+
         observation = [0 for _ in range(5 * self.num_rl)]
         for i, rl_id in enumerate(self.rl_veh):
             this_speed = self.k.vehicle.get_speed(rl_id)
-            lead_id = self.k.vehicle.get_leader(rl_id)
+            lead_id = lead_ids[i]
             follower = self.k.vehicle.get_follower(rl_id)
 
             if lead_id in ["", None]:
@@ -132,8 +147,7 @@ class WaveAttenuationMergePOEnv(Env):
             else:
                 self.leader.append(lead_id)
                 lead_speed = self.k.vehicle.get_speed(lead_id)
-                lead_head = self.k.vehicle.get_x_by_id(lead_id) \
-                    - self.k.vehicle.get_x_by_id(rl_id) \
+                lead_head = x[lead_id] - x[rl_id] \
                     - self.k.vehicle.get_length(rl_id)
 
             if follower in ["", None]:
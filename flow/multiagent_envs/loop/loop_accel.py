@@ -14,10 +14,9 @@ class MultiAgentAccelEnv(AccelEnv, MultiEnv):
     """
     def _apply_rl_actions(self, rl_actions):
         """See class definition."""
+        rl_ids = set(self.k.vehicle.get_rl_ids())
         sorted_rl_ids = [
-            veh_id for veh_id in self.sorted_ids
-            if veh_id in self.k.vehicle.get_rl_ids()
-        ]
+            veh_id for veh_id in self.sorted_ids if veh_id in rl_ids]
         av_action = rl_actions['av']
         adv_action = rl_actions['adversary']
         perturb_weight = self.env_params.additional_params['perturb_weight']
@@ -46,6 +46,11 @@ class MultiWaveAttenuationPOEnv(MultiEnv):
 
     """
 
+    # the observations include the speed and headway of the leaders of rl
+    # vehicles
+    required_vehicle_variables = ('leader',)
+    required_traffic_light_variables = ()
+
     @property
     def observation_space(self):
         """See class definition."""
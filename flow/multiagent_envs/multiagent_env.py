@@ -51,14 +51,11 @@ class MultiEnv(MultiAgentEnv, Env):
             self.step_counter += 1
 
             # perform acceleration actions for controlled human-driven vehicles
-            if len(self.k.vehicle.get_controlled_ids()) > 0:
-                accel = []
-                for veh_id in self.k.vehicle.get_controlled_ids():
-                    accel_contr = self.k.vehicle.get_acc_controller(veh_id)
-                    action = accel_contr.get_action(self)
-                    accel.append(action)
-                self.k.vehicle.apply_acceleration(
-                    self.k.vehicle.get_controlled_ids(), accel)
+            controlled_ids = self.k.vehicle.get_controlled_ids()
+            if len(controlled_ids) > 0:
+                # actions of None are stored as NaN, and are not applied
+                accel = self.get_controller_actions(controlled_ids)
+                self.k.vehicle.apply_acceleration(controlled_ids, accel)
 
             # perform lane change actions for controlled human-driven vehicles
             if len(self.k.vehicle.get_controlled_lc_ids()) > 0:
@@ -71,15 +68,13 @@ class MultiEnv(MultiAgentEnv, Env):
                     self.k.vehicle.get_controlled_lc_ids(),
                     direction=direction)
 
-            # perform (optionally) routing actions for all vehicle in the
-            # network, including rl and sumo-controlled vehicles
-            routing_ids = []
-            routing_actions = []
-            for veh_id in self.k.vehicle.get_ids():
-                if self.k.vehicle.get_routing_controller(veh_id) is not None:
-                    routing_ids.append(veh_id)
-                    route_contr = self.k.vehicle.get_routing_controller(veh_id)
-                    routing_actions.append(route_contr.choose_route(self))
+            # perform (optionally) routing actions for all vehicles in the
+            # network, including RL and SUMO-controlled vehicles. Event-driven
+            # routers are only called when their vehicle enters a new edge
+            routing_ids = self.k.vehicle.get_routing_ids()
+            routing_actions = [
+                self.k.vehicle.get_routing_controller(veh_id).choose_route(
+                    self) for veh_id in routing_ids]
             self.k.vehicle.choose_routes(routing_ids, routing_actions)
 
             self.apply_rl_actions(rl_actions)
@@ -131,6 +126,10 @@ class MultiEnv(MultiAgentEnv, Env):
         If "shuffle" is set to True in InitialConfig, the initial positions of
         vehicles is recalculated and the vehicles are shuffled.
 
+        If snapshots are used (see SumoParams.num_snapshots), the state of the
+        network at the end of the warmup steps of an earlier rollout may be
+        restored instead.
+
         Returns
         -------
         observation : dict of array_like
@@ -159,7 +158,11 @@ class MultiEnv(MultiAgentEnv, Env):
                 (self.step_counter > 2e6 and self.simulator != 'aimsun'):
             self.step_counter = 0
             # issue a random seed to induce randomness into the next rollout
-            self.sim_params.seed = random.randint(0, 1e5)
+            # (chosen in advance if the instance was prepared)
+            if self._next_seed is not None:
+                self.sim_params.seed = self._next_seed
+            else:
+                self.sim_params.seed = random.randint(0, 1e5)
 
             self.k.vehicle = deepcopy(self.initial_vehicles)
             self.k.vehicle.master_kernel = self.k
@@ -170,25 +173,27 @@ class MultiEnv(MultiAgentEnv, Env):
         elif self.initial_config.shuffle:
             self.setup_initial_state()
 
-        # clear all vehicles from the network and the vehicles class
-        if self.simulator == 'traci':
-            for veh_id in self.k.kernel_api.vehicle.getIDList():  # FIXME: hack
-                try:
-                    self.k.vehicle.remove(veh_id)
-                except (FatalTraCIError, TraCIException):
-                    pass
+        # restore a snapshot of the simulation at the end of the warmup steps
+        # of an earlier rollout, if available
+        snapshot = self._choose_snapshot()
+        if snapshot is not None:
+            observation = self._restore_snapshot(snapshot)
+            self.render(reset=True)
+            return observation
 
         # clear all vehicles from the network and the vehicles class
-        # FIXME (ev, ak) this is weird and shouldn't be necessary
-        for veh_id in list(self.k.vehicle.get_ids()):
-            # do not try to remove the vehicles from the network in the first
-            # step after initializing the network, as there will be no vehicles
-            if self.step_counter == 0:
-                continue
-            try:
-                self.k.vehicle.remove(veh_id)
-            except (FatalTraCIError, TraCIException):
-                print("Error during start: {}".format(traceback.format_exc()))
+        try:
+            if self.step_counter != 0:
+                self.k.vehicle.clear()
+            elif self.simulator in ['traci', 'libsumo']:
+                # do not try to remove the vehicles of the vehicles class in
+                # the first step after initializing the network, as there
+                # will be no vehicles
+                # FIXME (ev, ak) this is weird and shouldn't be necessary
+                self.k.vehicle.remove_many(
+                    self.k.kernel_api.vehicle.getIDList())  # FIXME: hack
+        except (FatalTraCIError, TraCIException):
+            print("Error during start: {}".format(traceback.format_exc()))
 
         # reintroduce the initial vehicles to the network
         for veh_id in self.initial_ids:
@@ -207,7 +212,7 @@ class MultiEnv(MultiAgentEnv, Env):
                 # if a vehicle was not removed in the first attempt, remove it
                 # now and then reintroduce it
                 self.k.vehicle.remove(veh_id)
-                if self.simulator == 'traci':
+                if self.simulator in ['traci', 'libsumo']:
                     self.k.kernel_api.vehicle.remove(veh_id)  # FIXME: hack
                 self.k.vehicle.add(
                     veh_id=veh_id,
@@ -244,7 +249,12 @@ class MultiEnv(MultiAgentEnv, Env):
         # render a frame
         self.render(reset=True)
 
-        return self.get_state()
+        observation = self.get_state()
+
+        # store a snapshot of the simulation, if requested
+        self._save_snapshot(observation)
+
+        return observation
 
     def clip_actions(self, rl_actions=None):
         """Clip the actions passed from the RL agent
@@ -384,10 +384,11 @@ def _get_abs_pos(edge, rel_pos, edgestarts):
     list of float
         the absolute positive for every sample
     """
-    ret = []
-    for edge_i, pos_i in zip(edge, rel_pos):
-        ret.append(pos_i + edgestarts[edge_i])
-    return ret
+    # starting position of every distinct edge, looked up once
+    names, index = np.unique(np.asarray(edge, dtype=str), return_inverse=True)
+    starts = np.array([edgestarts[name] for name in names.tolist()],
+                      dtype=float)
+    return (np.asarray(rel_pos, dtype=float) + starts[index]).tolist()
 
 
 if __name__ == '__main__':
@@ -9,7 +9,7 @@ from flow.controllers.routing_controllers import ContinuousRouter
 from flow.controllers.car_following_models import IDMController, \
     OVMController, BCMController, LinearOVM, CFMController
 from flow.controllers import FollowerStopper, PISaturation
-from tests.setup_scripts import ring_road_exp_setup
+from tests.setup_scripts import ring_road_exp_setup, highway_exp_setup
 import os
 import numpy as np
 
@@ -582,5 +582,86 @@ class TestPISaturation(unittest.TestCase):
         np.testing.assert_array_almost_equal(requested_accel, expected_accel)
 
 
+class UnsharedIDMController(IDMController):
+    """IDM controller with one instance per vehicle."""
+
+    stateless = False
+
+
+class TestBatchedControllers(unittest.TestCase):
+    """
+    Tests that the batched accelerations of stateless controllers match the
+    accelerations of the per-vehicle controllers, including the noise and
+    failsafes.
+    """
+
+    def setUp(self):
+        self.env = None
+
+    def tearDown(self):
+        # terminate the traci instance
+        if self.env is not None:
+            self.env.terminate()
+
+        # free data used by the class
+        self.env = None
+
+    def compare_actions(self, controller, params):
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="test",
+            acceleration_controller=(controller, params),
+            routing_controller=(ContinuousRouter, {}),
+            car_following_params=SumoCarFollowingParams(accel=3, decel=5),
+            num_vehicles=8)
+        # vehicles whose controllers are not shared
+        vehicles.add(
+            veh_id="unshared",
+            acceleration_controller=(UnsharedIDMController, {}),
+            routing_controller=(ContinuousRouter, {}),
+            num_vehicles=2)
+
+        # the vehicle at the front of the highway has no leader
+        self.env, _ = highway_exp_setup(vehicles=vehicles)
+        self.env.reset()
+        ids = self.env.k.vehicle.get_ids()
+
+        # cover the different regimes of the models
+        test_headways = np.linspace(0, 45, len(ids))
+        test_speeds = np.linspace(10, 0, len(ids))
+        for i, veh_id in enumerate(ids):
+            self.env.k.vehicle.set_headway(veh_id, test_headways[i])
+            self.env.k.vehicle.test_set_speed(veh_id, test_speeds[i])
+
+        # vehicles in junctions are controlled by sumo
+        self.env.k.vehicle.test_set_edge("test_3", ":junction")
+
+        np.random.seed(0)
+        expected_accel = np.array([
+            self.env.k.vehicle.get_acc_controller(veh_id).get_action(self.env)
+            for veh_id in ids
+        ], dtype=float)
+
+        np.random.seed(0)
+        requested_accel = self.env.get_controller_actions(ids)
+
+        self.assertTrue(np.isnan(
+            requested_accel[ids.index("test_3")]))
+        np.testing.assert_array_almost_equal(requested_accel, expected_accel)
+
+    def test_models(self):
+        for controller in [IDMController, OVMController, BCMController,
+                           LinearOVM, CFMController]:
+            for fail_safe in [None, "instantaneous", "safe_velocity"]:
+                with self.subTest(controller=controller, fail_safe=fail_safe):
+                    self.compare_actions(
+                        controller, {"fail_safe": fail_safe, "noise": 0.2})
+                    self.tearDown()
+
+    def test_default_batching(self):
+        # controllers without a batched model call get_accel for every vehicle
+        self.compare_actions(FollowerStopper, {"v_des": 5})
+
+
 if __name__ == '__main__':
     unittest.main()
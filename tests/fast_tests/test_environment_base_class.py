@@ -1,17 +1,21 @@
 import unittest
+from copy import deepcopy
 
 from flow.core.params import SumoParams, EnvParams, InitialConfig, \
     NetParams, SumoCarFollowingParams, SumoLaneChangeParams
 from flow.core.params import VehicleParams
 
-from flow.controllers.routing_controllers import ContinuousRouter
+from flow.controllers.routing_controllers import ContinuousRouter, \
+    GridRouter
 from flow.controllers.car_following_models import IDMController
 from flow.controllers import RLController
 from flow.envs.loop.loop_accel import ADDITIONAL_ENV_PARAMS
 from flow.utils.exceptions import FatalFlowError
-from flow.envs import Env, TestEnv
+from flow.envs import Env, TestEnv, TrafficLightGridEnv
+from flow.core.kernel.simulation.traci import SUMO_POOL
 
-from tests.setup_scripts import ring_road_exp_setup, highway_exp_setup
+from tests.setup_scripts import ring_road_exp_setup, highway_exp_setup, \
+    grid_mxn_exp_setup
 import os
 import numpy as np
 
@@ -251,6 +255,36 @@ class TestApplyingActionsWithSumo(unittest.TestCase):
 
         np.testing.assert_array_almost_equal(lane2, expected_lane2, 1)
 
+    def test_command_buffer(self):
+        """
+        Tests that actuation commands are buffered until the next simulation
+        step, and that repeated commands for a vehicle are coalesced.
+        """
+        self.env.reset()
+        ids = self.env.k.vehicle.get_ids()
+        stats0 = self.env.k.vehicle.get_command_stats()
+        vel0 = np.array(self.env.k.vehicle.get_speed(ids))
+
+        # only the last acceleration requested for a vehicle is applied, and
+        # NaN values are ignored
+        self.env.k.vehicle.apply_acceleration(ids, np.array([5] * 5))
+        accel = np.array([0, 1, 4, np.nan, np.nan])
+        self.env.k.vehicle.apply_acceleration(ids, accel)
+
+        stats1 = self.env.k.vehicle.get_command_stats()
+        self.assertEqual(stats1["sent"], stats0["sent"])
+        self.assertEqual(stats1["coalesced"], stats0["coalesced"] + 3)
+
+        self.env.k.simulation.simulation_step()
+        self.env.k.vehicle.update(False)
+
+        stats2 = self.env.k.vehicle.get_command_stats()
+        self.assertEqual(stats2["sent"], stats0["sent"] + 5)
+
+        vel1 = np.array(self.env.k.vehicle.get_speed(ids))
+        np.testing.assert_array_almost_equal(
+            vel1[:3], vel0[:3] + accel[:3] * 0.1, 1)
+
 
 class TestWarmUpSteps(unittest.TestCase):
     """Ensures that the appropriate number of warmup steps are run when using
@@ -276,6 +310,215 @@ class TestWarmUpSteps(unittest.TestCase):
         self.assertEqual(t2 - t1, warmup_step)
 
 
+class TestSnapshots(unittest.TestCase):
+    """Tests resets that restore snapshots of the simulation taken at the end
+    of the warmup steps, when using flow.core.params.SumoParams.num_snapshots
+    """
+
+    def setUp(self):
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="idm",
+            acceleration_controller=(IDMController, {}),
+            routing_controller=(ContinuousRouter, {}),
+            car_following_params=SumoCarFollowingParams(
+                speed_mode="aggressive"),
+            num_vehicles=10)
+        vehicles.add(
+            veh_id="rl",
+            acceleration_controller=(RLController, {}),
+            routing_controller=(ContinuousRouter, {}),
+            num_vehicles=1)
+
+        net_params = NetParams(additional_params={
+            "length": 230, "lanes": 2, "speed_limit": 30, "resolution": 40})
+        env_params = EnvParams(
+            warmup_steps=100, additional_params=ADDITIONAL_ENV_PARAMS)
+
+        # a snapshot is taken during the reset performed by the setup script
+        self.env, _ = ring_road_exp_setup(
+            sim_params=SumoParams(sim_step=0.1, num_snapshots=1),
+            vehicles=vehicles,
+            net_params=net_params,
+            env_params=env_params)
+
+    def tearDown(self):
+        # free data used by the class
+        self.env.terminate()
+        self.env = None
+
+    def _run(self):
+        """Perform a few steps and return the state of the vehicles."""
+        vehicles = self.env.k.vehicle
+        out = []
+        for _ in range(50):
+            obs, _, _, _ = self.env.step(rl_actions=[1])
+            ids = sorted(vehicles.get_ids())
+            out.append((obs.tolist(),
+                        vehicles.get_speed(ids).tolist(),
+                        vehicles.get_position(ids).tolist(),
+                        vehicles.get_lane(ids).tolist(),
+                        vehicles.get_leader(ids),
+                        self.env.time_counter))
+        return out
+
+    def test_restore(self):
+        snapshots = self.env._snapshots[self.env._get_snapshot_key()]
+        self.assertEqual(len(snapshots), 1)
+        filename = snapshots[0]["filename"]
+        self.assertTrue(os.path.isfile(filename))
+
+        # restored rollouts continue exactly as the rollout the snapshot was
+        # taken in
+        state = self._run()
+        self.env.reset()
+        self.assertEqual(self.env.time_counter, 100)
+        self.assertListEqual(self._run(), state)
+        self.env.reset()
+        self.assertListEqual(self._run(), state)
+        self.assertEqual(len(snapshots), 1)
+
+        # the files of the snapshots are removed upon termination
+        self.env.terminate()
+        self.assertFalse(os.path.isfile(filename))
+
+
+class TestSnapshotAttributes(unittest.TestCase):
+    """Tests that the attributes of environments that change during a rollout
+    are restored along with snapshots of the simulation
+    """
+
+    @staticmethod
+    def _as_list(state):
+        """Convert a (possibly ragged) state into nested lists."""
+        return [np.asarray(x).tolist() for x in state]
+
+    def test_traffic_light_grid(self):
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="idm",
+            acceleration_controller=(IDMController, {}),
+            routing_controller=(GridRouter, {}),
+            car_following_params=SumoCarFollowingParams(
+                min_gap=2.5, tau=1.1),
+            num_vehicles=16)
+
+        setup_env, scenario = grid_mxn_exp_setup(
+            row_num=1, col_num=3, vehicles=vehicles,
+            sim_params=SumoParams(sim_step=1, num_snapshots=1))
+        setup_env.terminate()
+
+        env = TrafficLightGridEnv(
+            setup_env.env_params, setup_env.sim_params, scenario)
+        obs = env.reset()
+
+        # switch the traffic lights during the rollout
+        for _ in range(10):
+            env.step(np.ones(3))
+        self.assertTrue(env.currently_yellow.all())
+
+        # a reset from the snapshot gives the same first observation as the
+        # cold reset, both as returned and as computed from the restored
+        # environment
+        restored_obs = env.reset()
+        self.assertListEqual(self._as_list(restored_obs), self._as_list(obs))
+        self.assertListEqual(self._as_list(env.get_state()),
+                             self._as_list(obs))
+        self.assertListEqual(
+            [env.k.traffic_light.get_state('center{}'.format(i))
+             for i in range(3)], ["GrGr"] * 3)
+
+        env.terminate()
+
+
+class TestRestartInstance(unittest.TestCase):
+    """Tests resets that restart the simulation instance, which is prepared
+    in the background during the preceding rollout
+    """
+
+    def setUp(self):
+        self.env, _ = ring_road_exp_setup(
+            sim_params=SumoParams(sim_step=0.1, restart_instance=True))
+
+    def tearDown(self):
+        # free data used by the class
+        self.env.terminate()
+        self.env = None
+
+    def test_prepared_instance(self):
+        simulation = self.env.k.simulation
+
+        for _ in range(3):
+            # the instance of the next rollout is launched with the next seed
+            next_seed = self.env._next_seed
+            prepared_call = simulation._prepared_call
+            self.assertIsNotNone(prepared_call)
+            self.assertEqual(
+                prepared_call[prepared_call.index("--seed") + 1],
+                str(next_seed))
+            pending = SUMO_POOL._pending[tuple(prepared_call)]
+            self.assertEqual(len(pending), 1)
+            prepared_proc = pending[0][0]
+
+            self.env.step(None)
+            self.env.reset()
+
+            # the prepared instance is used upon reset
+            self.assertEqual(self.env.sim_params.seed, next_seed)
+            self.assertIs(simulation.sumo_proc, prepared_proc)
+            self.assertEqual(self.env.k.vehicle.num_vehicles,
+                             self.env.scenario.vehicles.num_vehicles)
+
+        # the prepared instance is terminated with the environment
+        prepared_call = simulation._prepared_call
+        prepared_proc = SUMO_POOL._pending[tuple(prepared_call)][0][0]
+        self.env.terminate()
+        self.assertIsNotNone(prepared_proc.poll())
+        self.assertNotIn(tuple(prepared_call), SUMO_POOL._pending)
+
+
+class TestLibsumo(unittest.TestCase):
+    """Tests the "libsumo" simulator, which runs sumo within the process"""
+
+    def setUp(self):
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="idm",
+            acceleration_controller=(IDMController, {"noise": 0}),
+            routing_controller=(ContinuousRouter, {}),
+            num_vehicles=10)
+        self.vehicles = vehicles
+
+    def _run(self, simulator, sim_params=None):
+        """Perform a few steps and return the state of the vehicles."""
+        env, _ = ring_road_exp_setup(
+            sim_params=sim_params, vehicles=self.vehicles,
+            simulator=simulator)
+        out = []
+        for _ in range(2):
+            for _ in range(50):
+                env.step(None)
+            veh_ids = env.k.vehicle.get_ids()
+            out.append((list(env.k.vehicle.get_position(veh_ids)),
+                        list(env.k.vehicle.get_speed(veh_ids))))
+            env.reset()
+        env.terminate()
+        return out
+
+    def test_same_as_traci(self):
+        self.assertEqual(self._run("traci"), self._run("libsumo"))
+
+        # also when the simulation is restarted upon reset
+        sim_params = SumoParams(sim_step=0.1, restart_instance=True, seed=1)
+        self.assertEqual(self._run("traci", deepcopy(sim_params)),
+                         self._run("libsumo", deepcopy(sim_params)))
+
+    def test_no_gui(self):
+        self.assertRaises(
+            FatalFlowError, ring_road_exp_setup,
+            sim_params=SumoParams(render=True), simulator="libsumo")
+
+
 class TestSimsPerStep(unittest.TestCase):
     """Ensures that the appropriate number of simultaions are run at any given
     steps when using flow.core.params.EnvParams.sims_per_step"""
@@ -6,6 +6,7 @@ from scipy.optimize import fsolve
 from copy import deepcopy
 from flow.core.params import VehicleParams
 from flow.core.params import NetParams, EnvParams, SumoParams, InFlows
+from flow.core.params import InitialConfig
 from flow.controllers import IDMController, RLController
 from flow.scenarios import LoopScenario, MergeScenario, BottleneckScenario
 from flow.scenarios.loop import ADDITIONAL_NET_PARAMS as LOOP_PARAMS
@@ -316,6 +317,39 @@ class TestAccelEnv(unittest.TestCase):
         # ensure that the list of ids did not change
         self.assertListEqual(sorted_ids, ids)
 
+    def test_sorting_update(self):
+        """
+        Tests that the sorted ids follow the absolute positions and the
+        vehicles in the network as the simulation is advanced, and are only
+        updated when these change.
+        """
+        env_params = self.env_params
+        env_params.additional_params['sort_vehicles'] = True
+        self.scenario.initial_config.shuffle = True
+
+        env = AccelEnv(
+            sim_params=self.sim_params,
+            scenario=self.scenario,
+            env_params=env_params
+        )
+
+        env.reset()
+        for i in range(50):
+            if i == 25:
+                env.k.vehicle.remove("human_0")
+            env.step(np.array([1]))
+
+            sorted_ids = env.sorted_ids
+            self.assertIs(env.sorted_ids, sorted_ids)
+            self.assertListEqual(
+                sorted_ids,
+                sorted(env.k.vehicle.get_ids(),
+                       key=lambda veh_id: env.absolute_position[veh_id]))
+
+        self.assertNotIn("human_0", env.sorted_ids)
+
+        env.terminate()
+
 
 class TestWaveAttenuationEnv(unittest.TestCase):
 
@@ -861,6 +895,109 @@ class TestBottleneckAccelEnv(unittest.TestCase):
             expected_max=1)
         )
 
+    def test_get_state(self):
+        """Tests that rl vehicles are observed in fixed slots, and that the
+        slots of rl vehicles that exited the network are padded with zeros."""
+        vehicles = VehicleParams()
+        vehicles.add(veh_id="human", num_vehicles=10)
+        vehicles.add(veh_id="rl",
+                     acceleration_controller=(RLController, {}),
+                     num_vehicles=2)
+
+        env_params = deepcopy(self.env.env_params)
+        env_params.additional_params["add_rl_if_exit"] = False
+
+        scenario = BottleneckScenario(
+            name="bay_bridge_toll",
+            vehicles=vehicles,
+            net_params=self.scenario.net_params,
+            initial_config=InitialConfig(edges_distribution=["2", "3", "4"]))
+
+        env = BottleNeckAccelEnv(env_params, self.sim_params, scenario)
+        state = env.reset()
+        self.assertEqual(state.shape, env.observation_space.shape)
+
+        # the rl vehicles are observed in the order of their slots
+        self.assertListEqual(sorted(env.rl_id_list), ["rl_0", "rl_1"])
+        rl_obs = state[:8].reshape(2, 4)
+        for slot, veh_id in enumerate(env.rl_id_list):
+            self.assertAlmostEqual(
+                rl_obs[slot, 0], env.k.vehicle.get_x_by_id(veh_id) / 1000)
+            self.assertEqual(rl_obs[slot, 2],
+                             env.k.vehicle.get_lane(veh_id) / 4)
+
+        # the slot of a vehicle that left the network is padded with zeros
+        env.k.vehicle.remove(env.rl_id_list[0])
+        state, _, _, _ = env.step(np.zeros(env.action_space.shape))
+        relative_obs = state[8:8 + 2 * 16].reshape(2, 16)
+        np.testing.assert_array_equal(state[:4], np.zeros(4))
+        np.testing.assert_array_equal(relative_obs[0], np.zeros(16))
+        self.assertGreater(state[4], 0)
+        np.testing.assert_array_less(0, relative_obs[1, :8])
+
+        # the per edge data follows the vehicles on every edge
+        edges = env.k.scenario.get_edge_list()
+        edge_obs = state[-2 * len(edges):].reshape(len(edges), 2)
+        for i, edge in enumerate(edges):
+            veh_ids = env.k.vehicle.get_ids_by_edge(edge)
+            self.assertAlmostEqual(
+                edge_obs[i, 1],
+                len(veh_ids) / env.k.scenario.edge_length(edge))
+
+        env.terminate()
+
+    def test_get_state_inflows(self):
+        """Tests that rl vehicles entering the network through inflows are
+        given the slots that the rl vehicles which left the network
+        released."""
+        vehicles = VehicleParams()
+        vehicles.add(veh_id="human", num_vehicles=10)
+        vehicles.add(veh_id="rl",
+                     acceleration_controller=(RLController, {}),
+                     num_vehicles=2)
+
+        inflow = InFlows()
+        inflow.add(veh_type="rl", edge="1", vehs_per_hour=3600,
+                   departLane="random", departSpeed=10)
+        net_params = deepcopy(self.scenario.net_params)
+        net_params.inflows = inflow
+
+        env_params = deepcopy(self.env.env_params)
+        env_params.additional_params["add_rl_if_exit"] = False
+
+        scenario = BottleneckScenario(
+            name="bay_bridge_toll",
+            vehicles=vehicles,
+            net_params=net_params,
+            initial_config=InitialConfig(edges_distribution=["2", "3", "4"]))
+
+        env = BottleNeckAccelEnv(env_params, self.sim_params, scenario)
+        env.reset()
+
+        seen_ids = set()
+        for _ in range(40):
+            # the rl vehicles holding a slot leave the network
+            for veh_id in list(env.rl_id_slot):
+                if veh_id in env.k.vehicle.get_rl_ids():
+                    env.k.vehicle.remove(veh_id)
+            state, _, _, _ = env.step(np.zeros(env.action_space.shape))
+            rl_ids = env.k.vehicle.get_rl_ids()
+            seen_ids.update(rl_ids)
+
+            # the rl vehicles in the network take the lowest free slots
+            self.assertEqual(len(env.rl_id_slot), min(len(rl_ids), 2))
+            self.assertListEqual(sorted(env.rl_id_slot.values()),
+                                 list(range(len(env.rl_id_slot))))
+            rl_obs = state[:8].reshape(2, 4)
+            for veh_id, slot in env.rl_id_slot.items():
+                self.assertIn(veh_id, rl_ids)
+                self.assertAlmostEqual(
+                    rl_obs[slot, 0], env.k.vehicle.get_x_by_id(veh_id) / 1000)
+
+        self.assertGreater(len(seen_ids), 4)
+
+        env.terminate()
+
 
 class TestDesiredVelocityEnv(unittest.TestCase):
 
@@ -1,4 +1,5 @@
 import unittest
+import numpy as np
 
 from flow.core.experiment import Experiment
 
@@ -36,6 +37,12 @@ class TestEnvironment(unittest.TestCase):
             edge = edges[i]
             self.assertEqual(self.env._split_edge(edge), i + 1)
 
+    def test_split_center_edge(self):
+        """Check that all the digits of the index of a center are used."""
+        base = self.env._split_edge(":center0")
+        self.assertEqual(self.env._split_edge(":center12_3"), base + 12)
+        self.assertEqual(self.env._convert_edge(":center12_3"), base + 12)
+
     def test_convert_edge(self):
         edges = [
             "left0_0", "right0_0", "bot0_0", "top0_0", "bot0_1", "top0_1",
@@ -100,6 +107,25 @@ class TestUtils(unittest.TestCase):
         for veh_id in junction_veh:
             self.assertEqual(0, self.env.get_distance_to_intersection(veh_id))
 
+    def test_k_closest_by_edge(self):
+        """Check that the batched selection matches the per-edge one."""
+        edges = self.env.k.scenario.get_edge_list()
+        for _ in range(20):
+            self.env.step(rl_actions=[])
+            for k in [0, 1, 3]:
+                ids, dist, edge_index, rank = \
+                    self.env._k_closest_by_edge(edges, k)
+                for i, edge in enumerate(edges):
+                    expected = self.env.k_closest_to_intersection(edge, k)
+                    self.assertListEqual(
+                        ids[edge_index == i].tolist(), expected)
+                    self.assertListEqual(
+                        rank[edge_index == i].tolist(),
+                        list(range(len(expected))))
+                    np.testing.assert_array_almost_equal(
+                        dist[edge_index == i],
+                        self.env.get_distance_to_intersection(expected))
+
     def tearDown(self):
         # terminate the traci instance
         self.env.terminate()
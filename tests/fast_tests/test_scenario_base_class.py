@@ -1,8 +1,14 @@
 import unittest
 import os
+import shutil
+import tempfile
 import numpy as np
 
+import flow.config as config
 from flow.config import PROJECT_PATH
+from flow.core.kernel.scenario.net_cache import NetworkCache
+from flow.core.kernel.scenario.net_import import parse_net, tables_to_dicts, \
+    load_sidecar, save_sidecar
 from flow.core.params import InitialConfig
 from flow.core.params import NetParams
 from flow.core.params import VehicleParams
@@ -63,6 +69,16 @@ class TestGetX(unittest.TestCase):
         pos = 4.72
         self.assertAlmostEqual(self.env.k.scenario.get_x(edge, pos), -1001)
 
+    def test_getx_array(self):
+        # edges and positions may be provided as arrays, in which case the
+        # results match those of individual calls
+        edges = ["bottom", ":bottom", "", ":center_0", "top"]
+        pos = np.array([4.72, 0.1, 4.72, 1., 10.])
+        expected_x = [self.env.k.scenario.get_x(edge, p)
+                      for edge, p in zip(edges, pos)]
+        np.testing.assert_array_almost_equal(
+            self.env.k.scenario.get_x(edges, pos), expected_x)
+
 
 class TestGetEdge(unittest.TestCase):
     """
@@ -91,6 +107,21 @@ class TestGetEdge(unittest.TestCase):
         self.assertTupleEqual(
             self.env.k.scenario.get_edge(x2), (":bottom", 0.1))
 
+    def test_get_edge_array(self):
+        # positions may be provided as an array, in which case the results
+        # match those of individual calls
+        x = np.array([5, 0.1, 0, 70.3, self.env.k.scenario.length() - 1])
+        edges, pos = self.env.k.scenario.get_edge(x)
+        for i in range(len(x)):
+            edge, p = self.env.k.scenario.get_edge(x[i])
+            self.assertEqual(edges[i], edge)
+            self.assertAlmostEqual(pos[i], p)
+
+        # positions before the start of the network have no edge
+        edges, pos = self.env.k.scenario.get_edge(np.array([-1.]))
+        self.assertListEqual(edges, [None])
+        self.assertTrue(np.isnan(pos[0]))
+
 
 class TestEvenStartPos(unittest.TestCase):
     """
@@ -581,6 +612,82 @@ class TestRandomStartPos(unittest.TestCase):
             self.assertEqual(len(self.env.k.vehicle.get_ids_by_edge(edge)),
                              edges[edge])
 
+    def test_seed(self):
+        """
+        Tests that the random starting positions are reproducible when a seed
+        is specified, and that edges_distribution is left unchanged.
+        """
+        edges = {"top": 2, "bottom": 3}
+        self.setUp_gen_start_pos(InitialConfig())
+        scenario = self.env.k.scenario
+
+        # consecutive calls with the same seed produce a reproducible sequence
+        # of different starting positions
+        initial_config = InitialConfig(
+            spacing="random", edges_distribution=edges, seed=1)
+        pos1, lanes1 = scenario.gen_random_start_pos(initial_config, 5)
+        pos2, lanes2 = scenario.gen_random_start_pos(initial_config, 5)
+        self.assertNotEqual(pos1, pos2)
+        self.assertDictEqual(initial_config.edges_distribution, edges)
+
+        initial_config = InitialConfig(
+            spacing="random", edges_distribution=edges, seed=2)
+        self.assertNotEqual(
+            scenario.gen_random_start_pos(initial_config, 5)[0], pos1)
+
+        initial_config = InitialConfig(
+            spacing="random", edges_distribution=edges, seed=1)
+        self.assertEqual(scenario.gen_random_start_pos(initial_config, 5),
+                         (pos1, lanes1))
+        self.assertEqual(scenario.gen_random_start_pos(initial_config, 5),
+                         (pos2, lanes2))
+
+
+class TestStartPosManyVehicles(unittest.TestCase):
+    """
+    Tests the starting position methods when placing a large number of
+    vehicles.
+    """
+
+    def setUp(self):
+        additional_net_params = {
+            "length": 20000,
+            "lanes": 4,
+            "speed_limit": 30,
+            "resolution": 40
+        }
+        net_params = NetParams(additional_params=additional_net_params)
+        self.env, _ = ring_road_exp_setup(net_params=net_params)
+
+    def tearDown(self):
+        # terminate the traci instance
+        self.env.terminate()
+
+        # free data used by the class
+        self.env = None
+
+    def test_start_pos(self):
+        """
+        Tests that the vehicles are placed on all lanes, with at least a
+        vehicle length between consecutive vehicles of a lane.
+        """
+        scenario = self.env.k.scenario
+        num_vehicles = 10000
+
+        for spacing in ["uniform", "random"]:
+            initial_config = InitialConfig(spacing=spacing, min_gap=0.1)
+            pos, lanes = scenario.generate_starting_positions(
+                initial_config, num_vehicles)
+            self.assertEqual(len(pos), num_vehicles)
+            self.assertEqual(len(lanes), num_vehicles)
+            self.assertEqual(set(lanes), {0, 1, 2, 3})
+
+            x = np.array(scenario.get_x([edge for edge, _ in pos],
+                                        [p for _, p in pos]))
+            for lane in range(4):
+                x_lane = np.sort(x[np.array(lanes) == lane])
+                self.assertTrue(np.all(np.diff(x_lane) >= 5 - 1e-6))
+
 
 class TestEvenStartPosVariableLanes(unittest.TestCase):
     def setUp(self):
@@ -884,6 +991,133 @@ class TestNextPrevEdge(unittest.TestCase):
         self.assertTrue(len(prev_edge) == 0)
 
 
+class TestLaneGraph(unittest.TestCase):
+    """
+    Tests that the lane graph of a scenario matches the next_edge() and
+    prev_edge() methods, and that searches through it return the closest
+    occupied lanes and the distances to them.
+    """
+
+    def test_connections(self):
+        env, scenario = figure_eight_exp_setup()
+        graph = env.k.scenario.lane_graph
+
+        for edge in graph.edges:
+            for lane in range(env.k.scenario.num_lanes(edge)):
+                i = graph.lane_index(edge, lane)
+                self.assertEqual(graph.length[i],
+                                 env.k.scenario.edge_length(edge))
+
+                next_lanes = graph.next_lanes[
+                    graph.next_start[i]:graph.next_start[i + 1]]
+                self.assertListEqual(
+                    [graph.lane_index(*pair) for pair in
+                     env.k.scenario.next_edge(edge, lane)],
+                    next_lanes.tolist())
+
+                prev_lanes = graph.prev_lanes[
+                    graph.prev_start[i]:graph.prev_start[i + 1]]
+                self.assertListEqual(
+                    [graph.lane_index(*pair) for pair in
+                     env.k.scenario.prev_edge(edge, lane)],
+                    prev_lanes.tolist())
+
+        self.assertEqual(graph.lane_index("bottom", 1), -1)
+        self.assertEqual(graph.lane_index("foo", 0), -1)
+
+        env.terminate()
+
+    def test_search(self):
+        env, scenario = ring_road_exp_setup()
+        graph = env.k.scenario.lane_graph
+        length = env.k.scenario.edge_length("top")
+
+        occupied = np.zeros(graph.num_lanes, dtype=bool)
+        occupied[graph.lane_index("left", 0)] = True
+        lanes = [graph.lane_index("top", 0), graph.lane_index("left", 0), -1]
+
+        # the lanes ahead of top are left, and of left are bottom, right, top
+        # and left
+        found, dist = graph.search(lanes, occupied, forward=True, max_hops=4)
+        self.assertListEqual(
+            found.tolist(), [graph.lane_index("left", 0)] * 2 + [-1])
+        np.testing.assert_array_almost_equal(dist[:2], [length, 4 * length])
+
+        # the lanes behind top are right, bottom and left
+        found, dist = graph.search(lanes, occupied, forward=False, max_hops=4)
+        self.assertListEqual(
+            found.tolist(), [graph.lane_index("left", 0)] * 2 + [-1])
+        np.testing.assert_array_almost_equal(dist[:2],
+                                             [3 * length, 4 * length])
+
+        # the searches are limited to max_hops lanes
+        found, _ = graph.search(lanes, occupied, forward=False, max_hops=2)
+        self.assertListEqual(found.tolist(), [-1, -1, -1])
+
+        env.terminate()
+
+
+class TestNetworkCache(unittest.TestCase):
+    """
+    Tests that the networks generated by netconvert are stored in and loaded
+    from the network cache.
+    """
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.net_cache_dir = config.NET_CACHE_DIR
+        config.NET_CACHE_DIR = self.cache_dir
+
+    def tearDown(self):
+        config.NET_CACHE_DIR = self.net_cache_dir
+        shutil.rmtree(self.cache_dir)
+
+    def test_key(self):
+        cache = NetworkCache(self.cache_dir)
+        fn1 = os.path.join(self.cache_dir, "a.xml")
+        fn2 = os.path.join(self.cache_dir, "b.xml")
+        with open(fn1, "w") as f:
+            f.write("<nodes/>")
+        with open(fn2, "w") as f:
+            f.write("<nodes/>")
+
+        # only the contents of the files and the options are hashed
+        self.assertEqual(cache.key([fn1], ["a"]), cache.key([fn2], ["a"]))
+        self.assertNotEqual(cache.key([fn1], ["a"]), cache.key([fn1], ["b"]))
+        self.assertNotEqual(cache.key([fn1], ["a"]),
+                            cache.key([fn1, fn2], ["a"]))
+
+        # missing entries are not loaded
+        self.assertEqual(
+            cache.load(cache.key([fn1], ["a"]), fn2), (None, None))
+
+    def test_generate_network(self):
+        # the first environment generates the network and caches it
+        env, scenario = ring_road_exp_setup()
+        entries = sorted(os.listdir(self.cache_dir))
+        self.assertEqual(len(entries), 2)
+        edges = env.k.scenario._edges
+        connections = env.k.scenario._connections
+        env.terminate()
+
+        # the second one loads it from the cache
+        env, scenario = ring_road_exp_setup()
+        self.assertListEqual(sorted(os.listdir(self.cache_dir)), entries)
+        self.assertDictEqual(env.k.scenario._edges, edges)
+        self.assertDictEqual(env.k.scenario._connections, connections)
+        self.assertEqual(
+            env.k.scenario._import_edges_from_net(scenario.net_params),
+            (edges, connections))
+        env.terminate()
+
+        # a different network is cached separately
+        env, scenario = ring_road_exp_setup(net_params=NetParams(
+            additional_params={"length": 260, "lanes": 1, "speed_limit": 30,
+                               "resolution": 40}))
+        self.assertEqual(len(os.listdir(self.cache_dir)), 4)
+        env.terminate()
+
+
 class TestDefaultRoutes(unittest.TestCase):
 
     def test_default_routes(self):
@@ -943,6 +1177,62 @@ class TestOpenStreetMap(unittest.TestCase):
         self.assertEqual(len(env.k.scenario.get_edge_list()), 29)
 
 
+class TestNetImport(unittest.TestCase):
+    """
+    Tests that the edges and connections of .net.xml files are imported
+    correctly, and that their tables are stored in and loaded from sidecar
+    files.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.net_path = os.path.join(self.tmp_dir, "fig8_test.net.xml")
+        shutil.copyfile(
+            os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                         "test_files/fig8_test.net.xml"),
+            self.net_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_parse_net(self):
+        edges, connections = tables_to_dicts(parse_net(self.net_path), False)
+
+        self.assertEqual(len(edges), 12)
+        self.assertDictEqual(edges["bottom"],
+                             {"speed": 30, "lanes": 1, "length": 30})
+        self.assertDictEqual(edges[":center_0"],
+                             {"speed": 30, "lanes": 1, "length": 9.4})
+
+        # with internal links, edges lead to the internal links after them
+        self.assertListEqual(connections["next"]["bottom"][0],
+                             [(":center_1", 0)])
+        self.assertListEqual(connections["next"][":center_1"][0],
+                             [("top", 0)])
+        self.assertListEqual(connections["prev"]["top"][0],
+                             [(":center_1", 0)])
+
+        # without internal links, edges lead to the next edges
+        _, connections = tables_to_dicts(parse_net(self.net_path), True)
+        self.assertListEqual(connections["next"]["bottom"][0], [("top", 0)])
+
+    def test_sidecar(self):
+        # no sidecar was written yet
+        self.assertIsNone(load_sidecar(self.net_path))
+
+        tables = parse_net(self.net_path)
+        save_sidecar(self.net_path, tables)
+        loaded = load_sidecar(self.net_path)
+        self.assertListEqual(sorted(loaded.keys()), sorted(tables.keys()))
+        for key in tables:
+            np.testing.assert_array_equal(loaded[key], tables[key])
+
+        # the sidecar is ignored once the .net.xml file changes
+        with open(self.net_path, "a") as f:
+            f.write("\n")
+        self.assertIsNone(load_sidecar(self.net_path))
+
+
 class TestNetworkTemplateGenerator(unittest.TestCase):
 
     def test_network_template(self):
@@ -1,14 +1,19 @@
 import unittest
 import os
 
+import numpy as np
+
 from tests.setup_scripts import ring_road_exp_setup, grid_mxn_exp_setup
 from flow.core.params import VehicleParams
 from flow.core.params import NetParams
 from flow.core.params import SumoCarFollowingParams
 from flow.core.params import TrafficLightParams
 from flow.core.experiment import Experiment
+from flow.core.kernel.traffic_light import TrafficLightPhases
 from flow.controllers.routing_controllers import GridRouter
 from flow.controllers.car_following_models import IDMController
+from flow.envs.loop.loop_accel import AccelEnv
+from flow.utils.exceptions import FatalFlowError
 
 os.environ["TEST_FLAG"] = "True"
 
@@ -137,6 +142,67 @@ class TestSetState(unittest.TestCase):
 
         self.assertEqual(state[1], "R")
 
+    def test_redundant_states(self):
+        # reset the environment
+        self.env.reset()
+        stats = self.env.k.traffic_light.get_command_stats()
+
+        # states set several times within a step are only sent once
+        self.env.k.traffic_light.set_state(node_id="top", state="GG")
+        self.env.k.traffic_light.set_state(node_id="top", state="rY")
+        self.env.step([])
+        self.assertEqual(self.env.k.traffic_light.get_state("top"), "rY")
+        new_stats = self.env.k.traffic_light.get_command_stats()
+        self.assertEqual(new_stats["sent"] - stats["sent"], 1)
+        self.assertEqual(new_stats["coalesced"] - stats["coalesced"], 1)
+
+        # states matching the current state of the node are not sent
+        self.env.k.traffic_light.set_state(node_id="top", state="rY")
+        self.env.step([])
+        self.assertEqual(self.env.k.traffic_light.get_state("top"), "rY")
+        stats = self.env.k.traffic_light.get_command_stats()
+        self.assertEqual(stats["sent"], new_stats["sent"])
+        self.assertEqual(stats["coalesced"] - new_stats["coalesced"], 1)
+
+
+class TestTrafficLightPhases(unittest.TestCase):
+    """
+    Tests the phases of the traffic lights switching between two directions
+    """
+
+    def test_step(self):
+        phases = TrafficLightPhases(
+            node_ids=["a", "b", "c"],
+            green_states=("GrGr", "rGrG"),
+            yellow_states=("yryr", "ryry"),
+            min_switch_time=2)
+        self.assertListEqual(phases.get_states(), ["GrGr"] * 3)
+
+        # nodes requested to switch turn yellow
+        nodes, states = phases.step([True, False, True], 1)
+        self.assertListEqual(nodes, ["a", "c"])
+        self.assertListEqual(states, ["yryr", "yryr"])
+        np.testing.assert_array_equal(phases.direction, [1, 0, 1])
+        np.testing.assert_array_equal(phases.currently_yellow, [1, 0, 1])
+
+        # requests of yellow nodes are ignored, and nothing changes until the
+        # minimum switch time is reached
+        nodes, states = phases.step([True, False, False], 1)
+        self.assertListEqual(nodes, [])
+        np.testing.assert_array_equal(phases.last_change, [1, 0, 1])
+
+        # yellow nodes turn green in their new direction
+        nodes, states = phases.step([False, True, False], 1)
+        self.assertListEqual(nodes, ["a", "b", "c"])
+        self.assertListEqual(states, ["rGrG", "yryr", "rGrG"])
+
+        # and switch back through their other yellow state
+        nodes, states = phases.step([True, False, False], 1)
+        self.assertListEqual(nodes, ["a"])
+        self.assertListEqual(states, ["ryry"])
+        self.assertListEqual(phases.get_states(),
+                             ["ryry", "yryr", "rGrG"])
+
 
 class TestPOEnv(unittest.TestCase):
     """
@@ -367,5 +433,43 @@ class TestCustomization(unittest.TestCase):
                 self.env.step([])
 
 
+class TestRequiredVariables(unittest.TestCase):
+    """Tests that undeclared traffic light variables are not retrieved."""
+
+    def setUp(self):
+        # add a traffic light to the top node
+        traffic_lights = TrafficLightParams()
+        traffic_lights.add("top")
+
+        env, scenario = ring_road_exp_setup(traffic_lights=traffic_lights)
+        env.terminate()
+
+        class RequiredVariablesEnv(AccelEnv):
+            required_traffic_light_variables = ()
+
+        self.env = RequiredVariablesEnv(
+            env.env_params, env.sim_params, scenario)
+        self.env.reset()
+
+    def tearDown(self):
+        # terminate the traci instance
+        self.env.terminate()
+
+        # free data used by the class
+        self.env = None
+
+    def test_required_variables(self):
+        self.env.step([])
+
+        # the traffic lights can still be set, but their state is not read
+        self.env.k.traffic_light.set_state("top", "r")
+        self.env.step([])
+        self.assertRaises(
+            FatalFlowError, self.env.k.traffic_light.get_state, "top")
+        self.assertRaises(
+            ValueError, self.env.k.traffic_light.set_required_variables,
+            ["foo"])
+
+
 if __name__ == '__main__':
     unittest.main()
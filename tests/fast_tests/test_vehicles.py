@@ -9,6 +9,12 @@ from flow.controllers.car_following_models import IDMController, \
     SimCarFollowingController
 from flow.controllers.lane_change_controllers import StaticLaneChanger
 from flow.controllers.rlcontroller import RLController
+from flow.controllers.routing_controllers import ContinuousRouter
+from flow.controllers.velocity_controllers import PISaturation
+from flow.core.kernel.vehicle import EdgeSegments
+from flow.envs.loop.loop_accel import AccelEnv
+from flow.utils.exceptions import FatalFlowError
+import traci.constants as tc
 
 from tests.setup_scripts import ring_road_exp_setup, highway_exp_setup
 
@@ -209,6 +215,51 @@ class TestVehiclesClass(unittest.TestCase):
         self.assertEqual(env.k.vehicle.num_rl_vehicles,
                          len(env.k.vehicle.get_rl_ids()))
 
+    def test_remove_many(self):
+        """
+        Check that vehicles removed together are removed from the lists of
+        vehicles and from sumo, and that clear removes all vehicles.
+        """
+        # generate a vehicles class
+        vehicles = VehicleParams()
+        vehicles.add("test", num_vehicles=10)
+        vehicles.add(
+            "test_rl",
+            num_vehicles=10,
+            acceleration_controller=(RLController, {}))
+
+        env, _ = ring_road_exp_setup(vehicles=vehicles)
+
+        # remove a few vehicles, including one that is not in the network
+        env.k.vehicle.remove_many(["test_0", "test_rl_0", "test_rl_5", "foo"])
+
+        removed = ["test_0", "test_rl_0", "test_rl_5"]
+        sumo_ids = env.k.kernel_api.vehicle.getIDList()
+        for veh_id in removed:
+            self.assertNotIn(veh_id, env.k.vehicle.get_ids())
+            self.assertNotIn(veh_id, env.k.vehicle.get_human_ids())
+            self.assertNotIn(veh_id, env.k.vehicle.get_rl_ids())
+            self.assertNotIn(veh_id, sumo_ids)
+        self.assertEqual(env.k.vehicle.num_vehicles, 17)
+        self.assertEqual(env.k.vehicle.num_rl_vehicles, 8)
+
+        # the rl ids should remain sorted
+        rl_ids = env.k.vehicle.get_rl_ids()
+        self.assertListEqual(rl_ids, sorted(rl_ids))
+
+        # remove all remaining vehicles
+        env.k.vehicle.clear()
+        self.assertEqual(len(env.k.vehicle.get_ids()), 0)
+        self.assertEqual(len(env.k.kernel_api.vehicle.getIDList()), 0)
+        self.assertEqual(env.k.vehicle.num_vehicles, 0)
+        self.assertEqual(env.k.vehicle.num_rl_vehicles, 0)
+
+        # the environment should still be able to reset
+        env.reset()
+        self.assertEqual(env.k.vehicle.num_vehicles, 20)
+
+        env.terminate()
+
 
 class TestMultiLaneData(unittest.TestCase):
     """
@@ -538,6 +589,46 @@ class TestMultiLaneData(unittest.TestCase):
         np.testing.assert_array_almost_equal(actual_follower_speed,
                                              expected_follower_speed)
 
+    def test_human_vehicles(self):
+        """
+        Test that the above mentioned methods are also available for
+        non-RL vehicles.
+        """
+        additional_net_params = {
+            "length": 230,
+            "lanes": 3,
+            "speed_limit": 30,
+            "resolution": 40
+        }
+        net_params = NetParams(additional_params=additional_net_params)
+
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="test",
+            acceleration_controller=(IDMController, {}),
+            num_vehicles=21)
+
+        initial_config = InitialConfig(lanes_distribution=float("inf"))
+
+        env, scenario = ring_road_exp_setup(
+            net_params=net_params,
+            vehicles=vehicles,
+            initial_config=initial_config)
+        env.reset()
+
+        self.assertListEqual(env.k.vehicle.get_lane_leaders("test_0"),
+                             ["test_3", "test_1", "test_2"])
+        self.assertListEqual(env.k.vehicle.get_lane_followers("test_0"),
+                             ["test_18", "test_19", "test_20"])
+        np.testing.assert_array_almost_equal(
+            env.k.vehicle.get_lane_headways("test_0"),
+            [27.85714285714286, -5, -5])
+        np.testing.assert_array_almost_equal(
+            env.k.vehicle.get_lane_tailways("test_0"),
+            [27.85714285714286] * 3)
+
+        env.terminate()
+
     def test_junctions(self):
         """
         Test the above mentioned methods in the presence of junctions.
@@ -570,6 +661,124 @@ class TestIdsByEdge(unittest.TestCase):
         self.assertCountEqual(ids, expected_ids)
 
 
+class TestIdsByLane(unittest.TestCase):
+    """
+    Tests the ids_by_lane() method
+    """
+
+    def setUp(self):
+        # create a multi-lane ring road with vehicles that change lanes
+        additional_net_params = {
+            "length": 230,
+            "lanes": 2,
+            "speed_limit": 30,
+            "resolution": 40
+        }
+        net_params = NetParams(additional_params=additional_net_params)
+
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="test",
+            acceleration_controller=(IDMController, {}),
+            lane_change_params=SumoLaneChangeParams(
+                lane_change_mode="strategic"),
+            num_vehicles=14)
+
+        initial_config = InitialConfig(lanes_distribution=float("inf"))
+
+        self.env, scenario = ring_road_exp_setup(
+            net_params=net_params,
+            vehicles=vehicles,
+            initial_config=initial_config)
+
+    def tearDown(self):
+        # free data used by the class
+        self.env.terminate()
+        self.env = None
+
+    def test_ids_by_lane(self):
+        self.env.reset()
+        ids = self.env.k.vehicle.get_ids_by_lane("bottom", 0)
+        self.assertListEqual(ids, ["test_0", "test_2"])
+        self.assertListEqual(
+            self.env.k.vehicle.get_ids_by_lane("bottom", 5), [])
+        self.assertListEqual(self.env.k.vehicle.get_ids_by_lane("foo", 0), [])
+
+        # the ordering should remain valid as vehicles move and change lanes
+        for _ in range(50):
+            self.env.step(rl_actions=None)
+
+            for edge in ["top", "bottom", "left", "right"]:
+                for lane in range(2):
+                    ids = self.env.k.vehicle.get_ids_by_lane(edge, lane)
+                    expected_ids = [
+                        veh_id for veh_id in self.env.k.vehicle.get_ids()
+                        if self.env.k.vehicle.get_edge(veh_id) == edge
+                        and self.env.k.vehicle.get_lane(veh_id) == lane]
+                    self.assertCountEqual(ids, expected_ids)
+                    pos = self.env.k.vehicle.get_position(ids)
+                    self.assertTrue(np.all(np.diff(pos) >= 0))
+
+    def test_lane_occupancy(self):
+        self.env.reset()
+        for _ in range(10):
+            self.env.step(rl_actions=None)
+
+        for edge in ["top", "bottom", "left", "right", "foo"]:
+            for lane in range(3):
+                ids, pos = self.env.k.vehicle.get_lane_occupancy(edge, lane)
+                self.assertListEqual(
+                    ids.tolist(),
+                    self.env.k.vehicle.get_ids_by_lane(edge, lane))
+                np.testing.assert_array_almost_equal(
+                    pos, self.env.k.vehicle.get_position(ids.tolist()))
+
+                # the index is read-only
+                self.assertFalse(ids.flags.writeable)
+                self.assertFalse(pos.flags.writeable)
+
+
+class TestContextSubscription(unittest.TestCase):
+    """Tests the retrieval of vehicle states through context subscriptions."""
+
+    def test_context_subscription(self):
+        """Check that both subscription modes return the same states."""
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="test",
+            acceleration_controller=(IDMController, {}),
+            num_vehicles=10)
+
+        envs = []
+        for context_subscription in [False, True]:
+            sim_params = SumoParams(
+                sim_step=0.1,
+                render=False,
+                context_subscription=context_subscription)
+            env, _ = ring_road_exp_setup(
+                sim_params=sim_params, vehicles=vehicles)
+            env.reset()
+            for _ in range(20):
+                env.step(rl_actions=None)
+            envs.append(env)
+
+        ids = envs[0].k.vehicle.get_ids()
+        self.assertCountEqual(ids, envs[1].k.vehicle.get_ids())
+        for getter in ["get_speed", "get_position", "get_headway"]:
+            np.testing.assert_array_almost_equal(
+                getattr(envs[0].k.vehicle, getter)(ids),
+                getattr(envs[1].k.vehicle, getter)(ids))
+        for getter in ["get_edge", "get_leader", "get_route", "get_type"]:
+            self.assertListEqual(
+                [getattr(envs[0].k.vehicle, getter)(veh_id)
+                 for veh_id in ids],
+                [getattr(envs[1].k.vehicle, getter)(veh_id)
+                 for veh_id in ids])
+
+        for env in envs:
+            env.terminate()
+
+
 class TestObservedIDs(unittest.TestCase):
     """Tests the observed_ids methods, which are used for visualization."""
 
@@ -602,5 +811,490 @@ class TestObservedIDs(unittest.TestCase):
         self.assertCountEqual(env.k.vehicle.get_observed_ids(), ["test_1"])
 
 
+class TestVehicleStateStore(unittest.TestCase):
+    """Tests the columnar state store of the TraCI vehicle kernel."""
+
+    def setUp(self):
+        vehicles = VehicleParams()
+        vehicles.add(veh_id="test", num_vehicles=5)
+
+        self.env, _ = ring_road_exp_setup(vehicles=vehicles)
+
+    def tearDown(self):
+        # free data used by the class
+        self.env.terminate()
+        self.env = None
+
+    def test_list_queries(self):
+        """Check that list queries match the single vehicle queries."""
+        self.env.reset()
+        self.env.step([])
+        ids = self.env.k.vehicle.get_ids()
+
+        for getter in [self.env.k.vehicle.get_speed,
+                       self.env.k.vehicle.get_position,
+                       self.env.k.vehicle.get_lane,
+                       self.env.k.vehicle.get_length,
+                       self.env.k.vehicle.get_headway]:
+            values = getter(ids)
+            self.assertIsInstance(values, np.ndarray)
+            np.testing.assert_array_almost_equal(
+                values, [getter(veh_id) for veh_id in ids])
+
+        for getter in [self.env.k.vehicle.get_edge,
+                       self.env.k.vehicle.get_leader,
+                       self.env.k.vehicle.get_follower]:
+            self.assertListEqual(
+                getter(ids), [getter(veh_id) for veh_id in ids])
+
+        # the leader of each vehicle should have it as a follower
+        for veh_id in ids:
+            leader = self.env.k.vehicle.get_leader(veh_id)
+            self.assertEqual(self.env.k.vehicle.get_follower(leader), veh_id)
+
+    def test_absolute_positions(self):
+        """Check that the absolute positions match the scenario kernel."""
+        self.env.reset()
+        self.env.step([])
+        ids = self.env.k.vehicle.get_ids()
+
+        expected_x = [self.env.k.scenario.get_x(
+            self.env.k.vehicle.get_edge(veh_id),
+            self.env.k.vehicle.get_position(veh_id)) for veh_id in ids]
+        x = self.env.k.vehicle.get_x_by_id(ids)
+        self.assertIsInstance(x, np.ndarray)
+        np.testing.assert_array_almost_equal(x, expected_x)
+        np.testing.assert_array_almost_equal(
+            [self.env.k.vehicle.get_x_by_id(veh_id) for veh_id in ids],
+            expected_x)
+
+        # the absolute positions follow changes to the edges of vehicles
+        self.env.k.vehicle.test_set_edge(ids[0], "top")
+        self.assertAlmostEqual(
+            self.env.k.vehicle.get_x_by_id(ids[0]),
+            self.env.k.scenario.get_x(
+                "top", self.env.k.vehicle.get_position(ids[0])))
+
+        # vehicles that are not in the network are located at 0
+        self.assertEqual(self.env.k.vehicle.get_x_by_id("foo"), 0)
+        self.assertEqual(self.env.k.vehicle.get_x_by_id(["foo"])[0], 0)
+
+    def test_missing_vehicles(self):
+        """Check that the error value is returned for missing vehicles."""
+        self.env.reset()
+        ids = self.env.k.vehicle.get_ids()
+
+        self.assertEqual(self.env.k.vehicle.get_speed("foo"), -1001)
+        self.assertEqual(self.env.k.vehicle.get_edge("foo"), "")
+        self.assertEqual(self.env.k.vehicle.get_leader("foo", None), None)
+
+        speeds = self.env.k.vehicle.get_speed(ids + ["foo"], error=-1)
+        self.assertEqual(len(speeds), len(ids) + 1)
+        self.assertEqual(speeds[-1], -1)
+        self.assertListEqual(
+            self.env.k.vehicle.get_edge(["foo", ids[0]]),
+            ["", self.env.k.vehicle.get_edge(ids[0])])
+
+    def test_remove(self):
+        """Check that rows of removed vehicles are released."""
+        self.env.reset()
+        follower = self.env.k.vehicle.get_follower("test_0")
+
+        self.env.k.vehicle.remove("test_0")
+        self.assertEqual(self.env.k.vehicle.get_speed("test_0"), -1001)
+        self.assertIsNone(self.env.k.vehicle.get_leader(follower))
+
+
+class TestLastLaneChange(unittest.TestCase):
+    """Tests the time of the last lane change of rl vehicles."""
+
+    def setUp(self):
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="rl",
+            acceleration_controller=(RLController, {}),
+            lane_change_params=SumoLaneChangeParams(
+                lane_change_mode="aggressive"),
+            num_vehicles=1)
+        vehicles.add(veh_id="test", num_vehicles=1)
+
+        net_params = NetParams(additional_params={
+            "length": 230, "lanes": 2, "speed_limit": 30, "resolution": 40})
+        initial_config = InitialConfig(lanes_distribution=1)
+
+        self.env, _ = ring_road_exp_setup(
+            vehicles=vehicles, net_params=net_params,
+            initial_config=initial_config)
+
+    def tearDown(self):
+        # free data used by the class
+        self.env.terminate()
+        self.env = None
+
+    def test_last_lc(self):
+        self.env.reset()
+        self.assertEqual(self.env.k.vehicle.get_last_lc("rl_0"), -np.inf)
+        self.assertEqual(self.env.k.vehicle.get_lane("rl_0"), 0)
+
+        # request a lane change, and wait for it to be performed
+        self.env.k.vehicle.apply_lane_change("rl_0", direction=1)
+        for _ in range(10):
+            self.env.step([])
+            if self.env.k.vehicle.get_lane("rl_0") == 1:
+                break
+        self.assertEqual(self.env.k.vehicle.get_lane("rl_0"), 1)
+
+        # the time of the lane change is recorded for rl vehicles only
+        time_counter = self.env.k.vehicle.time_counter
+        self.assertEqual(
+            self.env.k.vehicle.get_last_lc("rl_0"), time_counter)
+        self.assertListEqual(
+            self.env.k.vehicle.get_last_lc(["rl_0"]), [time_counter])
+        self.assertEqual(self.env.k.vehicle.get_last_lc("test_0"), -1001)
+
+        # later steps without lane changes keep the time of the last one
+        self.env.step([])
+        self.assertEqual(
+            self.env.k.vehicle.get_last_lc("rl_0"), time_counter)
+
+
+class TestFlowRates(unittest.TestCase):
+    """Tests the inflow and outflow rates computed by the vehicle kernel."""
+
+    def setUp(self):
+        vehicles = VehicleParams()
+        vehicles.add(veh_id="test", num_vehicles=1)
+
+        self.env, _ = ring_road_exp_setup(vehicles=vehicles)
+
+    def tearDown(self):
+        # free data used by the class
+        self.env.terminate()
+        self.env = None
+
+    def _check_rates(self, num_departed, num_arrived, time_spans):
+        """Compare the kernel rates with rates computed from the full lists."""
+        sim_step = self.env.k.vehicle.sim_step
+        for time_span in time_spans:
+            for rate, num_vehicles in [
+                    (self.env.k.vehicle.get_inflow_rate, num_departed),
+                    (self.env.k.vehicle.get_outflow_rate, num_arrived)]:
+                window = num_vehicles[-int(time_span / sim_step):]
+                expected = 3600 * sum(window) / (len(window) * sim_step)
+                self.assertAlmostEqual(rate(time_span), expected)
+
+    def test_rates(self):
+        self.env.reset()
+        vehicles = self.env.k.vehicle
+        self.assertEqual(vehicles.get_inflow_rate(10), 0)
+        self.assertEqual(vehicles.get_outflow_rate(10), 0)
+
+        # compare against the rates over the full lists of counts, both
+        # before and after the ring buffer has wrapped around
+        np.random.seed(0)
+        num_departed, num_arrived = [], []
+        capacity = len(vehicles._cum_flows)
+        for _ in range(2 * capacity + 10):
+            num_departed.append(np.random.randint(3))
+            num_arrived.append(np.random.randint(3))
+            vehicles._record_flows(num_departed[-1], num_arrived[-1])
+            if len(num_departed) in [1, capacity - 1]:
+                # a time span of zero covers all time-steps since the reset
+                self._check_rates(num_departed, num_arrived,
+                                  [0, vehicles.sim_step, 10, 100, 1000])
+            elif len(num_departed) == capacity + 5:
+                self._check_rates(num_departed, num_arrived,
+                                  [vehicles.sim_step, 10, 100, 1000])
+        self._check_rates(num_departed, num_arrived, [1, 10, 100, 3599])
+
+        # larger time spans enlarge the buffer while keeping the counts
+        time_span = 4 * capacity * vehicles.sim_step
+        vehicles.get_inflow_rate(time_span)
+        self.assertGreater(len(vehicles._cum_flows), 4 * capacity)
+        self._check_rates(num_departed, num_arrived, [10, 100, 3599])
+        for _ in range(4 * capacity):
+            num_departed.append(np.random.randint(3))
+            num_arrived.append(np.random.randint(3))
+            vehicles._record_flows(num_departed[-1], num_arrived[-1])
+        self._check_rates(num_departed, num_arrived, [10, 3599, time_span])
+
+        # resetting the environment clears the counts
+        self.env.reset()
+        self.assertEqual(vehicles.get_inflow_rate(10), 0)
+
+
+class TestSegmentAggregates(unittest.TestCase):
+    """Tests the aggregation of vehicle data over the segments of edges."""
+
+    def setUp(self):
+        vehicles = VehicleParams()
+        vehicles.add(veh_id="rl",
+                     acceleration_controller=(RLController, {}),
+                     num_vehicles=5)
+        vehicles.add(veh_id="test", num_vehicles=15)
+
+        self.env, _ = ring_road_exp_setup(vehicles=vehicles)
+
+    def tearDown(self):
+        # free data used by the class
+        self.env.terminate()
+        self.env = None
+
+    def test_segments(self):
+        segments = EdgeSegments(
+            ["a", "b"], [[0, 10], [0, 5, 10, 20]], [2, 3])
+        self.assertEqual(segments.num_cells, 2 + 9)
+        np.testing.assert_array_equal(segments.segment_start, [0, 1, 4])
+
+        # boundaries fall on the latter segment, and positions out of the
+        # edge on the first or last one
+        np.testing.assert_array_equal(
+            segments.segment([1, 1, 1, 1, 1, 0, -1],
+                             [0, 5, 9.9, 20, 25, 3, 3]),
+            [0, 1, 1, 2, 2, 0, -1])
+        np.testing.assert_array_equal(
+            segments.cell([0, 0, 1, 1, 1, -1], [3, 3, 0, 12, 12, 3],
+                          [0, 1, 2, 1, 3, 0]),
+            [0, 1, 4, 9, -1, -1])
+
+    def test_aggregates(self):
+        self.env.reset()
+        self.env.step(None)
+        vehicles = self.env.k.vehicle
+        scenario = self.env.k.scenario
+
+        segments = EdgeSegments(
+            ["bottom", "top"],
+            [np.linspace(0, scenario.edge_length("bottom"), 3),
+             np.linspace(0, scenario.edge_length("top"), 4)],
+            [1, 1])
+        num_veh, mean_speed = vehicles.get_segment_aggregates(segments)
+        self.assertEqual(num_veh.shape, (2, 5))
+        self.assertEqual(mean_speed.shape, (2, 5))
+
+        # compare against aggregates computed vehicle by vehicle
+        expected_num = np.zeros((2, 5))
+        expected_speed = np.zeros((2, 5))
+        for veh_id in vehicles.get_ids():
+            edge = vehicles.get_edge(veh_id)
+            if edge not in segments.edge_index:
+                continue
+            i = segments.edge_index[edge]
+            seg = np.searchsorted(segments.boundaries[i],
+                                  vehicles.get_position(veh_id), 'right') - 1
+            cell = segments.segment_start[i] + min(seg, i + 1)
+            is_rl = int(veh_id in vehicles.get_rl_ids())
+            expected_num[is_rl, cell] += 1
+            expected_speed[is_rl, cell] += vehicles.get_speed(veh_id)
+        np.testing.assert_array_equal(num_veh, expected_num)
+        np.testing.assert_array_almost_equal(
+            mean_speed, expected_speed / np.maximum(expected_num, 1))
+        self.assertGreater(num_veh[1].sum(), 0)
+
+
+class TestRequiredVariables(unittest.TestCase):
+    """Tests the retrieval of the vehicle variables declared by envs."""
+
+    def setUp(self):
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="idm",
+            acceleration_controller=(IDMController, {}),
+            routing_controller=(ContinuousRouter, {}),
+            num_vehicles=3)
+        vehicles.add(
+            veh_id="sumo",
+            acceleration_controller=(SimCarFollowingController, {}),
+            num_vehicles=3)
+
+        env, scenario = ring_road_exp_setup(vehicles=vehicles)
+        env.terminate()
+
+        class RequiredVariablesEnv(AccelEnv):
+            required_vehicle_variables = ()
+
+        self.env = RequiredVariablesEnv(
+            env.env_params, env.sim_params, scenario)
+        self.env.reset()
+
+    def tearDown(self):
+        # free data used by the class
+        self.env.terminate()
+        self.env = None
+
+    def test_required_variables(self):
+        vehicles = self.env.k.vehicle
+        self.env.step([])
+
+        # the variables read by the controllers are retrieved
+        self.assertEqual(vehicles.required_variables, {"leader", "route"})
+        self.assertIn(tc.VAR_EDGES, vehicles._subscription_vars)
+        self.assertNotIn(tc.VAR_ANGLE, vehicles._subscription_vars)
+        self.assertGreater(len(vehicles.get_route("idm_0")), 0)
+
+        # leaders are only available for the vehicles whose controllers read
+        # them
+        leaders = vehicles.get_leader(["idm_0", "idm_1"])
+        self.assertEqual(leaders, ["idm_1", "idm_2"])
+        self.assertLess(vehicles.get_headway("idm_0"), 1000)
+        self.assertRaises(FatalFlowError, vehicles.get_leader, "sumo_0")
+        self.assertRaises(FatalFlowError, vehicles.get_headway,
+                          ["idm_0", "sumo_0"])
+
+        # undeclared variables cannot be read
+        self.assertRaises(FatalFlowError, vehicles.get_follower, "idm_0")
+        self.assertRaises(FatalFlowError, vehicles.get_orientation, "idm_0")
+        self.assertRaises(FatalFlowError, vehicles.get_default_speed,
+                          "idm_0")
+
+        # unknown variables are not accepted
+        self.assertRaises(ValueError, vehicles.set_required_variables,
+                          ["foo"])
+
+
+class TestControllerRegistry(unittest.TestCase):
+    """Tests the sharing and recycling of the controllers of vehicles."""
+
+    def setUp(self):
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="idm",
+            acceleration_controller=(IDMController, {}),
+            routing_controller=(ContinuousRouter, {}),
+            num_vehicles=3)
+        vehicles.add(
+            veh_id="pi",
+            acceleration_controller=(PISaturation, {}),
+            routing_controller=(ContinuousRouter, {}),
+            num_vehicles=3)
+
+        self.env, _ = ring_road_exp_setup(vehicles=vehicles)
+
+    def tearDown(self):
+        # free data used by the class
+        self.env.terminate()
+        self.env = None
+
+    def test_shared_controllers(self):
+        vehicles = self.env.k.vehicle
+
+        # stateless controllers are shared by all vehicles of a type, and are
+        # bound to the vehicle they are requested for
+        idm_ids = ["idm_0", "idm_1", "idm_2"]
+        controllers = set()
+        for veh_id in idm_ids:
+            controller = vehicles.get_acc_controller(veh_id)
+            self.assertEqual(controller.veh_id, veh_id)
+            controllers.add(id(controller))
+        self.assertEqual(len(controllers), 1)
+
+        routers = {id(vehicles.get_routing_controller(veh_id))
+                   for veh_id in vehicles.get_ids()}
+        self.assertEqual(len(routers), 2)
+
+        # stateful controllers are specific to every vehicle
+        pi_ids = ["pi_0", "pi_1", "pi_2"]
+        controllers = {id(vehicles.get_acc_controller(veh_id))
+                       for veh_id in pi_ids}
+        self.assertEqual(len(controllers), 3)
+
+        # accelerations are computed for the right vehicle
+        accel = vehicles.get_acc_controller("idm_0").get_accel(self.env)
+        vehicles.get_acc_controller("idm_1")
+        self.assertEqual(
+            vehicles.get_acc_controller("idm_0").get_accel(self.env), accel)
+
+    def test_recycled_controllers(self):
+        vehicles = self.env.k.vehicle
+        pi_ids = ["pi_0", "pi_1", "pi_2"]
+
+        # add some state to the controllers
+        for _ in range(5):
+            self.env.step(None)
+        old_controllers = {vehicles.get_acc_controller(veh_id)
+                           for veh_id in pi_ids}
+        for controller in old_controllers:
+            self.assertGreater(len(controller.v_history), 0)
+
+        # the controllers of the vehicles re-added to the network are reused,
+        # and their state is reset
+        self.env.reset()
+        new_controllers = {vehicles.get_acc_controller(veh_id)
+                           for veh_id in pi_ids}
+        self.assertSetEqual(new_controllers, old_controllers)
+        for veh_id in pi_ids:
+            controller = vehicles.get_acc_controller(veh_id)
+            self.assertEqual(controller.veh_id, veh_id)
+            self.assertListEqual(controller.v_history, [])
+
+
+class PolledContinuousRouter(ContinuousRouter):
+    """Continuous router that is called at every step."""
+
+    event_driven = False
+
+
+class TestEventDrivenRouting(unittest.TestCase):
+    """Tests that event-driven routers are only called on edge transitions."""
+
+    def setUp(self):
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="event",
+            acceleration_controller=(IDMController, {}),
+            routing_controller=(ContinuousRouter, {}),
+            num_vehicles=5)
+        vehicles.add(
+            veh_id="polled",
+            acceleration_controller=(IDMController, {}),
+            routing_controller=(PolledContinuousRouter, {}),
+            num_vehicles=5)
+        vehicles.add(
+            veh_id="none",
+            acceleration_controller=(IDMController, {}),
+            num_vehicles=5)
+
+        self.env, _ = ring_road_exp_setup(vehicles=vehicles)
+
+    def tearDown(self):
+        # free data used by the class
+        self.env.terminate()
+        self.env = None
+
+    def test_routing_ids(self):
+        vehicles = self.env.k.vehicle
+
+        # all routers are called after a reset
+        self.env.reset()
+        self.assertCountEqual(
+            vehicles.get_routing_ids(),
+            ["event_{}".format(i) for i in range(5)] +
+            ["polled_{}".format(i) for i in range(5)])
+
+        num_transitions = 0
+        for _ in range(200):
+            edges = {veh_id: vehicles.get_edge(veh_id)
+                     for veh_id in vehicles.get_ids()}
+            self.env.step(None)
+
+            expected = [veh_id for veh_id in vehicles.get_ids()
+                        if vehicles.get_edge(veh_id) != edges[veh_id]]
+            self.assertListEqual(
+                vehicles.get_edge_transition_ids(), expected)
+
+            # vehicles with polled routers are always routed, and vehicles
+            # with event-driven routers when they enter a new edge
+            expected = [veh_id for veh_id in vehicles.get_ids()
+                        if veh_id.startswith("polled") or
+                        veh_id.startswith("event") and veh_id in expected]
+            self.assertListEqual(vehicles.get_routing_ids(), expected)
+            num_transitions += len(expected)
+
+        self.assertGreater(num_transitions, 5 * 200)
+
+        # all vehicles keep on driving around the ring
+        self.assertEqual(vehicles.num_vehicles, 15)
+
+
 if __name__ == '__main__':
     unittest.main()
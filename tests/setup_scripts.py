@@ -27,7 +27,8 @@ def ring_road_exp_setup(sim_params=None,
                         env_params=None,
                         net_params=None,
                         initial_config=None,
-                        traffic_lights=None):
+                        traffic_lights=None,
+                        simulator='traci'):
     """
     Create an environment and scenario pair for ring road test experiments.
 
@@ -50,6 +51,8 @@ def ring_road_exp_setup(sim_params=None,
         distributed vehicles across the length of the network
     traffic_lights : flow.core.params.TrafficLightParams
         traffic light signals, defaults to no traffic lights in the network
+    simulator : str
+        the simulator used, defaults to 'traci'
     """
     logging.basicConfig(level=logging.WARNING)
 
@@ -107,7 +110,8 @@ def ring_road_exp_setup(sim_params=None,
 
     # create the environment
     env = AccelEnv(
-        env_params=env_params, sim_params=sim_params, scenario=scenario)
+        env_params=env_params, sim_params=sim_params, scenario=scenario,
+        simulator=simulator)
 
     # reset the environment
     env.reset()
@@ -0,0 +1,158 @@
+"""Compares the runtime of the traci and libsumo simulators.
+
+The ring, merge, and grid networks are simulated with both simulators, and the
+number of environment steps performed per second is reported. The vehicles of
+both simulations are also checked to follow the same trajectories.
+"""
+
+import argparse
+import time
+from copy import deepcopy
+
+import numpy as np
+
+from flow.benchmarks.grid0 import flow_params as grid_params
+from flow.benchmarks.merge0 import flow_params as merge_params
+from flow.controllers import IDMController, ContinuousRouter
+from flow.core.params import SumoParams, EnvParams, InitialConfig, NetParams
+from flow.core.params import VehicleParams, TrafficLightParams
+from flow.envs.loop.loop_accel import ADDITIONAL_ENV_PARAMS
+from flow.scenarios.loop import ADDITIONAL_NET_PARAMS
+
+# ring road with 22 human-driven vehicles, as in sugiyama.py
+vehicles = VehicleParams()
+vehicles.add(
+    veh_id="idm",
+    acceleration_controller=(IDMController, {}),
+    routing_controller=(ContinuousRouter, {}),
+    num_vehicles=22)
+
+ring_params = dict(
+    exp_tag="ring",
+    env_name="AccelEnv",
+    scenario="LoopScenario",
+    simulator="traci",
+    sim=SumoParams(sim_step=0.1, render=False),
+    env=EnvParams(
+        horizon=1500, additional_params=ADDITIONAL_ENV_PARAMS.copy()),
+    net=NetParams(additional_params=ADDITIONAL_NET_PARAMS.copy()),
+    veh=vehicles,
+    initial=InitialConfig(bunching=20),
+)
+
+BENCHMARKS = {
+    "ring": ring_params,
+    "merge": merge_params,
+    "grid": grid_params,
+}
+
+EXAMPLE_USAGE = """
+example usage:
+    python ./simulator_runtime.py --num_rollouts 2
+
+Here the arguments are:
+--num_rollouts - the number of rollouts performed with each simulator
+--benchmarks - the networks that are simulated, among ring, merge, and grid
+"""
+
+parser = argparse.ArgumentParser(
+    formatter_class=argparse.RawDescriptionHelpFormatter,
+    description="Compares the runtime of the traci and libsumo simulators",
+    epilog=EXAMPLE_USAGE)
+
+parser.add_argument("--num_rollouts", type=int, default=2,
+                    help="number of rollouts per simulator")
+parser.add_argument("--benchmarks", type=str, nargs="+",
+                    default=list(BENCHMARKS.keys()),
+                    help="networks to simulate")
+
+
+def run(flow_params, simulator, num_rollouts):
+    """Simulate a network and return its runtime.
+
+    Parameters
+    ----------
+    flow_params : dict
+        the parameters of the network and environment (see
+        flow.benchmarks)
+    simulator : str
+        the simulator used, one of {"traci", "libsumo"}
+    num_rollouts : int
+        number of rollouts performed
+
+    Returns
+    -------
+    float
+        the number of environment steps per second
+    list of np.ndarray
+        the positions of the vehicles at the end of every rollout
+    """
+    flow_params = deepcopy(flow_params)
+    sim_params = flow_params["sim"]
+    env_params = flow_params["env"]
+    sim_params.render = False
+    sim_params.seed = 0
+
+    # import the scenario class
+    module = __import__("flow.scenarios", fromlist=[flow_params["scenario"]])
+    scenario_class = getattr(module, flow_params["scenario"])
+
+    # create the scenario object
+    scenario = scenario_class(
+        name=flow_params["exp_tag"],
+        vehicles=flow_params["veh"],
+        net_params=flow_params["net"],
+        initial_config=flow_params.get("initial", InitialConfig()),
+        traffic_lights=flow_params.get("tls", TrafficLightParams()))
+
+    # import the environment class
+    module = __import__("flow.envs", fromlist=[flow_params["env_name"]])
+    env_class = getattr(module, flow_params["env_name"])
+
+    # the rl vehicles and traffic lights of the benchmarks are left to be
+    # controlled by sumo, so that both simulations take the same actions
+    np.random.seed(0)
+    env = env_class(env_params, sim_params, scenario, simulator=simulator)
+
+    positions = []
+    num_steps = 0
+    runtime = 0
+    for _ in range(num_rollouts):
+        env.reset()
+        start = time.time()
+        for _ in range(env_params.horizon):
+            env.step(None)
+            num_steps += 1
+        runtime += time.time() - start
+
+        veh_ids = sorted(env.k.vehicle.get_ids())
+        positions.append(
+            np.array([env.k.vehicle.get_x_by_id(veh) for veh in veh_ids]))
+
+    env.terminate()
+
+    return num_steps / runtime, positions
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.benchmarks:
+        traci_speed, traci_pos = run(
+            BENCHMARKS[name], "traci", args.num_rollouts)
+        libsumo_speed, libsumo_pos = run(
+            BENCHMARKS[name], "libsumo", args.num_rollouts)
+
+        same = all(len(p1) == len(p2) and np.allclose(p1, p2)
+                   for p1, p2 in zip(traci_pos, libsumo_pos))
+        results[name] = (traci_speed, libsumo_speed, same)
+
+    print("---------")
+    print("{:<8}{:>16}{:>16}{:>10}{:>14}".format(
+        "network", "traci (it/s)", "libsumo (it/s)", "speedup",
+        "same states"))
+    for name, (traci_speed, libsumo_speed, same) in results.items():
+        print("{:<8}{:>16.1f}{:>16.1f}{:>10.2f}{:>14}".format(
+            name, traci_speed, libsumo_speed, libsumo_speed / traci_speed,
+            str(same)))